@@ -91,6 +91,11 @@ android {
             excludes += "/META-INF/{AL2.0,LGPL2.1}"
         }
     }
+
+    androidResources {
+        // The binary station catalog (stations.bin) is memory-mapped, so keep it uncompressed
+        noCompress += "bin"
+    }
 }
 
 dependencies {
@@ -1361,11 +1361,80 @@ object RadioRepository {
                                 popularity = 1077,
                                 tags = "news",
                                 websiteUrl = "https://www.radiozvezda.ru/",
-                                metadataType = "None",
-                                metadataParam = "None"
+                                metadataType = null,
+                                metadataParam = null
                         )
                 )
 
+        /** Station positions per primary tag, in alphabetical order */
+        private val genreIndex: Map<String, IntArray> = mapOf(
+                "ambient" to intArrayOf(15),
+                "classical" to intArrayOf(6, 17, 30, 66, 68, 82),
+                "culture" to intArrayOf(20, 27),
+                "hits" to intArrayOf(0, 16, 32, 38, 44, 47, 50, 52, 56, 58, 73, 77),
+                "jazz" to intArrayOf(33, 34, 42, 63, 70, 80),
+                "news" to intArrayOf(10, 11, 18, 21, 23, 28, 35, 40, 43, 46, 48, 55, 62, 65, 78, 83, 86, 87, 88),
+                "oldies" to intArrayOf(3, 39, 49),
+                "pop" to intArrayOf(5, 13, 41, 45, 64, 69, 74, 76, 81),
+                "rock" to intArrayOf(1, 2, 4, 9, 31, 36, 53, 54, 57, 71, 75, 79),
+                "talk" to intArrayOf(7, 8, 12, 14, 19, 22, 24, 26, 29, 37, 51, 60, 67, 72, 84, 85),
+                "world" to intArrayOf(25, 59, 61)
+        )
+
+        /** Station positions per country key, in alphabetical order */
+        private val countryIndex: Map<String, IntArray> = mapOf(
+                "austria" to intArrayOf(53),
+                "brazil" to intArrayOf(35),
+                "china" to intArrayOf(18),
+                "czech_republic" to intArrayOf(54, 84, 85, 86),
+                "france" to intArrayOf(10, 24, 25, 27, 28, 29, 30, 33, 39, 44, 59, 67, 72, 74, 80),
+                "germany" to intArrayOf(0, 3, 20, 21, 22, 57, 79, 81, 82, 83),
+                "italy" to intArrayOf(50, 51, 55, 56, 58, 62, 65, 66, 73),
+                "netherlands" to intArrayOf(2, 11, 40, 41, 42, 47, 49, 52, 76, 77),
+                "poland" to intArrayOf(1, 46, 60, 68, 69, 71),
+                "russia" to intArrayOf(12, 87, 88),
+                "spain" to intArrayOf(13, 14, 15, 19, 23, 32, 38, 45, 48, 70),
+                "switzerland" to intArrayOf(63, 64, 75, 78),
+                "uk" to intArrayOf(4, 5, 6, 7, 8, 9, 16, 17, 31, 37),
+                "usa" to intArrayOf(26, 34, 36, 43, 61)
+        )
+
+        /** Position of every station id in baseStations */
+        private val indexById: Map<String, Int> by lazy {
+                HashMap<String, Int>(baseStations.size * 2).apply {
+                        baseStations.forEachIndexed { index, station -> put(station.id, index) }
+                }
+        }
+
+        /** Favorite-dependent views of the catalog, rebuilt only when favorites change */
+        private class StationViews(
+                /** All stations in alphabetical order, with isFavorite set */
+                val all: List<RadioStation>,
+                val favorites: List<RadioStation>,
+                val nonFavorites: List<RadioStation>,
+                /** Favorites first, then the other stations, both alphabetical */
+                val ordered: List<RadioStation>,
+                /** Position of every station id in [ordered] */
+                val orderedIndex: Map<String, Int>
+        )
+
+        @Volatile private var viewsCache: StationViews? = null
+
+        private fun views(): StationViews {
+                viewsCache?.let { return it }
+                val all = baseStations.map { station ->
+                        station.copy(isFavorite = favoriteIds.contains(station.id))
+                }
+                val favorites = all.filter { it.isFavorite }
+                val nonFavorites = all.filter { !it.isFavorite }
+                val ordered = favorites + nonFavorites
+                val orderedIndex = HashMap<String, Int>(ordered.size * 2)
+                ordered.forEachIndexed { index, station -> orderedIndex[station.id] = index }
+                return StationViews(all, favorites, nonFavorites, ordered, orderedIndex).also {
+                        viewsCache = it
+                }
+        }
+
         /** Initialize favorites and listen counts from persistent storage */
         fun initialize(context: Context) {
                 if (prefs == null) {
@@ -1374,7 +1443,8 @@ object RadioRepository {
                                 prefs?.getStringSet(FAVORITES_KEY, emptySet()) ?: emptySet()
                         favoriteIds.clear()
                         favoriteIds.addAll(savedFavorites)
-                        
+                        viewsCache = null
+
                         // Load listen counts
                         val countsString = prefs?.getString(LISTEN_COUNTS_KEY, null)
                         listenCounts.clear()
@@ -1396,61 +1466,66 @@ object RadioRepository {
          * status
          */
         val stations: List<RadioStation>
-                get() =
-                        baseStations
-                                .map { station ->
-                                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                                }
-                                .sortedByDescending { it.isFavorite }
-        
+                get() = views().ordered
+
         /** Get non-favorite stations sorted by the specified order */
         fun getNonFavoritesSorted(sortOrder: SortOrder): List<RadioStation> {
-                val nonFavorites = baseStations
-                        .map { station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }
-                        .filter { !it.isFavorite }
-                
+                val nonFavorites = views().nonFavorites
+
                 return when (sortOrder) {
-                        SortOrder.ALPHABETICAL -> nonFavorites.sortedBy { it.name.lowercase() }
+                        SortOrder.ALPHABETICAL -> nonFavorites
                         SortOrder.MOST_LISTENED -> nonFavorites.sortedByDescending { getListenCount(it.id) }
                 }
         }
-        
+
         /** Get favorite stations */
         fun getFavorites(): List<RadioStation> {
-                return baseStations
-                        .map { station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }
-                        .filter { it.isFavorite }
+                return views().favorites
         }
-        
+
         /** Increment listen count for a station */
         fun incrementListenCount(stationId: String) {
                 val currentCount = listenCounts[stationId] ?: 0
                 listenCounts[stationId] = currentCount + 1
                 saveListenCounts()
         }
-        
+
         /** Get listen count for a station */
         fun getListenCount(stationId: String): Int {
                 return listenCounts[stationId] ?: 0
         }
-        
+
         private fun saveListenCounts() {
                 val countsString = listenCounts.entries.joinToString(",") { "${it.key}:${it.value}" }
                 prefs?.edit()?.putString(LISTEN_COUNTS_KEY, countsString)?.apply()
         }
-        
+
         /** Get saved sort order */
         fun getSortOrder(): SortOrder {
-                val ordinal = prefs?.getInt(SORT_ORDER_KEY, SortOrder.ALPHABETICAL.ordinal) 
+                val ordinal = prefs?.getInt(SORT_ORDER_KEY, SortOrder.ALPHABETICAL.ordinal)
                         ?: SortOrder.ALPHABETICAL.ordinal
                 return SortOrder.values().getOrElse(ordinal) { SortOrder.ALPHABETICAL }
         }
-        
+
         /** Save sort order preference */
         fun setSortOrder(sortOrder: SortOrder) {
                 prefs?.edit()?.putInt(SORT_ORDER_KEY, sortOrder.ordinal)?.apply()
         }
-        
+
+        /** Listened station ids, most listened first, ties in alphabetical order */
+        private fun listenedIds(includeFavorites: Boolean): List<String> {
+                return listenCounts.entries
+                        .filter { entry ->
+                                entry.value > 0 && entry.key in indexById &&
+                                        (includeFavorites || entry.key !in favoriteIds)
+                        }
+                        .sortedWith(
+                                compareByDescending<Map.Entry<String, Int>> { it.value }
+                                        .thenBy { indexById.getValue(it.key) }
+                        )
+                        .map { it.key }
+        }
+
         /**
          * Get stations ordered for Android Auto:
          * 1. Favorites first
@@ -1458,49 +1533,37 @@ object RadioRepository {
          * 3. Remaining stations with alphabet distribution
          */
         fun getStationsForAndroidAuto(): List<RadioStation> {
-                val allStations = baseStations.map { station ->
-                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                }
-                
-                val favorites = allStations.filter { it.isFavorite }.sortedBy { it.name.lowercase() }
-                val nonFavorites = allStations.filter { !it.isFavorite }
-                
+                val views = views()
+
                 // Get most listened non-favorites (top 10)
-                val mostListenedIds = listenCounts.entries
-                        .filter { entry -> nonFavorites.any { it.id == entry.key } }
-                        .sortedByDescending { it.value }
-                        .take(10)
-                        .map { it.key }
-                        .toSet()
-                
-                val mostListened = nonFavorites.filter { it.id in mostListenedIds }
-                        .sortedByDescending { getListenCount(it.id) }
-                
-                // Remaining stations sorted alphabetically
-                val remaining = nonFavorites.filter { it.id !in mostListenedIds }
-                        .sortedBy { it.name.lowercase() }
-                
-                return favorites + mostListened + remaining
+                val mostListenedIds = listenedIds(includeFavorites = false).take(10)
+                val mostListened = mostListenedIds.map { views.all[indexById.getValue(it)] }
+
+                // Remaining stations, already in alphabetical order
+                val mostListenedSet = mostListenedIds.toSet()
+                val remaining = views.nonFavorites.filter { it.id !in mostListenedSet }
+
+                return views.favorites + mostListened + remaining
         }
-        
+
         /** Get top N most listened stations */
         fun getMostListened(limit: Int = 10): List<RadioStation> {
-                val allStations = baseStations.map { station ->
-                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                }
-                
-                return allStations
-                        .filter { getListenCount(it.id) > 0 }
-                        .sortedByDescending { getListenCount(it.id) }
+                val all = views().all
+                return listenedIds(includeFavorites = true)
                         .take(limit)
+                        .map { all[indexById.getValue(it)] }
         }
-        
+
         /** Get stations by genre/tag */
         fun getStationsByGenre(tag: String): List<RadioStation> {
-                return baseStations
-                        .filter { it.primaryTag == tag }
-                        .map { station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }
-                        .sortedBy { it.name.lowercase() }
+                val all = views().all
+                return genreIndex[tag]?.map { all[it] } ?: emptyList()
+        }
+
+        /** Get stations by country key (e.g. "france") */
+        fun getStationsByCountry(country: String): List<RadioStation> {
+                val all = views().all
+                return countryIndex[country]?.map { all[it] } ?: emptyList()
         }
 
         fun toggleFavorite(stationId: String) {
@@ -1509,6 +1572,7 @@ object RadioRepository {
                 } else {
                         favoriteIds.add(stationId)
                 }
+                viewsCache = null
 
                 prefs?.edit()?.putStringSet(FAVORITES_KEY, favoriteIds)?.apply()
         }
@@ -1530,7 +1594,7 @@ object RadioRepository {
         }
 
         fun getStationById(id: String): RadioStation? {
-                return stations.find { it.id == id }
+                return indexById[id]?.let { views().all[it] }
         }
 
         fun getStationByIndex(index: Int): RadioStation? {
@@ -1538,6 +1602,6 @@ object RadioRepository {
         }
 
         fun getStationIndex(id: String): Int {
-                return stations.indexOfFirst { it.id == id }
+                return views().orderedIndex[id] ?: -1
         }
 }
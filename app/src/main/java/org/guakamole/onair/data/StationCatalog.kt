@@ -0,0 +1,157 @@
+package org.guakamole.onair.data
+
+import android.content.Context
+import java.io.FileInputStream
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.nio.channels.FileChannel
+import java.util.zip.CRC32
+
+/**
+ * Read-only view of the binary station catalog asset generated by scripts/build_stations.py
+ * (`--catalog-format asset`, see scripts/station_catalog.py for the layout).
+ *
+ * The asset is memory-mapped and its CRC32 is checked when it is opened (one sequential pass
+ * over the bytes). Records and strings are then decoded on demand: [stations] decodes a station
+ * the first time it is read, so nothing is built for stations that are never displayed.
+ */
+class StationCatalog
+private constructor(
+        private val buffer: ByteBuffer,
+        private val countryRes: IntArray,
+        private val logoRes: IntArray
+) {
+
+    companion object {
+        const val ASSET_NAME = "stations.bin"
+
+        private const val MAGIC = 0x5443414F // "OACT", little-endian
+        private const val HEADER_SIZE = 48
+        private const val VERSION = 1
+        private const val NO_STRING = -1 // 0xFFFFFFFF
+        private const val NO_REF = 0xFFFF
+
+        /** Memory-map the catalog asset; it must be stored uncompressed in the APK */
+        fun open(context: Context, countryRes: IntArray, logoRes: IntArray): StationCatalog {
+            val buffer =
+                    context.assets.openFd(ASSET_NAME).use { fd ->
+                        FileInputStream(fd.fileDescriptor).channel.use { channel ->
+                            channel.map(FileChannel.MapMode.READ_ONLY, fd.startOffset, fd.length)
+                        }
+                    }
+            return StationCatalog(buffer.order(ByteOrder.LITTLE_ENDIAN), countryRes, logoRes)
+        }
+    }
+
+    private val recordSize: Int
+    private val stringOffsetsStart: Int
+    private val stringDataStart: Int
+    private val recordsStart: Int
+    private val byNameStart: Int
+    private val byPopularityStart: Int
+    private val countryIndexStart: Int
+    private val tagIndexStart: Int
+
+    /** Number of stations in the catalog */
+    val size: Int
+
+    private val strings: Array<String?>
+
+    init {
+        check(buffer.getInt(0) == MAGIC) { "Not a station catalog" }
+        check(buffer.getShort(4).toInt() == VERSION) { "Unsupported station catalog version" }
+        val length = buffer.getInt(40)
+        check(length in HEADER_SIZE..buffer.limit()) { "Truncated station catalog" }
+        val crc = CRC32()
+        crc.update(buffer.duplicate().apply { position(HEADER_SIZE).limit(length) })
+        check(crc.value.toInt() == buffer.getInt(44)) { "Corrupt station catalog (CRC mismatch)" }
+        recordSize = buffer.getShort(6).toInt()
+        size = buffer.getInt(8)
+        val stringCount = buffer.getInt(12)
+        stringOffsetsStart = buffer.getInt(16)
+        stringDataStart = stringOffsetsStart + (stringCount + 1) * 4
+        recordsStart = buffer.getInt(20)
+        byNameStart = buffer.getInt(24)
+        byPopularityStart = buffer.getInt(28)
+        countryIndexStart = buffer.getInt(32)
+        tagIndexStart = buffer.getInt(36)
+        strings = arrayOfNulls(stringCount)
+    }
+
+    /** All stations, in alphabetical order, each decoded when first read */
+    val stations: List<RadioStation> = Stations()
+
+    /** Station positions sorted by name */
+    val byName: IntArray by lazy { readPositions(byNameStart, size) }
+
+    /** Station positions sorted by descending popularity */
+    val byPopularity: IntArray by lazy { readPositions(byPopularityStart, size) }
+
+    /** Station positions per country key (e.g. "france") */
+    val countryIndex: Map<String, IntArray> by lazy { readGroups(countryIndexStart) }
+
+    /** Station positions per primary tag */
+    val tagIndex: Map<String, IntArray> by lazy { readGroups(tagIndexStart) }
+
+    /** Decode the station stored at the given position */
+    fun station(position: Int): RadioStation {
+        val base = recordsStart + position * recordSize
+        fun field(index: Int) = buffer.getInt(base + index * 4)
+        val country = buffer.getShort(base + 40).toInt() and 0xFFFF
+        val logo = buffer.getShort(base + 42).toInt() and 0xFFFF
+        return RadioStation(
+                id = string(field(0)) ?: "",
+                name = string(field(1)) ?: "",
+                streamUrl = string(field(2)) ?: "",
+                logoUrl = string(field(3)) ?: "",
+                logoResId = if (logo == NO_REF) 0 else logoRes[logo],
+                description = string(field(4)) ?: "",
+                primaryTag = string(field(5)) ?: "",
+                country = if (country == NO_REF) 0 else countryRes[country],
+                popularity = buffer.getInt(base + 44),
+                tags = string(field(6)) ?: "",
+                websiteUrl = string(field(7)) ?: "",
+                metadataType = string(field(8)),
+                metadataParam = string(field(9))
+        )
+    }
+
+    private inner class Stations : AbstractList<RadioStation>(), RandomAccess {
+        private val decoded = arrayOfNulls<RadioStation>(this@StationCatalog.size)
+
+        override val size: Int
+            get() = decoded.size
+
+        override fun get(index: Int): RadioStation =
+                decoded[index] ?: station(index).also { decoded[index] = it }
+    }
+
+    private fun string(index: Int): String? {
+        if (index == NO_STRING) return null
+        strings[index]?.let {
+            return it
+        }
+        val start = buffer.getInt(stringOffsetsStart + index * 4)
+        val end = buffer.getInt(stringOffsetsStart + (index + 1) * 4)
+        val bytes = ByteArray(end - start)
+        buffer.duplicate().apply { position(stringDataStart + start) }.get(bytes)
+        return String(bytes, Charsets.UTF_8).also { strings[index] = it }
+    }
+
+    private fun readPositions(start: Int, count: Int): IntArray =
+            IntArray(count) { buffer.getInt(start + it * 4) }
+
+    private fun readGroups(start: Int): Map<String, IntArray> {
+        val groupCount = buffer.getInt(start)
+        val membersStart = start + 4 + groupCount * 12
+        val groups = LinkedHashMap<String, IntArray>(groupCount * 2)
+        for (i in 0 until groupCount) {
+            val entry = start + 4 + i * 12
+            val key = string(buffer.getInt(entry)) ?: continue
+            val first = buffer.getInt(entry + 4)
+            val length = buffer.getInt(entry + 8)
+            groups[key] = readPositions(membersStart + first * 4, length)
+        }
+        return groups
+    }
+}
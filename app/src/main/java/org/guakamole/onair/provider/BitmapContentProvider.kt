@@ -2,6 +2,7 @@ package org.guakamole.onair.provider
 
 import android.content.ContentProvider
 import android.content.ContentValues
+import android.content.res.AssetFileDescriptor
 import android.database.Cursor
 import android.graphics.Bitmap
 import android.graphics.Canvas
@@ -9,19 +10,25 @@ import android.net.Uri
 import android.os.ParcelFileDescriptor
 import androidx.core.content.ContextCompat
 import java.io.FileOutputStream
+import org.json.JSONObject
 
 /**
  * ContentProvider that serves drawable resources as PNG bitmaps. This is used to provide Android
  * Auto with bitmap versions of vector drawables, preventing the monochrome rendering that Android
  * Auto applies to vectors.
  *
- * URI format: content://org.guakamole.onair.provider.bitmap/{resourceName}
+ * Logos pre-rendered at build time (`build_stations.py --rasterize-logos`) are served straight
+ * from the APK assets; other drawables are rendered on demand.
+ *
+ * URI format: content://org.guakamole.onair.provider.bitmap/{resourceName}[?size={pixels}]
  */
 class BitmapContentProvider : ContentProvider() {
 
     companion object {
         const val AUTHORITY = "org.guakamole.onair.provider.bitmap"
         private const val BITMAP_SIZE = 256
+        private const val SIZE_PARAMETER = "size"
+        private const val PRERENDERED_MANIFEST = "logo_bitmaps/manifest.json"
 
         fun getUriForDrawable(packageName: String, resourceName: String): Uri {
             return Uri.Builder()
@@ -32,8 +39,58 @@ class BitmapContentProvider : ContentProvider() {
         }
     }
 
+    /** Pre-rendered bitmaps: resource name -> (size in pixels -> asset path) */
+    private class PrerenderedLogos(val mimeType: String, val logos: Map<String, Map<Int, String>>)
+
+    private val prerendered: PrerenderedLogos? by lazy { loadPrerenderedLogos() }
+
     override fun onCreate(): Boolean = true
 
+    private fun loadPrerenderedLogos(): PrerenderedLogos? {
+        val context = context ?: return null
+        return try {
+            val json =
+                    context.assets.open(PRERENDERED_MANIFEST).bufferedReader().use {
+                        JSONObject(it.readText())
+                    }
+            val logosJson = json.getJSONObject("logos")
+            val logos = HashMap<String, Map<Int, String>>(logosJson.length() * 2)
+            for (name in logosJson.keys()) {
+                val sizesJson = logosJson.getJSONObject(name)
+                logos[name] = sizesJson.keys().asSequence().associate { size ->
+                    size.toInt() to sizesJson.getString(size)
+                }
+            }
+            PrerenderedLogos("image/" + json.optString("format", "png"), logos)
+        } catch (e: java.io.FileNotFoundException) {
+            null
+        } catch (e: Exception) {
+            android.util.Log.e("BitmapContentProvider", "Invalid pre-rendered logo manifest", e)
+            null
+        }
+    }
+
+    /** Asset path of the smallest pre-rendered bitmap covering the requested size */
+    private fun prerenderedAsset(uri: Uri): String? {
+        val resourceName = uri.lastPathSegment ?: return null
+        val sizes = prerendered?.logos?.get(resourceName) ?: return null
+        val requested = uri.getQueryParameter(SIZE_PARAMETER)?.toIntOrNull() ?: BITMAP_SIZE
+        val size = sizes.keys.filter { it >= requested }.minOrNull() ?: sizes.keys.maxOrNull()
+        return size?.let { sizes[it] }
+    }
+
+    override fun openAssetFile(uri: Uri, mode: String): AssetFileDescriptor? {
+        val asset = prerenderedAsset(uri)
+        if (asset != null) {
+            try {
+                return context?.assets?.openFd(asset)
+            } catch (e: Exception) {
+                android.util.Log.e("BitmapContentProvider", "Error opening $asset", e)
+            }
+        }
+        return super.openAssetFile(uri, mode)
+    }
+
     override fun openFile(uri: Uri, mode: String): ParcelFileDescriptor? {
         val context = context ?: return null
         val resourceName = uri.lastPathSegment ?: return null
@@ -100,7 +157,8 @@ class BitmapContentProvider : ContentProvider() {
         return readSide
     }
 
-    override fun getType(uri: Uri): String = "image/png"
+    override fun getType(uri: Uri): String =
+            if (prerenderedAsset(uri) != null) prerendered!!.mimeType else "image/png"
 
     override fun query(
             uri: Uri,
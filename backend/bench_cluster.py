@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Report ingestion throughput with 1, 2, 4... shards (cluster.py).
+
+For each shard count, starts the backend as a cluster in a temporary
+directory (with a copy of stations.yaml), runs load generator processes
+that POST reports for random catalog stations over keep-alive
+connections for a few seconds, then checks through /reports/stats (which
+fans in over all shards) that every acknowledged report was stored.
+
+Usage:
+    python backend/bench_cluster.py [--shards 1,2,4] [--clients N] [--seconds S]
+
+Reports are fsynced one by one as in production, so results depend on the
+disk as much as on the cores. Throughput only scales with shards up to the
+number of cores, which are shared with the load generators.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parent
+STATIONS_YAML = BACKEND.parent / "stations.yaml"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_cluster(directory: str, port: int, shards: int) -> subprocess.Popen:
+    code = (f"import sys; sys.path.insert(0, {str(BACKEND)!r}); from cluster import run; "
+            f"run('main:app', '127.0.0.1', {port}, shards={shards}, internal_port={free_port() + 100})")
+    env = dict(os.environ, STATIONS_FILE=os.path.join(directory, "stations.yaml"))
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=directory, env=env, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if get_json(port, "/reports/stats")["shards_answered"] == shards:
+                return process
+        except (OSError, http.client.HTTPException, KeyError, ValueError):
+            time.sleep(0.2)
+    stop_cluster(process)
+    raise RuntimeError(f"cluster with {shards} shards did not start")
+
+
+def stop_cluster(process: subprocess.Popen):
+    os.killpg(process.pid, signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def get_json(port: int, path: str):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    if response.status != 200:
+        raise ValueError(f"{path}: HTTP {response.status}")
+    return json.loads(body)
+
+
+def client(port: int, stations: list, seconds: float, seed: int, results):
+    """Load generator: POST reports until `seconds` elapse; put the number acknowledged."""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        body = json.dumps({
+            "station_id": rng.choice(stations),
+            "stream_url": "http://127.0.0.1:9/unreachable",
+            "error_code": rng.choice([1, 2, 1004]),
+            "error_message": "Source error",
+            "device_info": f"Bench device {rng.randrange(1000)} - API 34",
+        })
+        connection.request("POST", "/report", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        if response.status == 200:
+            done += 1
+    connection.close()
+    results.put(done)
+
+
+def bench(shards: int, clients: int, seconds: float, stations: list) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench_cluster_")
+    try:
+        shutil.copy(STATIONS_YAML, os.path.join(directory, "stations.yaml"))
+        port = free_port()
+        process = start_cluster(directory, port, shards)
+        try:
+            results = multiprocessing.Queue()
+            loaders = [multiprocessing.Process(target=client, args=(port, stations, seconds, seed, results))
+                       for seed in range(clients)]
+            started = time.monotonic()
+            for loader in loaders:
+                loader.start()
+            acknowledged = sum(results.get() for _ in loaders)
+            elapsed = time.monotonic() - started
+            for loader in loaders:
+                loader.join()
+            stored = get_json(port, "/reports/stats")["reports"]
+        finally:
+            stop_cluster(process)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"shards": shards, "reports": acknowledged, "per_second": round(acknowledged / elapsed),
+            "stored": stored}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report ingestion across shard counts")
+    parser.add_argument("--shards", default="1,2,4", help="comma-separated shard counts")
+    parser.add_argument("--clients", type=int, default=8, help="load generator processes")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with open(STATIONS_YAML, "r", encoding="utf-8") as f:
+        stations = [s["id"] for s in yaml.safe_load(f)["stations"]]
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.seconds}s per run")
+    ok = True
+    baseline = None
+    for shards in [int(n) for n in args.shards.split(",")]:
+        result = bench(shards, args.clients, args.seconds, stations)
+        baseline = baseline or result["per_second"]
+        lost = result["reports"] - result["stored"]
+        print(f"{shards:3d} shards: {result['per_second']:7d} reports/s  "
+              f"x{result['per_second'] / baseline:.2f}  ({result['reports']} acknowledged, {result['stored']} stored)")
+        if lost > 0:
+            print(f"FAIL {lost} acknowledged reports missing from /reports/stats")
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
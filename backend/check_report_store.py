@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Fault-injection check for the report store (report_store.py).
+
+Runs writer processes that add reports to a store and print an
+acknowledgement after each add returns, and SIGKILLs them at random
+points, including in the middle of snapshots (the store snapshots every
+few records, in a background thread). Between runs it also simulates torn writes: garbage or a
+partial record at the end of the WAL, and a half-written snapshot temp
+file. Writers also try malformed reports (numbers that don't fit the
+table), which must be rejected without reaching the WAL. After every
+crash the store is reopened and checked:
+
+- every acknowledged report is present, with at least as many merged
+  occurrences as were acknowledged and at most one more (the add that was
+  in flight when the process died)
+- reopening replays only the WAL, not the history: at most the segment
+  retired for the snapshot in flight at the kill, plus what was appended
+  while it was written (REPLAY_BOUND)
+- the offline export (report_store.load) reads the same reports
+
+Usage:
+    python backend/check_report_store.py [--runs N] [--seed N]
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from report_store import RECORD_HEADER, ReportStore, load
+
+
+SNAPSHOT_EVERY = 7
+# Appends go on while a snapshot is written, up to twice SNAPSHOT_EVERY, and a
+# kill then replays the segment retired for it too (plus the add in flight)
+REPLAY_BOUND = 4 * SNAPSHOT_EVERY + 1
+DEVICES = 5
+
+
+def store_in(directory: str) -> ReportStore:
+    return ReportStore(os.path.join(directory, "reports.snapshot"), os.path.join(directory, "reports.wal"),
+                       export_file=os.path.join(directory, "reports.json"), snapshot_every=SNAPSHOT_EVERY)
+
+
+def report(run: int, n: int) -> dict:
+    # A few devices per run, so reports are both new entries and merges
+    return {
+        "station_id": f"station_{n % 3}",
+        "stream_url": "unknown",
+        "error_code": 1,
+        "error_message": f"run {run} report {n}",
+        "device_info": f"run{run}-device{n % DEVICES}",
+        "app_version": "unknown",
+        "user_agent": "unknown",
+        "country": "unknown",
+        "timestamp": f"2026-01-01T00:00:{n % 60:02d}",
+        "report_count": 1,
+    }
+
+
+def malformed(run: int, n: int) -> dict:
+    return dict(report(run, n), error_code=2 ** 31, report_count=-1)
+
+
+def writer(directory: str, run: int):
+    """Child process: add reports forever, acknowledging each on stdout."""
+    store = store_in(directory).open()
+    n = 0
+    while True:
+        if n % 10 == 5:
+            try:
+                store.add(malformed(run, n))
+            except ValueError:
+                pass
+        store.add(report(run, n))
+        print(n, flush=True)
+        n += 1
+
+
+def crash_writer(directory: str, run: int, rng: random.Random) -> int:
+    """Run a writer, kill it after a random delay, return how many adds it acknowledged."""
+    child = subprocess.Popen([sys.executable, __file__, "--writer", directory, str(run)],
+                             stdout=subprocess.PIPE, text=True)
+    time.sleep(rng.uniform(0.05, 0.4))
+    os.kill(child.pid, signal.SIGKILL)
+    out, _ = child.communicate()
+    return len(out.split())
+
+
+def damage(directory: str, rng: random.Random) -> str:
+    """Simulate a crash during a write the writer process didn't get to make."""
+    wal = os.path.join(directory, "reports.wal")
+    kind = rng.choice(["none", "garbage", "partial record", "snapshot temp"])
+    if kind == "garbage":
+        with open(wal, "ab") as f:
+            f.write(os.urandom(rng.randint(1, 40)))
+    elif kind == "partial record":
+        with open(wal, "ab") as f:
+            f.write(RECORD_HEADER.pack(200, 0, 10 ** 9) + b'{"op":"rep')
+    elif kind == "snapshot temp":
+        with open(os.path.join(directory, "reports.snapshot.tmp"), "wb") as f:
+            f.write(os.urandom(rng.randint(1, 500)))
+    return kind
+
+
+def entry_key(r: dict) -> tuple:
+    return r["station_id"], r["device_info"]
+
+
+def expected_counts(run: int, acked: int) -> dict:
+    counts = {}
+    for n in range(acked):
+        key = entry_key(report(run, n))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def check(directory: str, acked: dict, label: str) -> bool:
+    store = store_in(directory).open()
+    ok = True
+    entries = {entry_key(r): r["report_count"] for r in store.reports()}
+    for run, count in acked.items():
+        # The add in flight at the kill may or may not have made it
+        in_flight = entry_key(report(run, count))
+        for key, expected in expected_counts(run, count).items():
+            got = entries.get(key, 0)
+            if got < expected or got > expected + (key == in_flight):
+                print(f"FAIL {label}: {key} has {got} reports, {expected} acknowledged")
+                ok = False
+    if store.replayed > REPLAY_BOUND:
+        print(f"FAIL {label}: replayed {store.replayed} records, snapshots every {SNAPSHOT_EVERY}")
+        ok = False
+    offline, *_ = load(store.snapshot_file, store.wal_file)
+    if list(offline) != store.reports():
+        print(f"FAIL {label}: offline export differs from the store")
+        ok = False
+    total = sum(acked.values())
+    # Close without snapshotting, like a crash, so the next run starts from the same state
+    store._wal.close()
+    if ok:
+        print(f"ok   {label}: {total} acknowledged reports, replayed {store.replayed} WAL records")
+    return ok
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--writer":
+        writer(sys.argv[2], int(sys.argv[3]))
+        return
+
+    parser = argparse.ArgumentParser(description="Kill report store writers at random points and check recovery")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ok = True
+    acked = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(args.runs):
+            acked[run] = crash_writer(directory, run, rng)
+            kind = damage(directory, rng)
+            ok &= check(directory, acked, f"run {run} (damage: {kind})")
+
+        # A malformed report is rejected and the store still reopens
+        store = store_in(directory).open()
+        before = len(store)
+        try:
+            store.add(malformed(args.runs, 0))
+            print("FAIL malformed report: accepted")
+            ok = False
+        except ValueError:
+            store._wal.close()
+            reopened = store_in(directory).open()
+            if len(reopened) != before:
+                print("FAIL malformed report: stored")
+                ok = False
+            else:
+                print("ok   malformed report: rejected before the WAL, store reopens")
+            reopened._wal.close()
+
+        # A clean shutdown leaves a snapshot and an empty WAL
+        store = store_in(directory).open()
+        store.close()
+        reopened = store_in(directory).open()
+        if reopened.replayed or len(reopened) != len(store):
+            print("FAIL clean shutdown: WAL not empty or reports missing")
+            ok = False
+        else:
+            print(f"ok   clean shutdown: {len(reopened)} entries from the snapshot alone")
+        reopened.close()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Scale-out mode of the report backend.
+
+With REPORT_SHARDS=N (N > 1), `python main.py` starts N worker processes
+instead of one. Every worker:
+
+- accepts public connections on the same port, through SO_REUSEPORT (the
+  kernel spreads connections across workers; Linux only)
+- owns one shard of the reports: stations are assigned to shards by CRC32
+  of station_id, and the shard's store files get a ".shardI" suffix, so
+  each shard has its own dedupe index, snapshot and WAL
+- listens on 127.0.0.1:INTERNAL_PORT+I for requests from other workers
+
+A report arriving at a worker that doesn't own its station is forwarded to
+the owner over the internal port. Reads spanning all stations (/health,
+/alerts, /reports/stats) fan in: the worker asks the others for their
+part through /internal/... endpoints, which only answer on internal ports.
+Now-playing polling stays in shard 0, other workers proxy to it, so each
+station is still polled once.
+
+A shard that is down or too slow makes forwarded requests fail with 502 or
+504 (ShardUnavailable), while fan-in reads return the other shards' part.
+
+`python bench_cluster.py` measures report throughput with 1, 2, 4... shards.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+INTERNAL_PORT = 9100
+INTERNAL_TIMEOUT = 10.0
+
+
+class ShardUnavailable(Exception):
+    """A request to another shard failed; `status_code` is 504 on timeout, else 502."""
+
+    def __init__(self, shard: int, error: httpx.HTTPError):
+        self.shard = shard
+        self.status_code = 504 if isinstance(error, httpx.TimeoutException) else 502
+        super().__init__(f"shard {shard}: {type(error).__name__}")
+
+
+def shard_of(station_id: str, shards: int) -> int:
+    """Shard owning `station_id`, the same in every process (unlike hash())."""
+    return zlib.crc32(station_id.encode("utf-8")) % shards
+
+
+class Cluster:
+    """This worker's place among the shards, and calls to the other workers."""
+
+    def __init__(self, shards: int = None, shard: int = None, internal_port: int = None):
+        # Read when created, as workers set them just before importing the app
+        env = os.environ
+        self.shards = shards or int(env.get("REPORT_SHARDS", "1"))
+        self.shard = shard if shard is not None else int(env.get("REPORT_SHARD", "0"))
+        self.internal_port = internal_port or int(env.get("REPORT_INTERNAL_PORT", INTERNAL_PORT))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.shards > 1
+
+    def owner(self, station_id: str) -> int:
+        return shard_of(station_id, self.shards)
+
+    def owns(self, station_id: str) -> bool:
+        return self.owner(station_id) == self.shard
+
+    def shard_path(self, path: str) -> str:
+        """reports.wal -> reports.shard2.wal when sharded."""
+        if not self.enabled:
+            return path
+        p = Path(path)
+        return str(p.with_name(f"{p.stem}.shard{self.shard}{p.suffix}"))
+
+    def is_internal(self, request) -> bool:
+        """Whether `request` came in on this worker's internal port."""
+        server = request.scope.get("server")
+        return self.enabled and server is not None and server[1] == self.internal_port + self.shard
+
+    def url(self, shard: int, path: str) -> str:
+        return f"http://127.0.0.1:{self.internal_port + shard}{path}"
+
+    async def start(self):
+        if self.enabled:
+            self._client = httpx.AsyncClient(timeout=INTERNAL_TIMEOUT)
+
+    async def stop(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def forward(self, shard: int, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request to `shard`'s internal port; raises ShardUnavailable if it fails."""
+        try:
+            return await self._client.request(method, self.url(shard, path), **kwargs)
+        except httpx.HTTPError as e:
+            raise ShardUnavailable(shard, e) from e
+
+    async def _get_json(self, shard: int, path: str):
+        response = await self.forward(shard, "GET", path)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ShardUnavailable(shard, e) from e
+        return response.json()
+
+    async def gather(self, path: str) -> List:
+        """JSON from `path` on every other shard that answers (empty when not sharded)."""
+        if not self.enabled:
+            return []
+        others = [shard for shard in range(self.shards) if shard != self.shard]
+        results = await asyncio.gather(*(self._get_json(shard, path) for shard in others), return_exceptions=True)
+        answers = []
+        for result in results:
+            if isinstance(result, ShardUnavailable):
+                print(f"Fan-in of {path} without {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                answers.append(result)
+        return answers
+
+
+def _bind(host: str, port: int, reuse_port: bool) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    # Accepted connections inherit it; asyncio only sets it itself on sockets it created
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker(app: str, shard: int, shards: int, host: str, port: int, internal_port: int):
+    # Set before the app module is imported, which reads them
+    os.environ.update(REPORT_SHARDS=str(shards), REPORT_SHARD=str(shard),
+                      REPORT_INTERNAL_PORT=str(internal_port))
+    import uvicorn
+    sockets = [_bind(host, port, reuse_port=True), _bind("127.0.0.1", internal_port + shard, reuse_port=False)]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    try:
+        server.run(sockets=sockets)
+    except KeyboardInterrupt:
+        pass
+
+
+def run(app: str, host: str, port: int, shards: int, internal_port: int = INTERNAL_PORT):
+    """Run `shards` workers of `app` ("module:attribute") on `port` until interrupted."""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_worker, args=(app, shard, shards, host, port, internal_port))
+               for shard in range(shards)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
@@ -1,24 +1,111 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
 from datetime import datetime
-import json
-import os
+import time
 
-app = FastAPI()
+import httpx
+
+import nowplaying
+from cluster import INTERNAL_TIMEOUT, Cluster, ShardUnavailable
+from report_probe import ReportProber
+from report_store import ReportStore
+from report_table import ERROR_CODE_RANGE, REPORT_COUNT_RANGE
+from station_health import HealthFeed
+from report_alerts import MAX_EVENTS, WEBHOOK_URL, MemorySink, SpikeDetector, WebhookSink
 
 REPORTS_FILE = "reports.json"
+REPORTS_SNAPSHOT = "reports.snapshot"
+REPORTS_WAL = "reports.wal"
 
 class StreamReport(BaseModel):
     station_id: str
     stream_url: str
-    error_code: int
+    error_code: int = Field(ge=ERROR_CODE_RANGE[0], le=ERROR_CODE_RANGE[1])
     error_message: str
     device_info: str
     app_version: str = "unknown"
     user_agent: str = "unknown"
     country: str = "unknown"
     timestamp: str = None
-    report_count: int = 1
+    report_count: int = Field(1, ge=REPORT_COUNT_RANGE[0], le=REPORT_COUNT_RANGE[1])
+
+# This worker's shard of the reports when running several (REPORT_SHARDS, see cluster.py)
+cluster = Cluster()
+
+# Aggregated reports, persisted as snapshot + write-ahead log. A reports.json from
+# before the store is imported once; export one with `python report_store.py`
+store = ReportStore(cluster.shard_path(REPORTS_SNAPSHOT), cluster.shard_path(REPORTS_WAL),
+                    import_file=cluster.shard_path(REPORTS_FILE))
+
+def annotate_reports(key, verdict):
+    """Store the server-side verdict on the aggregated reports of a (station_id, stream_url)."""
+    station_id, stream_url = key
+    if store.annotate(station_id, stream_url, verdict):
+        health.invalidate()
+
+# Compact per-station health for clients, from reports and probe verdicts
+health = HealthFeed(nowplaying.STATIONS_FILE, lambda: store.table)
+
+# Alerts when a station's failure reports spike above their usual rate
+alerts = SpikeDetector(WebhookSink(WEBHOOK_URL) if WEBHOOK_URL else MemorySink())
+
+# Checks reported streams from the server (one probe per URL per burst)
+prober = ReportProber(nowplaying.STATIONS_FILE, on_verdict=annotate_reports)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store.open()
+    await cluster.start()
+    await prober.start()
+    try:
+        if cluster.shard == 0:
+            # Only one worker polls now-playing metadata
+            async with nowplaying.lifespan(app):
+                yield
+        else:
+            yield
+    finally:
+        await prober.stop()
+        if isinstance(alerts.sink, WebhookSink):
+            await alerts.sink.close()
+        await cluster.stop()
+        store.close()
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(nowplaying.router)
+
+# Long-polls are held up to MAX_WAIT seconds by shard 0
+LONG_POLL_TIMEOUT = httpx.Timeout(INTERNAL_TIMEOUT, read=nowplaying.MAX_WAIT + INTERNAL_TIMEOUT)
+
+def shard_unavailable(error: ShardUnavailable):
+    return JSONResponse({"detail": str(error)}, status_code=error.status_code)
+
+@app.exception_handler(ShardUnavailable)
+async def handle_shard_unavailable(request: Request, error: ShardUnavailable):
+    return shard_unavailable(error)
+
+@app.middleware("http")
+async def proxy_nowplaying(request: Request, call_next):
+    """Other workers pass now-playing requests to shard 0, which polls."""
+    if cluster.shard != 0 and request.url.path.startswith("/nowplaying"):
+        try:
+            response = await cluster.forward(0, request.method, request.url.path, params=request.query_params,
+                                             content=await request.body(), timeout=LONG_POLL_TIMEOUT,
+                                             headers={k: v for k, v in request.headers.items()
+                                                      if k in ("content-type", "if-none-match")})
+        except ShardUnavailable as e:
+            # Raised in a middleware, it wouldn't reach the exception handlers
+            return shard_unavailable(e)
+        headers = {k: v for k, v in response.headers.items() if k in ("etag", "cache-control")}
+        return Response(content=response.content, status_code=response.status_code, headers=headers,
+                        media_type=response.headers.get("content-type"))
+    return await call_next(request)
+
+def internal_only(request: Request):
+    if not cluster.is_internal(request):
+        raise HTTPException(status_code=404, detail="Not Found")
 
 @app.post("/report")
 async def report_issue(report: StreamReport):
@@ -26,37 +113,94 @@ async def report_issue(report: StreamReport):
         report.timestamp = datetime.now().isoformat()
     
     report_data = report.dict()
-    
-    # Key fields for identifying "duplicate" reports
-    dedupe_keys = ["station_id", "stream_url", "error_code", "device_info", "app_version", "user_agent", "country"]
+    if not cluster.owns(report.station_id):
+        response = await cluster.forward(cluster.owner(report.station_id), "POST", "/report", json=report_data)
+        return Response(content=response.content, status_code=response.status_code, media_type="application/json")
+    alerts.ingest(report.station_id, report.error_code, time.monotonic())
     
     try:
-        reports = []
-        if os.path.exists(REPORTS_FILE):
-            with open(REPORTS_FILE, "r") as f:
-                reports = json.load(f)
-        
-        # Check for existing duplicate
-        found = False
-        for existing in reports:
-            # Check if all dedupe keys match
-            if all(existing.get(k) == report_data.get(k) for k in dedupe_keys):
-                existing["report_count"] = existing.get("report_count", 1) + 1
-                existing["timestamp"] = report_data["timestamp"]  # Update to latest occurrence
-                existing["error_message"] = report_data["error_message"] # Update message if it changed
-                found = True
-                break
+        probe_url = prober.url_for(report.station_id, report.stream_url)
+        verdict = prober.cached_verdict(probe_url)
+        found = store.add(report_data, verdict)
+        health.invalidate()
         
-        if not found:
-            reports.append(report_data)
-        
-        with open(REPORTS_FILE, "w") as f:
-            json.dump(reports, f, indent=4)
+        # Check the stream ourselves, unless a recent verdict is already attached
+        if probe_url and not verdict:
+            prober.schedule(probe_url, (report.station_id, report.stream_url))
             
         return {"status": "success", "message": "Report received and merged" if found else "Report received"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/health")
+async def get_health(request: Request):
+    if health.due():
+        health.refresh(await cluster.gather("/internal/health"))
+    gzipped = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"ETag": health.etag_for(gzipped), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if health.not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=health.gzipped, media_type="application/json", headers=headers)
+    return Response(content=health.body, media_type="application/json", headers=headers)
+
+def local_alerts():
+    return {"active": alerts.active(time.monotonic()), "recent": list(alerts.events)}
+
+def local_stats():
+    table = store.table
+    return {
+        "reports": sum(table.report_count),
+        "keys": len(table),
+        "by_station": table.count_by("station_id"),
+        "by_error_code": {str(code): count for code, count in table.count_by("error_code").items()},
+    }
+
+@app.get("/alerts")
+async def get_alerts():
+    """Open report-spike alerts and the latest alert events."""
+    result = local_alerts()
+    for other in await cluster.gather("/internal/alerts"):
+        result["active"] += other["active"]
+        result["recent"] += other["recent"]
+    result["recent"] = sorted(result["recent"], key=lambda e: e["at"])[-MAX_EVENTS:]
+    return result
+
+@app.get("/reports/stats")
+async def get_report_stats():
+    """Report occurrences per station and per error code, over all shards."""
+    result = local_stats()
+    others = await cluster.gather("/internal/reports/stats")
+    for other in others:
+        result["reports"] += other["reports"]
+        result["keys"] += other["keys"]
+        for field in ("by_station", "by_error_code"):
+            for key, count in other[field].items():
+                result[field][key] = result[field].get(key, 0) + count
+    result["shards"] = cluster.shards
+    result["shards_answered"] = 1 + len(others)
+    return result
+
+@app.get("/internal/health", include_in_schema=False)
+async def internal_health(request: Request):
+    internal_only(request)
+    return health.local_state()
+
+@app.get("/internal/alerts", include_in_schema=False)
+async def internal_alerts(request: Request):
+    internal_only(request)
+    return local_alerts()
+
+@app.get("/internal/reports/stats", include_in_schema=False)
+async def internal_report_stats(request: Request):
+    internal_only(request)
+    return local_stats()
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if cluster.enabled:
+        from cluster import run
+        run("main:app", host="0.0.0.0", port=8000, shards=cluster.shards, internal_port=cluster.internal_port)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
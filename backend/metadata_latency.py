@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+How long after a track change does each metadata source show it?
+
+Watches stations through all their sources at once: the provider API of
+stations.yaml (bbc_rms, radio_france, radio_nova) and the metadata inside
+the stream (ICY blocks or Ogg comments, the "icy" provider of
+nowplaying.py). Every source is polled at the same instants, every
+--interval seconds, with the providers' own code, and each result is
+stamped with the wall clock when it came back, so change events of
+different sources line up on one clock.
+
+    python backend/metadata_latency.py record --stations bbc_radio_one,fip --minutes 60 --out session.jsonl
+    python backend/metadata_latency.py report session.jsonl [--json report.json] [--baseline report.json]
+    python backend/metadata_latency.py simulate --out session.jsonl
+
+A session is JSON lines: a header with the sources of each station, then
+one line per poll (time, station, source, duration, result or error).
+`report` replays a session offline. Change events are matched across
+sources by normalized title; a track's change time is when the first
+source showed it, and the lag of a source is how much later it did. The
+report gives per-station and per-source lag distributions and coverage
+(the share of tracks a source showed at all), and the recommended source
+per station: the freshest one once polled at its production interval
+(POLL_INTERVAL), and among those within LAG_TOLERANCE of it the one
+needing the fewest requests. With --baseline, it exits with an error if
+a lag or a coverage got worse than in a previous report, so recorded
+sessions can serve as regression tests. `simulate` writes a synthetic
+session with known lags, to check the analysis.
+
+Lags are measured to within --interval. HLS timed metadata (ID3 in
+segments) isn't read by the backend, so it isn't a source here.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import httpx
+import yaml
+
+from nowplaying import (MAX_CONCURRENT_POLLS, POLL_INTERVAL, PROVIDERS, REQUEST_TIMEOUT, STATIONS_FILE,
+                        USER_AGENT)
+
+INTERVAL = 10
+# The same title seen by two sources further apart than this is two plays
+MATCH_WINDOW = 600
+# Sources showing fewer tracks than this share can't be recommended
+MIN_COVERAGE = 0.8
+LAG_TOLERANCE = 10.0
+# Regression check: allowed increase in median lag (s) and drop in coverage
+REGRESSION_LAG = 5.0
+REGRESSION_COVERAGE = 0.1
+
+
+def track_key(result: Optional[dict]) -> Optional[str]:
+    """Title comparable across sources: case, accents, punctuation and '(...)' suffixes dropped."""
+    title = (result or {}).get("title")
+    if not title:
+        return None
+    title = re.sub(r"[(\[].*?[)\]]", " ", title)
+    title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    key = re.sub(r"[^a-z0-9]+", " ", title.lower()).strip()
+    return key or None
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 1)
+
+
+def station_sources(stations_file: str, station_ids: List[str]) -> Dict[str, Dict[str, str]]:
+    """{station_id: {source: param}}: the provider API when there is one, and the stream."""
+    with open(stations_file, "r", encoding="utf-8") as f:
+        stations = {s["id"]: s for s in (yaml.safe_load(f) or {}).get("stations", [])}
+    sources = {}
+    for station_id in station_ids:
+        s = stations[station_id]
+        sources[station_id] = {}
+        if s.get("metadata_type") in PROVIDERS and s.get("metadata_param"):
+            sources[station_id][s["metadata_type"]] = s["metadata_param"]
+        if s.get("stream_url"):
+            sources[station_id]["icy"] = s["stream_url"]
+    return sources
+
+
+# --- Recording ---
+
+async def record(sources: Dict[str, Dict[str, str]], seconds: float, interval: float, out):
+    """Poll every source of every station each `interval` seconds, writing the session to `out`."""
+    out.write(json.dumps({"session": 1, "started": time.time(), "interval": interval, "sources": sources}) + "\n")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+
+    async def poll(client, station_id, source, param):
+        async with semaphore:
+            started = time.monotonic()
+            line = {"station_id": station_id, "source": source}
+            try:
+                result = await PROVIDERS[source](client, param)
+                line["result"] = {k: result.get(k) for k in ("artist", "title", "type")} if result else None
+            except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+                line["error"] = f"{type(e).__name__}: {e}"
+            line.update(t=round(time.time(), 3), duration=round(time.monotonic() - started, 3))
+        out.write(json.dumps(line, ensure_ascii=False) + "\n")
+        out.flush()
+
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            await asyncio.gather(*(poll(client, station_id, source, param)
+                                   for station_id, by_source in sources.items()
+                                   for source, param in by_source.items()))
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - tick)))
+
+
+def simulate(out, hours: float = 2, interval: float = INTERVAL, seed: int = 1) -> dict:
+    """
+    Write a synthetic session: two stations with ~3.5 min songs, an in-stream
+    source a few seconds behind the change and an API source later and
+    sometimes missing tracks. Returns the true mean lag of each source.
+    """
+    rng = random.Random(seed)
+    end = hours * 3600
+    lags = {"music_api": {"icy": (3, 2), "radio_nova": (25, 10)},
+            "music_bbc": {"icy": (8, 3), "bbc_rms": (5, 2)}}
+    misses = {"radio_nova": 0.1, "bbc_rms": 0.0, "icy": 0.0}
+    sources = {station_id: {source: "" for source in by_source} for station_id, by_source in lags.items()}
+    out.write(json.dumps({"session": 1, "started": 0.0, "interval": interval, "sources": sources}) + "\n")
+    timelines, true_lags = {}, {}
+    for station_id, by_source in lags.items():
+        changes, t = [], -rng.uniform(0, 200)
+        while t < end:
+            changes.append(t)
+            t += max(60.0, rng.gauss(210, 40))
+        for source, (mean, spread) in by_source.items():
+            shows = [max(0.0, rng.gauss(mean, spread)) for _ in changes]
+            skipped = [rng.random() < misses[source] for _ in changes]
+            timelines[station_id, source] = (changes, shows, skipped)
+            true_lags.setdefault(source, []).extend(shows)
+    t = 0.0
+    while t < end:
+        for (station_id, source), (changes, shows, skipped) in timelines.items():
+            shown = [i for i, c in enumerate(changes) if c + shows[i] <= t and not skipped[i]]
+            result = {"artist": f"Artist {shown[-1]}", "title": f"Song {shown[-1]}", "type": "song"} if shown else None
+            out.write(json.dumps({"station_id": station_id, "source": source, "result": result,
+                                  "t": round(t + rng.uniform(0.05, 0.5), 3), "duration": 0.2}) + "\n")
+        t += interval
+    return {source: round(sum(v) / len(v), 1) for source, v in true_lags.items()}
+
+
+# --- Analysis ---
+
+def load_session(path: str) -> tuple:
+    """(header, poll lines sorted by time)."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        polls = [json.loads(line) for line in f if line.strip()]
+    polls.sort(key=lambda p: p["t"])
+    return header, polls
+
+
+def station_tracks(polls: List[dict]) -> List[dict]:
+    """Track changes of one station, each {source: time it was first shown}.
+
+    The track playing when a source was first polled has no known change
+    time: it is left out, as is any later play that matches it.
+    """
+    current, initial = {}, set()
+    tracks, open_tracks = [], {}
+    for poll in polls:
+        key = track_key(poll.get("result"))
+        source = poll["source"]
+        if key is None or "error" in poll:
+            continue
+        if source not in current:
+            current[source] = key
+            initial.add(key)
+            continue
+        if key == current[source]:
+            continue
+        current[source] = key
+        if key in initial:
+            continue
+        track = open_tracks.get(key)
+        if track is None or source in track or poll["t"] - min(track.values()) > MATCH_WINDOW:
+            track = open_tracks[key] = {}
+            tracks.append(track)
+        track[source] = poll["t"]
+    return tracks
+
+
+def lag_stats(lags: List[float], shown: int, tracks: int) -> dict:
+    return {"tracks": shown, "coverage": round(shown / tracks, 2) if tracks else None,
+            "p50": percentile(lags, 0.5), "p90": percentile(lags, 0.9), "max": percentile(lags, 1.0)}
+
+
+def recommend(by_source: Dict[str, dict]) -> Optional[dict]:
+    """Freshest source at its production poll interval, fewest requests among near ties."""
+    candidates = []
+    for source, stats in by_source.items():
+        if stats["p50"] is None or (stats["coverage"] or 0) < MIN_COVERAGE:
+            continue
+        interval = POLL_INTERVAL[source]
+        candidates.append({"source": source, "expected_lag": round(stats["p50"] + interval / 2, 1),
+                           "requests_per_hour": round(3600 / interval)})
+    if not candidates:
+        return None
+    best = min(c["expected_lag"] for c in candidates)
+    near = [c for c in candidates if c["expected_lag"] <= best + LAG_TOLERANCE]
+    return min(near, key=lambda c: (c["requests_per_hour"], c["expected_lag"]))
+
+
+def analyze(header: dict, polls: List[dict]) -> dict:
+    report = {"interval": header["interval"], "stations": {}, "sources": {}}
+    all_lags: Dict[str, List[float]] = {}
+    all_shown: Dict[str, List[int]] = {}
+    for station_id, sources in header["sources"].items():
+        station_polls = [p for p in polls if p["station_id"] == station_id]
+        tracks = station_tracks(station_polls)
+        # Only tracks shown by two sources or more tell anything about lags
+        compared = [t for t in tracks if len(t) > 1]
+        by_source = {}
+        for source in sources:
+            lags = [t[source] - min(t.values()) for t in compared if source in t]
+            shown = sum(1 for t in tracks if source in t)
+            mine = [p for p in station_polls if p["source"] == source]
+            by_source[source] = dict(lag_stats(lags, shown, len(tracks)), polls=len(mine),
+                                     errors=sum(1 for p in mine if "error" in p))
+            all_lags.setdefault(source, []).extend(lags)
+            all_shown.setdefault(source, [0, 0])
+            all_shown[source][0] += shown
+            all_shown[source][1] += len(tracks)
+        report["stations"][station_id] = {"tracks": len(tracks), "sources": by_source,
+                                          "recommended": recommend(by_source)}
+    for source, lags in all_lags.items():
+        report["sources"][source] = lag_stats(lags, *all_shown[source])
+    return report
+
+
+def regressions(report: dict, baseline: dict) -> List[str]:
+    """Station sources whose median lag or coverage got worse than in `baseline`."""
+    problems = []
+    for station_id, station in baseline["stations"].items():
+        for source, before in station["sources"].items():
+            after = report["stations"].get(station_id, {}).get("sources", {}).get(source)
+            if after is None:
+                problems.append(f"{station_id}/{source}: missing")
+                continue
+            if before["p50"] is not None and (after["p50"] is None or after["p50"] > before["p50"] + REGRESSION_LAG):
+                problems.append(f"{station_id}/{source}: median lag {before['p50']}s -> {after['p50']}s")
+            if (before["coverage"] or 0) - (after["coverage"] or 0) > REGRESSION_COVERAGE:
+                problems.append(f"{station_id}/{source}: coverage {before['coverage']} -> {after['coverage']}")
+    return problems
+
+
+def print_report(report: dict):
+    def row(name, stats):
+        print(f"  {name:12s} {stats['tracks']:5d} {stats['coverage'] if stats['coverage'] is not None else '-':>8}"
+              f" {stats['p50'] if stats['p50'] is not None else '-':>7} {stats['p90'] if stats['p90'] is not None else '-':>7}"
+              f" {stats['max'] if stats['max'] is not None else '-':>7}")
+
+    header = f"  {'source':12s} {'shown':>5s} {'coverage':>8s} {'p50 s':>7s} {'p90 s':>7s} {'max s':>7s}"
+    print(f"Lags behind the first source to show a track, polled every {report['interval']}s")
+    for station_id, station in report["stations"].items():
+        print(f"\n{station_id}: {station['tracks']} track changes")
+        print(header)
+        for source, stats in station["sources"].items():
+            row(source, stats)
+        best = station["recommended"]
+        if best:
+            print(f"  recommended: {best['source']} (~{best['expected_lag']}s behind at "
+                  f"{best['requests_per_hour']} requests/hour)")
+        else:
+            print("  recommended: none (not enough tracks seen)")
+    print("\nAll stations")
+    print(header)
+    for source, stats in report["sources"].items():
+        row(source, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how late each metadata source shows track changes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="poll stations through all their sources")
+    rec.add_argument("--stations", required=True, help="comma-separated station ids")
+    rec.add_argument("--stations-file", default=STATIONS_FILE)
+    rec.add_argument("--minutes", type=float, default=60)
+    rec.add_argument("--interval", type=float, default=INTERVAL)
+    rec.add_argument("--out", required=True)
+    rep = commands.add_parser("report", help="replay a recorded session and report lags")
+    rep.add_argument("session")
+    rep.add_argument("--json", help="also write the report to this file")
+    rep.add_argument("--baseline", help="fail if lags or coverage got worse than in this report")
+    sim = commands.add_parser("simulate", help="write a synthetic session with known lags")
+    sim.add_argument("--hours", type=float, default=2)
+    sim.add_argument("--seed", type=int, default=1)
+    sim.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        sources = station_sources(args.stations_file, args.stations.split(","))
+        with open(args.out, "w", encoding="utf-8") as out:
+            try:
+                asyncio.run(record(sources, args.minutes * 60, args.interval, out))
+            except KeyboardInterrupt:
+                pass
+    elif args.command == "simulate":
+        with open(args.out, "w", encoding="utf-8") as out:
+            true_lags = simulate(out, args.hours, seed=args.seed)
+        print(f"Mean lag after the change: {true_lags}")
+    else:
+        report = analyze(*load_session(args.session))
+        print_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                problems = regressions(report, json.load(f))
+            for problem in problems:
+                print(f"REGRESSION {problem}")
+            sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
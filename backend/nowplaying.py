@@ -0,0 +1,389 @@
+"""
+Shared now-playing service.
+
+Instead of every phone polling the metadata APIs (or reading ICY metadata)
+for the station it plays, the backend polls each station once, driven by
+`metadata_type`/`metadata_param` in stations.yaml, and serves the cached
+result:
+
+- GET /nowplaying/{station_id} with an ETag; a matching If-None-Match gets
+  304, and with `?wait=N` the request is held (long-poll) until the track
+  changes or N seconds pass
+- POST /nowplaying/batch with {station_id: etag} returns only the stations
+  whose track differs, waiting like above if none does
+
+Stations are only polled while someone asked for them in the last
+DEMAND_WINDOW seconds, so upstream load depends on the number of stations
+being listened to, not on the number of listeners. When to poll next is
+decided per station by poll_scheduler (change prediction, backoff, listener
+demand); GET /nowplaying/stats reports the polls saved. Stations without a
+metadata_type are sampled from the metadata inside their stream: ICY blocks,
+or the Vorbis comments of Ogg Vorbis/Opus streams (stream_metadata.py).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import httpx
+import yaml
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response
+from pydantic import BaseModel
+
+from poll_scheduler import Demand, PollPolicy, PollScheduler, StationSchedule
+from stream_metadata import parser_for
+
+STATIONS_FILE = os.environ.get("STATIONS_FILE", "stations.yaml")
+
+USER_AGENT = "OnAir Radio/1.0 (backend)"
+REQUEST_TIMEOUT = 5.0
+
+# Fixed intervals the adaptive scheduler starts from (and is measured against)
+POLL_INTERVAL = {"bbc_rms": 30, "radio_france": 30, "radio_nova": 30, "icy": 60}
+DEMAND_WINDOW = 600
+MAX_CONCURRENT_POLLS = 8
+MAX_WAIT = 30
+
+# In-stream sampling: give up if no metadata shows up within this many bytes
+STREAM_MAX_BYTES = 256 * 1024
+
+
+class NowPlaying(BaseModel):
+    station_id: str
+    artist: Optional[str] = None
+    title: Optional[str] = None
+    artwork_url: Optional[str] = None
+    type: str = "unknown"  # song, program or unknown
+    source: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+def _clean(value) -> Optional[str]:
+    value = (value or "").strip() if isinstance(value, str) else value
+    return value or None
+
+
+# --- Providers (ports of the app's MetadataProvider implementations) ---
+
+async def fetch_bbc(client: httpx.AsyncClient, param: str) -> Optional[dict]:
+    response = await client.get(f"https://rms.api.bbc.co.uk/v2/services/{param}/segments/latest")
+    response.raise_for_status()
+    data = response.json().get("data") or []
+    if data and (data[0].get("offset") or {}).get("now_playing"):
+        titles = data[0].get("titles") or {}
+        if _clean(titles.get("secondary")):
+            return {"artist": _clean(titles.get("primary")), "title": _clean(titles.get("secondary")),
+                    "type": "song"}
+    return None
+
+
+async def fetch_radio_france(client: httpx.AsyncClient, param: str) -> Optional[dict]:
+    response = await client.get(f"https://api.radiofrance.fr/livemeta/pull/{param}")
+    response.raise_for_status()
+    steps = response.json().get("steps") or {}
+    now = time.time()
+    best = None
+    for step in steps.values():
+        start = step.get("start") or 0
+        end = step.get("end") or float("inf")
+        if start <= now < end and (best is None or step.get("depth", 0) > best.get("depth", 0)):
+            best = step
+    if best is None:
+        return None
+    # The step's end tells the scheduler when to look again
+    ends_at = best.get("end")
+    if best.get("embedType") == "song":
+        return {"artist": _clean(best.get("authors")), "title": _clean(best.get("title")), "type": "song",
+                "ends_at": ends_at}
+    return {"artist": _clean(best.get("titleConcept")), "title": _clean(best.get("title")), "type": "program",
+            "ends_at": ends_at}
+
+
+async def fetch_radio_nova(client: httpx.AsyncClient, param: str) -> Optional[dict]:
+    response = await client.get("https://www.nova.fr/radios-data/www.nova.fr/all.json")
+    response.raise_for_status()
+    for entry in response.json():
+        radio = entry.get("radio") or {}
+        if param not in (radio.get("code"), radio.get("name")):
+            continue
+        track = entry.get("currentTrack")
+        if track:
+            return {"artist": _clean(track.get("artist")), "title": _clean(track.get("title")), "type": "song"}
+        show = entry.get("currentShow")
+        if show:
+            return {"artist": _clean(show.get("author")), "title": _clean(show.get("title")), "type": "program"}
+        # Station name, so the previous track gets cleared
+        return {"artist": None, "title": _clean(radio.get("name")), "type": "program"}
+    return None
+
+
+async def fetch_stream(client: httpx.AsyncClient, stream_url: str) -> Optional[dict]:
+    """Read the stream up to its first in-stream metadata (ICY block or Ogg comment header)."""
+    async with client.stream("GET", stream_url, headers={"Icy-MetaData": "1"}) as response:
+        response.raise_for_status()
+        parser = parser_for(response.headers)
+        if parser is None:
+            return None
+        read = 0
+        async for chunk in response.aiter_raw():
+            events = parser.feed(chunk)
+            if events:
+                return events[0]
+            read += len(chunk)
+            if read > STREAM_MAX_BYTES:
+                return None
+    return None
+
+
+PROVIDERS = {
+    "bbc_rms": fetch_bbc,
+    "radio_france": fetch_radio_france,
+    "radio_nova": fetch_radio_nova,
+    "icy": fetch_stream,
+}
+
+
+# --- Cache and polling ---
+
+def etag_of(data: dict) -> str:
+    key = json.dumps([data.get(k) for k in ("artist", "title", "artwork_url", "type")], ensure_ascii=False)
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + '"'
+
+
+class StationState:
+    """Current track of a station, plus what's needed to poll and long-poll it."""
+
+    def __init__(self, station_id: str, provider: str, param: str):
+        self.station_id = station_id
+        self.provider = provider
+        self.param = param
+        self.data = NowPlaying(station_id=station_id, source=provider).dict()
+        self.etag = etag_of(self.data)
+        self.changed = asyncio.Event()
+        self.last_requested = 0.0
+        self.demand = Demand()
+        self.schedule = StationSchedule(PollPolicy(base_interval=POLL_INTERVAL[provider]))
+        self.polled = False
+
+    def update(self, result: Optional[dict]) -> bool:
+        """Store a poll result. Returns whether the track changed."""
+        data = dict(self.data, artist=None, title=None, artwork_url=None, type="unknown")
+        data.update(result or {})
+        data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.data = data
+        etag = etag_of(data)
+        if etag == self.etag and self.polled:
+            return False
+        self.etag = etag
+        self.polled = True
+        # Wake the long-polls waiting on the previous track
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+        return True
+
+
+def load_stations(path: str = STATIONS_FILE) -> Dict[str, StationState]:
+    with open(path, "r", encoding="utf-8") as f:
+        stations = (yaml.safe_load(f) or {}).get("stations", [])
+    states = {}
+    for s in stations:
+        provider = s.get("metadata_type")
+        param = s.get("metadata_param")
+        if provider not in PROVIDERS or not param:
+            provider, param = "icy", s.get("stream_url")
+        if param:
+            states[s["id"]] = StationState(s["id"], provider, param)
+    return states
+
+
+class NowPlayingService:
+    """Polls the stations in demand and keeps their current track."""
+
+    def __init__(self, stations_file: str = STATIONS_FILE):
+        self.stations_file = stations_file
+        self.stations: Dict[str, StationState] = {}
+        self.upstream_requests = 0
+        self.scheduler = PollScheduler()
+        self._running = set()
+        self._client = None
+        self._task = None
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        if os.path.exists(self.stations_file):
+            self.stations = load_stations(self.stations_file)
+        self._client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT, follow_redirects=True,
+                                         headers={"User-Agent": USER_AGENT})
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._client:
+            await self._client.aclose()
+
+    def get(self, station_id: str) -> StationState:
+        state = self.stations.get(station_id)
+        if state is None:
+            raise KeyError(station_id)
+        now = time.monotonic()
+        state.last_requested = now
+        state.demand.hit(now)
+        if station_id not in self.scheduler and station_id not in self._running:
+            # Not polled while nobody listened: start now
+            self.scheduler.schedule(station_id, now, state.demand.value(now))
+            self._wakeup.set()
+        return state
+
+    async def _poll(self, state: StationState):
+        async with self._semaphore:
+            self.upstream_requests += 1
+            try:
+                result = await PROVIDERS[state.provider](self._client, state.param)
+            except (httpx.HTTPError, ValueError, KeyError, TypeError):
+                # Keep the last known track; the next poll may succeed
+                result = None
+                state.schedule.on_error()
+            else:
+                result = dict(result or {})
+                ends_at = result.pop("ends_at", None)
+                now = time.monotonic()
+                changed = state.update(result)
+                # Provider hints are wall-clock timestamps
+                ends_at = ends_at - time.time() + now if ends_at else None
+                state.schedule.on_result(now, changed, ends_at)
+        now = time.monotonic()
+        self.scheduler.record_poll(state.station_id, now, state.schedule.policy.base_interval)
+        demand = state.demand.value(now)
+        self.scheduler.schedule(state.station_id, now + state.schedule.next_interval(now, demand), demand)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            for station_id in self.scheduler.pop_due(now):
+                state = self.stations[station_id]
+                if now - state.last_requested > DEMAND_WINDOW:
+                    # Nobody listening any more: stop polling until the next request
+                    self.scheduler.cancel(station_id)
+                    continue
+                self._running.add(station_id)
+                task = asyncio.create_task(self._poll(state))
+                task.add_done_callback(lambda _, key=station_id: self._running.discard(key))
+            self._wakeup.clear()
+            next_due = self.scheduler.next_due()
+            timeout = 60.0 if next_due is None else max(0.0, next_due - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(timeout, 60.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return dict(self.scheduler.stats(), upstream_requests=self.upstream_requests,
+                    stations_polled=len(self.scheduler) + len(self._running),
+                    listeners={s.station_id: round(s.demand.value(now), 1) for s in self.stations.values()
+                               if now - s.last_requested < DEMAND_WINDOW})
+
+    async def wait_for_change(self, states: list, timeout: float, every: bool = False) -> None:
+        """Return when any (or `every`) of `states` changes, or after `timeout` seconds."""
+        waiters = [asyncio.ensure_future(state.changed.wait()) for state in states]
+        try:
+            await asyncio.wait(waiters, timeout=timeout,
+                               return_when=asyncio.ALL_COMPLETED if every else asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+
+service = NowPlayingService()
+router = APIRouter()
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+@router.get("/nowplaying/stats")
+async def get_poll_stats():
+    """Polling statistics, including polls saved against fixed-interval polling."""
+    return service.stats()
+
+
+@router.get("/nowplaying/{station_id}")
+async def get_now_playing(station_id: str, request: Request, wait: float = 0):
+    try:
+        state = service.get(station_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown station")
+
+    if_none_match = request.headers.get("if-none-match")
+    wait = min(max(wait, 0), MAX_WAIT)
+    # A first request waits for the first poll rather than returning nothing
+    if not state.polled or (wait and _matches(if_none_match, state.etag)):
+        await service.wait_for_change([state], wait or REQUEST_TIMEOUT)
+
+    headers = {"ETag": state.etag, "Cache-Control": "no-cache"}
+    if _matches(if_none_match, state.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=json.dumps(state.data), media_type="application/json", headers=headers)
+
+
+class BatchRequest(BaseModel):
+    # station_id -> ETag the client already has (or null)
+    stations: Dict[str, Optional[str]]
+    wait: float = 0
+
+
+@router.post("/nowplaying/batch")
+async def get_now_playing_batch(batch: BatchRequest):
+    states = []
+    for station_id in batch.stations:
+        try:
+            states.append(service.get(station_id))
+        except KeyError:
+            continue
+
+    def changed():
+        return {s.station_id: dict(s.data, etag=s.etag) for s in states
+                if s.polled and batch.stations[s.station_id] != s.etag}
+
+    # Stations nobody asked for recently get their first poll now
+    unpolled = [s for s in states if not s.polled]
+    if unpolled:
+        await service.wait_for_change(unpolled, REQUEST_TIMEOUT, every=True)
+    result = changed()
+    wait = min(max(batch.wait, 0), MAX_WAIT)
+    if not result and states and wait:
+        await service.wait_for_change(states, wait)
+        result = changed()
+    return {"stations": result}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    standalone = FastAPI(lifespan=lifespan)
+    standalone.include_router(router)
+    uvicorn.run(standalone, host="0.0.0.0", port=8001)
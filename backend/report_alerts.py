@@ -0,0 +1,202 @@
+"""
+Spike detection on incoming failure reports.
+
+Outages used to be found by reading reports.json. The detector keeps, per
+station and per (station, error code), two exponentially decaying report
+counts (poll_scheduler.Demand): a fast one measuring the current rate and a
+slow one acting as the learned baseline. Each report updates them in O(1).
+
+An alert opens when the current rate is SPIKE_FACTOR times the baseline
+(and at least MIN_REPORTS reports are in the fast window), and resolves
+when it falls back under RESOLVE_FACTOR times the baseline. Open and
+resolve events go to GET /alerts and to a sink: a webhook when
+ALERT_WEBHOOK_URL is set, or MemorySink, which keeps them in a list for
+tests and the simulation.
+
+Memory is bounded: counters are kept for at most MAX_KEYS keys, least
+recently reported first out, and devices are never part of a key. An open
+alert whose key is evicted gets a resolved event with reason "evicted".
+
+`python report_alerts.py` simulates background reports with an outage and
+prints the events.
+"""
+
+import asyncio
+import math
+import os
+import random
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from poll_scheduler import Demand
+
+FAST_HALF_LIFE = 300.0          # current rate: last few minutes
+BASELINE_HALF_LIFE = 6 * 3600.0
+SPIKE_FACTOR = 5.0
+RESOLVE_FACTOR = 2.0
+MIN_REPORTS = 5
+# Reports/second assumed for keys with no history yet, so that the first
+# few reports of a rarely reported station don't open an alert
+BASELINE_FLOOR = 1 / 3600
+MAX_KEYS = 10000
+MAX_EVENTS = 100
+
+WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL")
+WEBHOOK_TIMEOUT = 5.0
+
+
+class RateCounter:
+    """Current and baseline report rates of one key."""
+
+    __slots__ = ("fast", "baseline", "alert")
+
+    def __init__(self):
+        self.fast = Demand(FAST_HALF_LIFE)
+        self.baseline = Demand(BASELINE_HALF_LIFE)
+        self.alert: Optional[dict] = None
+
+    def hit(self, now: float):
+        self.fast.hit(now)
+        self.baseline.hit(now)
+
+    def rates(self, now: float) -> tuple:
+        """(current, baseline) in reports per second."""
+        current = self.fast.value(now) * math.log(2) / FAST_HALF_LIFE
+        baseline = self.baseline.value(now) * math.log(2) / BASELINE_HALF_LIFE
+        return current, max(baseline, BASELINE_FLOOR)
+
+
+class MemorySink:
+    """Keeps events in a list; stands in for the webhook in tests."""
+
+    def __init__(self):
+        self.events = []
+
+    def send(self, event: dict):
+        self.events.append(event)
+
+
+class WebhookSink:
+    """POSTs each event as JSON to `url`, without blocking report ingestion."""
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT):
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+        self._tasks = set()
+
+    def send(self, event: dict):
+        task = asyncio.get_running_loop().create_task(self._post(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _post(self, event: dict):
+        try:
+            await self._client.post(self.url, json=event)
+        except httpx.HTTPError as e:
+            print(f"Alert webhook failed: {e!r}")
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class SpikeDetector:
+    """Per-station and per-error-code report rates against their baseline."""
+
+    def __init__(self, sink=None, max_keys: int = MAX_KEYS):
+        self.sink = sink if sink is not None else MemorySink()
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[tuple, RateCounter]" = OrderedDict()
+        self._active = {}
+        self.events = deque(maxlen=MAX_EVENTS)
+
+    def _counter(self, key: tuple, now: float) -> RateCounter:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = RateCounter()
+            if len(self._counters) > self.max_keys:
+                evicted, old = self._counters.popitem(last=False)
+                if self._active.pop(evicted, None) is not None:
+                    # Close it for the sink, nothing will resolve it any more
+                    self._emit("resolved", evicted, *old.rates(now), reason="evicted")
+        else:
+            self._counters.move_to_end(key)
+        return counter
+
+    def ingest(self, station_id: str, error_code: int, now: float):
+        for key in ((station_id,), (station_id, error_code)):
+            counter = self._counter(key, now)
+            counter.hit(now)
+            self._check(key, counter, now)
+
+    def _check(self, key: tuple, counter: RateCounter, now: float):
+        current, baseline = counter.rates(now)
+        if counter.alert is None:
+            if counter.fast.value(now) >= MIN_REPORTS and current >= SPIKE_FACTOR * baseline:
+                counter.alert = self._emit("alert", key, current, baseline)
+                self._active[key] = counter
+        elif current < RESOLVE_FACTOR * baseline:
+            self._emit("resolved", key, current, baseline)
+            counter.alert = None
+            self._active.pop(key, None)
+
+    def _emit(self, kind: str, key: tuple, current: float, baseline: float, **extra) -> dict:
+        event = {
+            "event": kind,
+            "station_id": key[0],
+            "error_code": key[1] if len(key) > 1 else None,
+            "rate_per_hour": round(current * 3600, 1),
+            "baseline_per_hour": round(baseline * 3600, 2),
+            "at": datetime.now(timezone.utc).isoformat(),
+            **extra,
+        }
+        self.events.append(event)
+        self.sink.send(event)
+        return event
+
+    def active(self, now: float) -> list:
+        """Open alerts, after resolving those whose rate went back down."""
+        for key, counter in list(self._active.items()):
+            self._check(key, counter, now)
+        return [counter.alert for counter in self._active.values()]
+
+    def __len__(self):
+        return len(self._counters)
+
+
+def simulate(hours: float = 24, seed: int = 1) -> list:
+    """
+    A day of background reports (a few per hour per station, from many
+    devices) with a 20-minute outage of one station; returns the events
+    with the simulated hour they were emitted at.
+    """
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+
+    class TimedSink:
+        def send(self, event):
+            events.append((round(t / 3600, 2), event))
+
+    detector = SpikeDetector(TimedSink())
+    stations = [f"station_{i}" for i in range(50)]
+    outage = (12 * 3600, 12 * 3600 + 1200)
+    next_check = 60.0
+    while t < hours * 3600:
+        t += rng.expovariate(50 * 3 / 3600)
+        detector.ingest(rng.choice(stations), rng.choice([1, 2, 3]), t)
+        while outage[0] <= t < outage[1] and rng.random() < 0.95:
+            t += rng.expovariate(1 / 10)
+            detector.ingest("station_7", 2, t)
+        if t >= next_check:
+            detector.active(t)
+            next_check = t + 60
+    return events
+
+
+if __name__ == "__main__":
+    for hour, event in simulate():
+        print(f"{hour:6.2f}h {event['event']:8} {event['station_id']} error={event['error_code']} "
+              f"rate={event['rate_per_hour']}/h baseline={event['baseline_per_hour']}/h")
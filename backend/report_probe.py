@@ -0,0 +1,208 @@
+"""
+Server-side check of reported streams.
+
+When a listener reports a playback failure, the backend probes the stream
+itself so the report can be triaged without testing URLs by hand. Reports
+come in bursts (every listener of a station that went down reports it), so
+probes are deduplicated:
+
+- single-flight: concurrent requests for the same URL share one probe
+- results are cached for a short TTL, so reports arriving right after a
+  probe reuse its verdict
+
+A burst of thousands of reports for one station thus causes one probe.
+
+Reports are unauthenticated, so the URL a report carries is only probed
+when the catalog knows it for that station (its stream_url or one of its
+alternate_urls); otherwise the station's catalog stream is probed instead.
+Redirects are followed by hand and every hop must resolve to public
+addresses: no loopback (the shard ports of cluster.py), private or
+link-local (cloud metadata) targets.
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+import httpx
+import yaml
+
+USER_AGENT = "OnAir Radio/1.0 (backend)"
+PROBE_TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+
+# How long a verdict is reused; failures are re-checked sooner
+VERDICT_TTL = {"up": 300.0, "down": 60.0, "not_audio": 300.0}
+
+AUDIO_TYPES = ("audio/", "application/ogg", "video/")
+PLAYLIST_TYPES = ("mpegurl", "scpls", "pls+xml")
+
+
+async def blocked(url: httpx.URL) -> Optional[str]:
+    """Why the server must not connect to `url`, or None if it resolves to public addresses only."""
+    if url.scheme not in ("http", "https") or not url.host:
+        return f"unsupported URL {url}"
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        return None     # The connection fails the same way, with the usual verdict
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            return f"non-public address {address}"
+    return None
+
+
+async def probe_stream(client: httpx.AsyncClient, url: str) -> dict:
+    """Connect to `url` and read its first bytes. Returns a verdict dict.
+
+    `client` must not follow redirects: they are followed here, checking each hop.
+    """
+    verdict = {"url": url, "checked_at": datetime.now(timezone.utc).isoformat()}
+    started = time.monotonic()
+    target = httpx.URL(url)
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            reason = await blocked(target)
+            if reason:
+                return dict(verdict, verdict="down", detail=f"blocked: {reason}")
+            if str(target) != url:
+                verdict["final_url"] = str(target)
+            async with client.stream("GET", target) as response:
+                if response.is_redirect:
+                    target = target.join(response.headers["location"])
+                    continue
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                verdict.update(status=response.status_code, content_type=content_type)
+                if response.status_code >= 400:
+                    return dict(verdict, verdict="down", detail=f"HTTP {response.status_code}")
+                if not (content_type.startswith(AUDIO_TYPES) or any(t in content_type for t in PLAYLIST_TYPES)):
+                    return dict(verdict, verdict="not_audio", detail=content_type or "no content type")
+                async for chunk in response.aiter_raw():
+                    if chunk:
+                        return dict(verdict, verdict="up",
+                                    detail=f"first bytes after {time.monotonic() - started:.2f}s")
+                return dict(verdict, verdict="down", detail="no data")
+        return dict(verdict, verdict="down", detail="too many redirects")
+    except httpx.HTTPError as e:
+        return dict(verdict, verdict="down", detail=type(e).__name__)
+
+
+class SingleFlightCache:
+    """Async memoization with in-flight deduplication and per-result TTL."""
+
+    def __init__(self, ttl: Callable[[dict], float]):
+        self._ttl = ttl
+        self._results: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def cached(self, key: str) -> Optional[dict]:
+        entry = self._results.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def get(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        result = self.cached(key)
+        if result is not None:
+            return result
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            self._results[key] = (time.monotonic() + self._ttl(result), result)
+
+
+def load_catalog_urls(path: str) -> Dict[str, List[str]]:
+    """station_id -> [stream_url, alternate_urls...] from stations.yaml."""
+    with open(path, "r", encoding="utf-8") as f:
+        stations = (yaml.safe_load(f) or {}).get("stations", [])
+    return {s["id"]: [s["stream_url"]] + list(s.get("alternate_urls") or [])
+            for s in stations if s.get("stream_url")}
+
+
+class ReportProber:
+    """
+    Probes reported streams in the background, at most once per URL at a time.
+
+    `on_verdict(key, verdict)` is called once per distinct key (e.g. the
+    reported station and URL) waiting on a probe, however many reports
+    asked for it.
+    """
+
+    def __init__(self, catalog_file: str, on_verdict: Callable[[Hashable, dict], None]):
+        self.catalog_file = catalog_file
+        self.on_verdict = on_verdict
+        self.catalog: Dict[str, List[str]] = {}
+        self.probes = 0
+        self.cache = SingleFlightCache(lambda result: VERDICT_TTL.get(result["verdict"], 60.0))
+        self._client = None
+        self._pending: Dict[str, Set[Hashable]] = {}
+        self._tasks = set()
+
+    async def start(self):
+        try:
+            self.catalog = load_catalog_urls(self.catalog_file)
+        except FileNotFoundError:
+            self.catalog = {}
+        self._client = httpx.AsyncClient(timeout=PROBE_TIMEOUT, follow_redirects=False,
+                                         headers={"User-Agent": USER_AGENT})
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def url_for(self, station_id: str, stream_url: str) -> Optional[str]:
+        """The URL to check: the reported one if the catalog knows it for the station, else the catalog's."""
+        urls = self.catalog.get(station_id)
+        if not urls:
+            return None
+        return stream_url if stream_url in urls else urls[0]
+
+    def cached_verdict(self, url: str) -> Optional[dict]:
+        return self.cache.cached(url) if url else None
+
+    async def _probe(self, url: str) -> dict:
+        self.probes += 1
+        return await probe_stream(self._client, url)
+
+    async def check(self, url: str) -> dict:
+        return await self.cache.get(url, lambda: self._probe(url))
+
+    def schedule(self, url: str, key: Hashable):
+        """Check `url` in the background and report the verdict for `key`."""
+        if self._client is None:
+            return
+        if url in self._pending:
+            self._pending[url].add(key)
+            return
+        self._pending[url] = {key}
+
+        async def run():
+            try:
+                verdict = await self.check(url)
+            finally:
+                keys = self._pending.pop(url, set())
+            for k in keys:
+                self.on_verdict(k, verdict)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {"probes": self.probes, "in_flight": len(self._pending)}
@@ -0,0 +1,304 @@
+"""
+Crash-safe storage of the aggregated stream reports.
+
+Reports used to live in reports.json, rewritten in place on every request:
+a crash in the middle of json.dump lost the whole history, and every request
+parsed the whole file. ReportStore keeps the aggregated reports in memory,
+in a compact ReportTable (report_table.py), and persists them as:
+
+- a snapshot: the whole table, checksummed, written to a temporary file,
+  fsynced and renamed over the previous one, so it is either the old or the
+  new snapshot, never a mix
+- a write-ahead log (WAL) of the changes since that snapshot, one
+  checksummed record per report or verdict, appended and fsynced before the
+  request is acknowledged
+
+Startup loads the snapshot and replays the WAL, so it costs the recent log,
+not the whole history. Every SNAPSHOT_EVERY records the WAL is retired:
+renamed to reports.wal.<last sequence number> while appends go on in a new
+reports.wal, and the table is copied (a memcpy of its columns). The copy is
+then serialized, compressed and written in a background thread, which
+deletes the retired segments the new snapshot covers. Request handling
+only waits on a snapshot when the WAL grows to twice SNAPSHOT_EVERY while
+one is being written, which bounds what startup replays. Records carry a
+sequence number and the snapshot records the last one it includes, so a crash at
+any point replays the retired segments and the WAL without applying a
+record twice. A torn record at the end of the WAL (crash mid-append) is
+dropped: it was never acknowledged.
+
+The reports can be exported as JSON for people and scripts: offline with
+`python report_store.py reports.snapshot reports.wal > reports.json`, which
+reads the files without modifying them, or by passing `export_file`, which
+rewrites it (in the background thread) with a snapshot at most every
+EXPORT_INTERVAL seconds, and on shutdown. On first start a legacy
+reports.json (`import_file`) is imported if there is no snapshot yet.
+
+Snapshot layout (little-endian):
+
+    u32 magic "OARS"   u16 version   u16 reserved
+    u64 last sequence number         u32 payload length   u32 CRC32 of payload
+    payload: zlib-compressed ReportTable.to_payload()
+
+WAL record: u32 payload length, u32 CRC32, u64 sequence, payload (JSON).
+
+check_report_store.py kills writers at random points and checks that no
+acknowledged report is lost.
+"""
+
+import glob
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from report_table import ReportTable
+
+SNAPSHOT_EVERY = 1000
+EXPORT_INTERVAL = 300
+
+MAGIC = b"OARS"
+VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<4sHHQII")
+RECORD_HEADER = struct.Struct("<IIQ")
+
+
+class CorruptSnapshot(ValueError):
+    pass
+
+
+def _fsync_dir(path: str):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, data: bytes):
+    """Replace `path` with `data`: temp file, fsync, rename, fsync of the directory."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def encode_snapshot(table: ReportTable, last_seq: int) -> bytes:
+    payload = zlib.compress(table.to_payload())
+    return SNAPSHOT_HEADER.pack(MAGIC, VERSION, 0, last_seq, len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_snapshot(data: bytes) -> tuple:
+    """(ReportTable, last sequence number); raises CorruptSnapshot."""
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise CorruptSnapshot("truncated header")
+    magic, version, _, last_seq, length, crc = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise CorruptSnapshot(f"not a version {VERSION} report snapshot")
+    payload = data[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise CorruptSnapshot("checksum mismatch")
+    return ReportTable.from_payload(zlib.decompress(payload)), last_seq
+
+
+def read_wal(path: str) -> tuple:
+    """(records as (seq, op) pairs, length of the valid prefix of the file)."""
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc, seq = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        records.append((seq, json.loads(payload)))
+        offset = start + length
+    return records, offset
+
+
+def retired_segments(wal_file: str) -> List[tuple]:
+    """(last sequence number, path) of the retired WAL segments, oldest first."""
+    segments = []
+    for path in glob.glob(glob.escape(wal_file) + ".*"):
+        suffix = path[len(wal_file) + 1:]
+        if suffix.isdigit():
+            segments.append((int(suffix), path))
+    return sorted(segments)
+
+
+def apply(table: ReportTable, op: dict):
+    if op["op"] == "report":
+        table.add(op["report"], op.get("verdict"))
+    elif op["op"] == "verdict":
+        table.annotate(op["station_id"], op["stream_url"], op["verdict"])
+
+
+def load(snapshot_file: str, wal_file: str, import_file: Optional[str] = None) -> tuple:
+    """(table, last sequence number, records replayed, valid length of the WAL); modifies no file."""
+    table, seq = ReportTable(), 0
+    if os.path.exists(snapshot_file):
+        with open(snapshot_file, "rb") as f:
+            table, seq = decode_snapshot(f.read())
+    elif import_file and os.path.exists(import_file):
+        with open(import_file, "r") as f:
+            for report in json.load(f):
+                table.add(report, report.get("server_verdict"))
+    replayed = 0
+    valid = 0
+    for path in [path for _, path in retired_segments(wal_file)] + [wal_file]:
+        records, valid = read_wal(path)
+        for record_seq, op in records:
+            if record_seq > seq:
+                apply(table, op)
+                seq = record_seq
+                replayed += 1
+    return table, seq, replayed, valid
+
+
+class ReportStore:
+    """Aggregated reports in memory, persisted as snapshot plus write-ahead log."""
+
+    def __init__(self, snapshot_file: str, wal_file: str, export_file: Optional[str] = None,
+                 snapshot_every: int = SNAPSHOT_EVERY, export_interval: float = EXPORT_INTERVAL,
+                 fsync: bool = True, import_file: Optional[str] = None):
+        self.snapshot_file = snapshot_file
+        self.wal_file = wal_file
+        self.export_file = export_file
+        self.import_file = import_file
+        self.snapshot_every = snapshot_every
+        self.export_interval = export_interval
+        self.fsync = fsync
+        self.table = ReportTable()
+        self._exported = None
+        self._seq = 0
+        self._wal_records = 0
+        self._wal = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-snapshot")
+        self._snapshotting: Optional[Future] = None
+        self.replayed = 0
+
+    # Loading
+
+    def open(self):
+        self.table, self._seq, self.replayed, valid = load(self.snapshot_file, self.wal_file, self.import_file)
+        self._wal = open(self.wal_file, "ab")
+        if self._wal.tell() != valid:
+            # Drop the torn record left by a crash during an append
+            self._wal.truncate(valid)
+            self._wal.seek(valid)
+        self._wal_records = len(read_wal(self.wal_file)[0])
+        return self
+
+    def close(self):
+        if self._wal is not None:
+            self.snapshot(export=True)
+            self._wal.close()
+            self._wal = None
+        self._executor.shutdown()
+
+    # Changes
+
+    def add(self, report: dict, verdict: Optional[dict] = None) -> bool:
+        """Record a report, merged into its duplicate if any. Returns whether it was merged.
+
+        Raises ValueError for a report the table can't hold, before it reaches the WAL:
+        a logged record that fails to apply would fail every later replay too.
+        """
+        self.table.check(report)
+        found = self.table.find(report) >= 0
+        self._log({"op": "report", "report": report, "verdict": verdict})
+        return found
+
+    def annotate(self, station_id: str, stream_url: str, verdict: dict) -> bool:
+        """Attach a server verdict to the reports of a stream. Returns whether anything changed."""
+        if self.table.has_verdict(station_id, stream_url, verdict):
+            return False
+        self._log({"op": "verdict", "station_id": station_id, "stream_url": stream_url, "verdict": verdict})
+        return True
+
+    def reports(self) -> list:
+        return list(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def snapshot(self, export: bool = False):
+        """Write a snapshot (and the JSON export when due or asked) and wait for it."""
+        self.snapshot_in_background(export).result()
+
+    def snapshot_in_background(self, export: bool = False) -> Future:
+        """Retire the WAL and write a snapshot of the current table in the background thread."""
+        if self._snapshotting is not None:
+            # One at a time, in order. After a failure the retired segments stay,
+            # and this snapshot covers them
+            error = self._snapshotting.exception()
+            if error is not None:
+                print(f"Report snapshot failed, retrying: {error}")
+        now = time.monotonic()
+        if self.export_file and (export or self._exported is None or now - self._exported >= self.export_interval):
+            self._exported = now
+        else:
+            export = False
+        retired = self._retire_wal()
+        self._snapshotting = self._executor.submit(self._write_snapshot, self.table.frozen(), self._seq,
+                                                   retired, export)
+        return self._snapshotting
+
+    # Internals
+
+    def _retire_wal(self) -> Optional[str]:
+        """Rename the WAL after its last record and start a new one."""
+        self._wal_records = 0
+        if self._wal.tell() == 0:
+            return None
+        self._wal.close()
+        retired = f"{self.wal_file}.{self._seq}"
+        os.replace(self.wal_file, retired)
+        self._wal = open(self.wal_file, "ab")
+        _fsync_dir(self.wal_file)
+        return retired
+
+    def _write_snapshot(self, table: ReportTable, seq: int, retired: Optional[str], export: bool):
+        write_atomic(self.snapshot_file, encode_snapshot(table, seq))
+        # The snapshot covers every retired segment up to `seq`
+        for last_seq, path in retired_segments(self.wal_file):
+            if last_seq <= seq:
+                os.remove(path)
+        if export:
+            write_atomic(self.export_file, json.dumps(list(table), indent=4).encode("utf-8"))
+
+    def _log(self, op: dict):
+        payload = json.dumps(op, separators=(",", ":")).encode("utf-8")
+        self._wal.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), self._seq + 1) + payload)
+        self._sync()
+        self._seq += 1
+        apply(self.table, op)
+        self._wal_records += 1
+        if self._wal_records >= self.snapshot_every:
+            # Wait for a slow snapshot rather than let the WAL, and the replay, grow
+            if self._snapshotting is None or self._snapshotting.done() or \
+                    self._wal_records >= 2 * self.snapshot_every:
+                self.snapshot_in_background()
+
+    def _sync(self):
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python report_store.py SNAPSHOT_FILE WAL_FILE > reports.json")
+    reports, *_ = load(sys.argv[1], sys.argv[2])
+    json.dump(list(reports), sys.stdout, indent=4)
+    print()
@@ -0,0 +1,394 @@
+"""
+Compact in-memory table of aggregated reports.
+
+As dicts, reports cost about a kilobyte each, mostly for the same few
+strings repeated in every report: device ("Fairphone FP4 - API 34"), app
+version, country, error message, stream URL. ReportTable stores them
+column-wise instead:
+
+- string fields are interned in one StringPool and stored as uint32 ids in
+  array columns; error code, count and timestamp are plain numeric columns
+- timestamps are seconds since 1970 in local time, as the app sends them
+  (the rare timestamp that doesn't format back identically is kept aside)
+- server verdicts, shared by all reports of a stream, are interned too
+- duplicates are found through an open-addressing hash index of row
+  numbers (uint32 per slot), hashing and comparing the encoded key columns,
+  so there is no per-row key tuple
+
+That is about 60 bytes per distinct report key plus the distinct strings,
+so millions of keys fit in tens of MB. Aggregations (count_by, stream
+verdicts) run over the integer columns and only decode the results.
+
+`python report_table.py [N]` compares the memory use with a list of dicts.
+"""
+
+import json
+import math
+import random
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+# Fields identifying "duplicate" reports, merged into one entry
+DEDUPE_KEYS = ["station_id", "stream_url", "error_code", "device_info", "app_version", "user_agent", "country"]
+
+STRING_FIELDS = ["station_id", "stream_url", "device_info", "app_version", "user_agent", "country", "error_message"]
+KEY_STRING_FIELDS = [f for f in STRING_FIELDS if f in DEDUPE_KEYS]
+
+EPOCH = datetime(1970, 1, 1)
+NO_VERDICT = 0xFFFFFFFF
+# Ranges of the error_code ("i") and report_count ("I") columns
+ERROR_CODE_RANGE = (-2 ** 31, 2 ** 31 - 1)
+REPORT_COUNT_RANGE = (0, 2 ** 32 - 1)
+MAX_LOAD = 0.7
+
+
+class StringPool:
+    """Interned strings, numbered in order of first appearance."""
+
+    def __init__(self, strings=()):
+        self.strings = []
+        self._ids = {}
+        for s in strings:
+            self.intern(s)
+
+    def intern(self, value: str) -> int:
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def get(self, value: str) -> Optional[int]:
+        return self._ids.get(value)
+
+    def __getitem__(self, i: int) -> str:
+        return self.strings[i]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _seconds(timestamp: str) -> float:
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return (parsed - EPOCH).total_seconds()
+
+
+def _format(seconds: float) -> str:
+    return (EPOCH + timedelta(seconds=seconds)).isoformat()
+
+
+class ReportTable:
+    """Aggregated reports as dictionary-encoded columns with a hash index on the dedupe key."""
+
+    def __init__(self):
+        self.strings = StringPool()
+        self.verdicts = StringPool()     # verdicts as JSON
+        self.columns = {field: array("I") for field in STRING_FIELDS}
+        self.error_code = array("i")
+        self.report_count = array("I")
+        self.timestamp = array("d")
+        self.verdict = array("I")
+        self._raw_timestamps: Dict[int, Optional[str]] = {}
+        self._key_columns = [self.columns["station_id"], self.columns["stream_url"], self.error_code] + \
+            [self.columns[f] for f in KEY_STRING_FIELDS[2:]]
+        self._index = array("I", bytes(4 * 16))   # row + 1, 0 = empty slot
+        self._by_stream: Dict[tuple, array] = {}
+
+    def __len__(self):
+        return len(self.report_count)
+
+    # Key index
+
+    def _encode_key(self, report: dict, intern: bool) -> Optional[tuple]:
+        """Key ids of `report` in index order; None if a string was never seen (no match possible)."""
+        ids = []
+        for field in ["station_id", "stream_url", "error_code"] + KEY_STRING_FIELDS[2:]:
+            value = report.get(field)
+            if field == "error_code":
+                ids.append(int(value))
+                continue
+            i = self.strings.intern(_str(value)) if intern else self.strings.get(_str(value))
+            if i is None:
+                return None
+            ids.append(i)
+        return tuple(ids)
+
+    def _row_key(self, row: int) -> tuple:
+        return tuple(column[row] for column in self._key_columns)
+
+    def _find(self, key: tuple) -> tuple:
+        """(row or -1, slot where the key is or would go)."""
+        mask = len(self._index) - 1
+        slot = hash(key) & mask
+        while True:
+            entry = self._index[slot]
+            if entry == 0:
+                return -1, slot
+            if self._row_key(entry - 1) == key:
+                return entry - 1, slot
+            slot = (slot + 1) & mask
+
+    def _rebuild_index(self, size: int):
+        self._index = array("I", bytes(4 * size))
+        mask = size - 1
+        for row in range(len(self)):
+            slot = hash(self._row_key(row)) & mask
+            while self._index[slot]:
+                slot = (slot + 1) & mask
+            self._index[slot] = row + 1
+
+    def find(self, report: dict) -> int:
+        """Row of the report with the same dedupe key, or -1."""
+        key = self._encode_key(report, intern=False)
+        return -1 if key is None else self._find(key)[0]
+
+    # Changes
+
+    @staticmethod
+    def check(report: dict) -> tuple:
+        """(error_code, report_count) of `report` as stored; raises ValueError if they don't fit the columns."""
+        error_code = _ranged("error_code", report.get("error_code"), ERROR_CODE_RANGE)
+        report_count = _ranged("report_count", report.get("report_count") or 1, REPORT_COUNT_RANGE)
+        return error_code, report_count
+
+    def add(self, report: dict, verdict: Optional[dict] = None) -> bool:
+        """Insert `report`, or merge it into its duplicate. Returns whether it was merged.
+
+        Raises ValueError, before changing anything, if a number doesn't fit its column.
+        """
+        # Checked first so that a row is appended to every column or to none
+        error_code, report_count = self.check(report)
+        key = self._encode_key(report, intern=True)
+        row, slot = self._find(key)
+        verdict_id = self.verdicts.intern(json.dumps(verdict, sort_keys=True)) if verdict else None
+        if row >= 0:
+            self.report_count[row] = min(self.report_count[row] + 1, REPORT_COUNT_RANGE[1])
+            self._set_timestamp(row, report["timestamp"])  # Update to latest occurrence
+            self.columns["error_message"][row] = self.strings.intern(_str(report["error_message"]))
+            if verdict_id is not None:
+                self.verdict[row] = verdict_id
+            return True
+
+        row = len(self)
+        for field in STRING_FIELDS:
+            self.columns[field].append(self.strings.intern(_str(report.get(field))))
+        self.error_code.append(error_code)
+        self.report_count.append(report_count)
+        self.timestamp.append(0.0)
+        self._set_timestamp(row, report.get("timestamp"))
+        self.verdict.append(NO_VERDICT if verdict_id is None else verdict_id)
+        self._index[slot] = row + 1
+        self._by_stream.setdefault((key[0], key[1]), array("I")).append(row)
+        if len(self) > MAX_LOAD * len(self._index):
+            self._rebuild_index(2 * len(self._index))
+        return False
+
+    def _set_timestamp(self, row: int, timestamp: Optional[str]):
+        try:
+            seconds = _seconds(timestamp)
+        except (TypeError, ValueError):
+            seconds = math.nan
+        self.timestamp[row] = seconds
+        if math.isnan(seconds) or _format(seconds) != timestamp:
+            self._raw_timestamps[row] = timestamp
+        else:
+            self._raw_timestamps.pop(row, None)
+
+    def _stream_rows(self, station_id: str, stream_url: str) -> array:
+        key = (self.strings.get(station_id), self.strings.get(stream_url))
+        return self._by_stream.get(key, array("I"))
+
+    def has_verdict(self, station_id: str, stream_url: str, verdict: dict) -> bool:
+        """Whether all reports of the stream already carry `verdict`."""
+        verdict_id = self.verdicts.get(json.dumps(verdict, sort_keys=True))
+        return verdict_id is not None and all(self.verdict[row] == verdict_id
+                                              for row in self._stream_rows(station_id, stream_url))
+
+    def annotate(self, station_id: str, stream_url: str, verdict: dict):
+        verdict_id = self.verdicts.intern(json.dumps(verdict, sort_keys=True))
+        for row in self._stream_rows(station_id, stream_url):
+            self.verdict[row] = verdict_id
+
+    # Reading
+
+    def row(self, row: int) -> dict:
+        report = {field: self.strings[self.columns[field][row]] for field in STRING_FIELDS}
+        report["error_code"] = self.error_code[row]
+        seconds = self.timestamp[row]
+        report["timestamp"] = self._raw_timestamps[row] if row in self._raw_timestamps else _format(seconds)
+        report["report_count"] = self.report_count[row]
+        if self.verdict[row] != NO_VERDICT:
+            report["server_verdict"] = json.loads(self.verdicts[self.verdict[row]])
+        return report
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self.row(i) for i in range(len(self)))
+
+    def count_by(self, field: str, since: Optional[datetime] = None) -> Counter:
+        """Report occurrences per value of `field`, optionally for reports last seen after `since` (local time)."""
+        counts = Counter()
+        column = self.error_code if field == "error_code" else self.columns[field]
+        if since is None:
+            for value, count in zip(column, self.report_count):
+                counts[value] += count
+        else:
+            threshold = (since - EPOCH).total_seconds()
+            for value, count, seconds in zip(column, self.report_count, self.timestamp):
+                if seconds >= threshold:
+                    counts[value] += count
+        if field == "error_code":
+            return counts
+        return Counter({self.strings[value]: count for value, count in counts.items()})
+
+    def stream_verdicts(self) -> Iterator[tuple]:
+        """Distinct (station_id, verdict) pairs."""
+        pairs = {(station, verdict) for station, verdict in zip(self.columns["station_id"], self.verdict)
+                 if verdict != NO_VERDICT}
+        for station, verdict in pairs:
+            yield self.strings[station], json.loads(self.verdicts[verdict])
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the columns, the index and the pools."""
+        arrays = list(self.columns.values()) + [self.error_code, self.report_count, self.timestamp,
+                                                self.verdict, self._index]
+        total = sum(a.itemsize * len(a) for a in arrays)
+        total += sum(a.itemsize * len(a) for a in self._by_stream.values())
+        for pool in (self.strings, self.verdicts):
+            total += sum(sys.getsizeof(s) for s in pool.strings) + sys.getsizeof(pool._ids) + \
+                sys.getsizeof(pool.strings)
+        return total
+
+    # Serialization
+
+    def frozen(self) -> "ReportTable":
+        """Read-only copy of the rows, without the key index, to serialize in another thread.
+
+        Copying the arrays is a memcpy, much cheaper than to_payload itself.
+        """
+        table = ReportTable()
+        table.strings.strings = list(self.strings.strings)
+        table.verdicts.strings = list(self.verdicts.strings)
+        table.columns = {field: array(column.typecode, column) for field, column in self.columns.items()}
+        table.error_code = array("i", self.error_code)
+        table.report_count = array("I", self.report_count)
+        table.timestamp = array("d", self.timestamp)
+        table.verdict = array("I", self.verdict)
+        table._raw_timestamps = dict(self._raw_timestamps)
+        return table
+
+    def to_payload(self) -> bytes:
+        header = {
+            "rows": len(self),
+            "strings": self.strings.strings,
+            "verdicts": self.verdicts.strings,
+            "raw_timestamps": {str(row): value for row, value in self._raw_timestamps.items()},
+        }
+        parts = [json.dumps(header, separators=(",", ":")).encode("utf-8"), b"\n"]
+        for column in [self.columns[f] for f in STRING_FIELDS] + [self.error_code, self.report_count,
+                                                                self.timestamp, self.verdict]:
+            parts.append(_little_endian(column).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_payload(cls, payload: bytes) -> "ReportTable":
+        end = payload.index(b"\n")
+        header = json.loads(payload[:end])
+        table = cls()
+        table.strings = StringPool(header["strings"])
+        table.verdicts = StringPool(header["verdicts"])
+        table._raw_timestamps = {int(row): value for row, value in header["raw_timestamps"].items()}
+        offset = end + 1
+        rows = header["rows"]
+        for column in [table.columns[f] for f in STRING_FIELDS] + [table.error_code, table.report_count,
+                                                                 table.timestamp, table.verdict]:
+            size = column.itemsize * rows
+            column.frombytes(payload[offset:offset + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+            offset += size
+        size = 16
+        while rows > MAX_LOAD * size:
+            size *= 2
+        table._rebuild_index(size)
+        for row in range(rows):
+            key = (table.columns["station_id"][row], table.columns["stream_url"][row])
+            table._by_stream.setdefault(key, array("I")).append(row)
+        return table
+
+
+def _str(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _ranged(field: str, value, bounds: tuple) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} is not an integer: {value!r}")
+    if not bounds[0] <= value <= bounds[1]:
+        raise ValueError(f"{field} out of range: {value}")
+    return value
+
+
+def _little_endian(column: array) -> array:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def compare_memory(n: int = 200000, seed: int = 1) -> dict:
+    """Bytes per report key for `n` synthetic reports (mostly distinct keys), as dicts and in a ReportTable."""
+    from tracemalloc import get_traced_memory, start, stop
+
+    rng = random.Random(seed)
+    devices = [f"{brand} {model} - API {api}" for brand in ["Fairphone", "Google", "Samsung", "Xiaomi"]
+               for model in ["FP4", "Pixel 7", "Galaxy S21", "Redmi 9", "A52"] for api in range(26, 35)]
+    stations = [f"station_{i}" for i in range(90)]
+    reports = []
+    for _ in range(n):
+        station = rng.choice(stations)
+        reports.append({
+            "station_id": station,
+            "stream_url": f"https://stream.example/{station}.mp3",
+            "error_code": rng.choice([1, 2, 1004, 2001]),
+            "error_message": rng.choice(["Source error", "Unable to connect", "Response code: 404"]),
+            "device_info": rng.choice(devices),
+            "app_version": rng.choice(["1.4.0", "1.5.0", "1.5.1"]),
+            "user_agent": "unknown",
+            "country": rng.choice(["FR", "DE", "GB", "US", "unknown"]),
+            "timestamp": (datetime(2026, 1, 1) + timedelta(seconds=rng.randrange(10 ** 7),
+                                                           microseconds=rng.randrange(10 ** 6))).isoformat(),
+            "report_count": 1,
+        })
+    source = json.dumps(reports)
+    del reports
+
+    start()
+    as_dicts = json.loads(source)
+    dict_bytes = get_traced_memory()[0]
+    del as_dicts
+    stop()
+
+    start()
+    table = ReportTable()
+    for report in json.loads(source):
+        table.add(report)
+    table_bytes = get_traced_memory()[0]
+    stop()
+    keys = len(table)
+    return {
+        "reports": n,
+        "distinct_keys": keys,
+        "dicts_bytes_per_key": round(dict_bytes / keys),
+        "table_bytes_per_key": round(table_bytes / keys),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(compare_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 200000), indent=2))
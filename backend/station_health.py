@@ -0,0 +1,220 @@
+"""
+Station health feed.
+
+Clients fetch GET /health on launch to know which stations are currently
+dead before trying to play them. The document is small and only changes
+when a station's health does:
+
+    {
+        "version": 1760000000,        # time the content last changed
+        "catalog": "3f2a...",         # hash of the station ids, in order
+        "count": 89,
+        "down": "AAQAAAAAAAAAAAAA",   # base64 bitset, bit i = i-th station
+        "alternates": {"station_id": ["https://..."]}
+    }
+
+Station i is the i-th station of the app's catalog, which generate_repository
+(scripts/build_stations.py) sorts by lowercase name; clients whose catalog
+hash differs (older or newer build) should ignore the bitset. Bits are
+LSB-first within each byte.
+
+A station is down when the latest server probe of its stream (the
+server_verdict attached to reports, see report_probe) failed within
+HEALTH_WINDOW, or, without a recent probe, when it got REPORT_THRESHOLD
+failure reports in that window. Alternates of a down station only come
+from the catalog: its `alternate_urls` in stations.yaml, and the redirect
+targets of its catalog URLs that the server found playing. URLs sent in
+reports are never published, as anyone can post a report.
+
+The body is rebuilt at most every REFRESH_INTERVAL seconds and kept
+gzip-compressed, so serving it is a header comparison and a write.
+Across shards the bitsets are OR-ed and the version is the latest change
+of any shard.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import yaml
+
+from report_table import ReportTable
+
+HEALTH_WINDOW = timedelta(hours=1)
+REPORT_THRESHOLD = 5
+REFRESH_INTERVAL = 10.0
+# Rebuild even without new reports, so that old ones expire
+MAX_AGE = 60.0
+
+FAILED = ("down", "not_audio")
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Aware datetime from an ISO timestamp; naive ones (report timestamps) are local time."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def pack_bits(flags: List[bool]) -> bytes:
+    bits = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def load_catalog(path: str) -> List[dict]:
+    """Stations in the app's catalog order (see generate_repository)."""
+    with open(path, "r", encoding="utf-8") as f:
+        stations = (yaml.safe_load(f) or {}).get("stations", [])
+    return sorted(stations, key=lambda s: s["name"].lower())
+
+
+def station_health(catalog: List[dict], reports: ReportTable, now: datetime) -> tuple:
+    """(down flags in catalog order, {station_id: alternate URLs}) from reports and their verdicts."""
+    since = now - HEALTH_WINDOW
+    verdicts: Dict[str, dict] = {}      # URL -> latest recent verdict
+    for _, verdict in reports.stream_verdicts():
+        checked = parse_time(verdict.get("checked_at"))
+        if checked and checked >= since:
+            latest = verdicts.get(verdict["url"])
+            if latest is None or parse_time(latest["checked_at"]) < checked:
+                verdicts[verdict["url"]] = verdict
+    # Report timestamps are naive local time
+    report_counts = reports.count_by("station_id", since=since.astimezone().replace(tzinfo=None))
+
+    down = []
+    alternates = {}
+    for station in catalog:
+        url = station["stream_url"]
+        verdict = verdicts.get(url)
+        if verdict is not None:
+            is_down = verdict["verdict"] in FAILED
+        else:
+            is_down = report_counts.get(station["id"], 0) >= REPORT_THRESHOLD
+        down.append(is_down)
+        if is_down:
+            catalog_urls = [url] + list(station.get("alternate_urls") or [])
+            # Where the catalog URLs found playing redirect to
+            redirects = sorted({verdicts[u]["final_url"] for u in catalog_urls
+                                if verdicts.get(u, {}).get("verdict") == "up" and verdicts[u].get("final_url")})
+            candidates = catalog_urls[1:] + redirects
+            urls = [u for u in dict.fromkeys(candidates)
+                    if u != url and verdicts.get(u, {}).get("verdict") not in FAILED]
+            if urls:
+                alternates[station["id"]] = urls
+    return down, alternates
+
+
+class HealthFeed:
+    """
+    The /health document, rebuilt lazily and kept in identity and gzip form.
+
+    With several report shards (see cluster.py), each shard computes the
+    state of the stations it owns (local_state) and the document merges all
+    of them, so that every worker serves the same bytes and ETag.
+    """
+
+    def __init__(self, stations_file: str, reports: Callable[[], ReportTable]):
+        self.stations_file = stations_file
+        self.reports = reports
+        self.version = 0
+        self.etag = None
+        self.body = b""
+        self.gzipped = b""
+        self._content = None
+        self._local = None
+        self._local_built = None
+        self._merged = None
+        self._dirty = True
+        self._catalog = None
+        self._catalog_mtime = None
+
+    def invalidate(self):
+        """New reports or verdicts: rebuild at the next request (rate limited)."""
+        self._dirty = True
+
+    def catalog(self) -> List[dict]:
+        """The stations file, reloaded when it changes; empty when there is none."""
+        try:
+            mtime = os.path.getmtime(self.stations_file)
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._catalog_mtime or self._catalog is None:
+            self._catalog = load_catalog(self.stations_file) if mtime is not None else []
+            self._catalog_mtime = mtime
+        return self._catalog
+
+    def due(self) -> bool:
+        """Whether the merged document should be rebuilt (at most every REFRESH_INTERVAL)."""
+        now = time.monotonic()
+        if self._merged is not None and now - self._merged < REFRESH_INTERVAL:
+            return False
+        self._merged = now
+        return True
+
+    def local_state(self) -> dict:
+        """Down bitset, alternates and time of last change, from this process's reports."""
+        now = time.monotonic()
+        if self._local_built is not None:
+            age = now - self._local_built
+            if age < REFRESH_INTERVAL or (not self._dirty and age < MAX_AGE):
+                return self._local
+        self._local_built = now
+        self._dirty = False
+
+        down, alternates = station_health(self.catalog(), self.reports(), datetime.now(timezone.utc))
+        state = {"down": base64.b64encode(pack_bits(down)).decode("ascii"), "alternates": alternates}
+        if self._local is None or any(self._local[k] != v for k, v in state.items()):
+            previous = self._local["changed"] if self._local else 0
+            state["changed"] = max(previous + 1, int(time.time()))
+            self._local = state
+        return self._local
+
+    def refresh(self, remote_states: List[dict] = ()):
+        """Rebuild the document from the local state and those of the other shards."""
+        catalog = self.catalog()
+        down = bytearray((len(catalog) + 7) // 8)
+        alternates = {}
+        version = 0
+        for state in [self.local_state()] + list(remote_states):
+            for i, byte in enumerate(base64.b64decode(state["down"])[:len(down)]):
+                down[i] |= byte
+            alternates.update(state["alternates"])
+            version = max(version, state["changed"])
+        ids = "\n".join(s["id"] for s in catalog)
+        content = {
+            "version": version,
+            "catalog": hashlib.sha1(ids.encode("utf-8")).hexdigest()[:16],
+            "count": len(catalog),
+            "down": base64.b64encode(bytes(down)).decode("ascii"),
+            "alternates": dict(sorted(alternates.items())),
+        }
+        if content == self._content:
+            return
+        self._content = content
+        self.version = version
+        self.body = json.dumps(content, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+
+    def etag_for(self, gzipped: bool) -> str:
+        """Strong ETag of one representation (they differ by content coding)."""
+        return f'"{self.etag}-gz"' if gzipped else f'"{self.etag}"'
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        """Whether the client holds the current version, in either coding."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag_for(False) in tags or self.etag_for(True) in tags
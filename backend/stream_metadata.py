@@ -0,0 +1,248 @@
+"""
+Now-playing metadata carried inside audio streams.
+
+Two framings are understood, behind the same interface: a parser is fed
+the raw stream bytes as they arrive (`feed(chunk)`) and returns the
+now-playing events found in them, as dicts with artist, title and type
+like the metadata providers, each one a change from the previous event.
+
+- IcyParser: Shoutcast/Icecast ICY metadata, a block interleaved every
+  `icy-metaint` bytes of audio (StreamTitle='Artist - Title';)
+- OggParser: Ogg Vorbis and Opus streams carry no ICY blocks; titles are
+  Vorbis comments (ARTIST=, TITLE=) in the comment header of each logical
+  bitstream, and Icecast starts a new chained bitstream at every track
+  change. The parser walks Ogg pages over a memoryview of its buffer,
+  follows the beginning-of-stream pages, assembles only the header
+  packets of each bitstream and skips audio pages without decoding them.
+
+`parser_for(headers)` picks the parser for a stream's HTTP response.
+"""
+
+import struct
+from typing import Dict, List, Optional
+
+# Stop assembling a comment header after this many bytes: the comments come
+# before embedded cover art (METADATA_BLOCK_PICTURE) in practice
+MAX_COMMENT_BYTES = 64 * 1024
+
+OGG_CONTENT_TYPES = ("application/ogg", "audio/ogg", "audio/opus", "audio/vorbis", "video/ogg")
+
+PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+CAPTURE = b"OggS"
+BOS = 0x02
+
+COMMENT_MAGICS = (b"\x03vorbis", b"OpusTags")
+ID_MAGICS = (b"\x01vorbis", b"OpusHead")
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip()
+    return value or None
+
+
+def now_playing(artist: Optional[str], title: Optional[str]) -> Optional[dict]:
+    """Event from an artist and a title, splitting 'Artist - Title' titles when there is no artist."""
+    artist, title = _clean(artist), _clean(title)
+    if not title:
+        return None
+    if not artist:
+        head, sep, tail = title.partition(" - ")
+        if sep and _clean(head) and _clean(tail):
+            artist, title = _clean(head), _clean(tail)
+    if artist:
+        return {"artist": artist, "title": title, "type": "song"}
+    return {"artist": None, "title": title, "type": "unknown"}
+
+
+def parse_icy_metadata(block: bytes) -> Optional[dict]:
+    """StreamTitle of an ICY metadata block, split into artist and title on ' - '."""
+    text = block.rstrip(b"\0").decode("utf-8", errors="replace")
+    start = text.find("StreamTitle='")
+    if start < 0:
+        return None
+    start += len("StreamTitle='")
+    end = text.find("';", start)
+    return now_playing(None, text[start:] if end < 0 else text[start:end])
+
+
+def parse_vorbis_comments(packet: bytes) -> Dict[str, str]:
+    """Comments of a Vorbis or Opus comment header, first value per upper-cased key.
+
+    A packet cut short (see MAX_COMMENT_BYTES) yields the comments before the cut.
+    """
+    for magic in COMMENT_MAGICS:
+        if packet.startswith(magic):
+            view = memoryview(packet)[len(magic):]
+            break
+    else:
+        return {}
+    comments = {}
+    if len(view) < 4:
+        return comments
+    offset = 4 + struct.unpack_from("<I", view)[0]
+    if offset + 4 > len(view):
+        return comments
+    count = struct.unpack_from("<I", view, offset)[0]
+    offset += 4
+    for _ in range(count):
+        if offset + 4 > len(view):
+            break
+        length = struct.unpack_from("<I", view, offset)[0]
+        offset += 4
+        if offset + length > len(view):
+            break
+        key, sep, value = bytes(view[offset:offset + length]).decode("utf-8", errors="replace").partition("=")
+        offset += length
+        if sep:
+            comments.setdefault(key.upper(), value)
+    return comments
+
+
+class _Parser:
+    """Common part: only report changes."""
+
+    def __init__(self):
+        self.last: Optional[dict] = None
+
+    def _changed(self, event: Optional[dict], events: List[dict]):
+        if event is not None and event != self.last:
+            self.last = event
+            events.append(event)
+
+
+class IcyParser(_Parser):
+    """ICY metadata blocks every `metaint` bytes of audio."""
+
+    def __init__(self, metaint: int):
+        super().__init__()
+        self.metaint = metaint
+        self._audio_left = metaint
+        self._block = bytearray()
+        self._block_left = None      # None: expecting the length byte
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        events = []
+        view = memoryview(chunk)
+        while view:
+            if self._audio_left:
+                skip = min(self._audio_left, len(view))
+                self._audio_left -= skip
+                view = view[skip:]
+            elif self._block_left is None:
+                self._block_left = view[0] * 16
+                view = view[1:]
+            else:
+                take = min(self._block_left, len(view))
+                self._block += view[:take]
+                self._block_left -= take
+                view = view[take:]
+            if not self._audio_left and self._block_left == 0:
+                if self._block:
+                    self._changed(parse_icy_metadata(bytes(self._block)), events)
+                self._block.clear()
+                self._block_left = None
+                self._audio_left = self.metaint
+        return events
+
+
+class _LogicalStream:
+    __slots__ = ("packets", "partial", "done", "truncated")
+
+    def __init__(self):
+        self.packets = 0             # complete header packets seen
+        self.partial = bytearray()
+        self.done = False
+        self.truncated = False
+
+
+class OggParser(_Parser):
+    """Incremental Ogg page walker reporting the comments of each (chained) logical bitstream."""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._streams: Dict[int, _LogicalStream] = {}
+        self.pages = 0
+        self.bitstreams = 0
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        events = []
+        self._buffer += chunk
+        consumed = 0
+        with memoryview(self._buffer) as view:
+            while True:
+                start = self._buffer.find(CAPTURE, consumed)
+                if start < 0:
+                    # Keep a possible partial capture pattern
+                    consumed = max(consumed, len(self._buffer) - 3)
+                    break
+                consumed = start
+                if len(view) - start < PAGE_HEADER.size:
+                    break
+                _, version, flags, _, serial, _, _, segments = PAGE_HEADER.unpack_from(view, start)
+                header_end = start + PAGE_HEADER.size + segments
+                if version != 0:
+                    consumed = start + 1     # not a page, resync
+                    continue
+                if len(view) < header_end:
+                    break
+                lacing = self._buffer[start + PAGE_HEADER.size:header_end]
+                page_end = header_end + sum(lacing)
+                if len(view) < page_end:
+                    break
+                # Released before the buffer is compacted below
+                with view[header_end:page_end] as body:
+                    self._page(flags, serial, lacing, body, events)
+                consumed = page_end
+        del self._buffer[:consumed]
+        return events
+
+    def _page(self, flags: int, serial: int, lacing: bytearray, body: memoryview, events: List[dict]):
+        self.pages += 1
+        if flags & BOS:
+            # A new logical bitstream: a chained stream's next track
+            self._streams = {serial: _LogicalStream()}
+            self.bitstreams += 1
+        stream = self._streams.get(serial)
+        if stream is None or stream.done:
+            return   # audio: skipped without looking at it
+        offset = 0
+        for size in lacing:
+            if not stream.truncated:
+                if len(stream.partial) + size > MAX_COMMENT_BYTES:
+                    stream.partial += body[offset:offset + MAX_COMMENT_BYTES - len(stream.partial)]
+                    stream.truncated = True
+                else:
+                    stream.partial += body[offset:offset + size]
+            offset += size
+            if size < 255:
+                # End of packet
+                self._packet(stream, bytes(stream.partial), events)
+                stream.partial.clear()
+                stream.truncated = False
+                if stream.done:
+                    return
+        if stream.truncated and stream.packets == 1:
+            # Don't wait for the end of a huge comment header
+            self._packet(stream, bytes(stream.partial), events)
+
+    def _packet(self, stream: _LogicalStream, packet: bytes, events: List[dict]):
+        stream.packets += 1
+        if stream.packets == 1:
+            if not packet.startswith(ID_MAGICS):
+                stream.done = True   # neither Vorbis nor Opus
+            return
+        stream.done = True
+        comments = parse_vorbis_comments(packet)
+        self._changed(now_playing(comments.get("ARTIST"), comments.get("TITLE")), events)
+
+
+def parser_for(headers) -> Optional[_Parser]:
+    """Parser for a stream response with these headers, or None if it carries no metadata we read."""
+    metaint = int(headers.get("icy-metaint") or 0)
+    if metaint:
+        return IcyParser(metaint)
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in OGG_CONTENT_TYPES:
+        return OggParser()
+    return None
@@ -1,56 +1,39 @@
-import json
 import yaml
+from itertools import chain, islice
 from pathlib import Path
 import re
 
-# Canonical tags from FilterData.kt
-CANONICAL_TAGS = ["pop", "rock", "hits", "jazz", "classical", "news", "talk", "ambient", "world", "oldies"]
+from radiobrowser_sync import DEFAULT_MIRROR, StationMirror
+from station_normalize import DedupeIndex, TagMatcher
 
-# Mapping for common variations to canonical tags
-TAG_MAPPING = {
-    "world music": "world",
-    "worldmusic": "world",
-    "information": "news",
-    "news/talk": "talk",
-    "news talk": "talk",
-    "indie": "rock",
-    "alternative": "rock",
-    "dance": "hits",
-    "electronic": "ambient",
-    "chillout": "ambient",
-    "chill": "ambient",
-}
+TAG_MATCHER = TagMatcher()
 
-def clean_tag(tag):
-    tag = tag.lower().strip()
-    if tag in CANONICAL_TAGS:
-        return tag
-    return TAG_MAPPING.get(tag, None)
-
-def get_primary_tag(tags_list):
-    for tag in tags_list:
-        if tag in CANONICAL_TAGS:
-            return tag
-    return None
+PER_COUNTRY = 10
 
 def slugify(text):
     text = text.lower()
     text = re.sub(r'[^a-z0-9]+', '_', text)
     return text.strip('_')
 
+def stream_url(s):
+    return s.get('url_resolved') or s.get('url')
+
 def run():
-    root = Path("/home/skadge/src/radio")
-    json_path = root / "allStations.json"
-    yaml_path = root / "stations.yaml"
-    
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    yaml_path = Path(__file__).parent.parent / "stations.yaml"
+    if not DEFAULT_MIRROR.exists():
+        raise SystemExit(f"No station mirror at {DEFAULT_MIRROR}: run scripts/radiobrowser_sync.py first")
+    mirror = StationMirror(DEFAULT_MIRROR, top_n=PER_COUNTRY)
+    # Click counts only change with a full sync: the change feed doesn't carry them
+    print(f"Click counts from the full sync of {mirror.get_state('last_full_sync', 'unknown date')} "
+          f"(refresh them with scripts/radiobrowser_sync.py --full)")
     
     with open(yaml_path, 'r') as f:
         current_yaml = yaml.safe_load(f)
     
     existing_ids = {s['id'] for s in current_yaml['stations']}
-    existing_urls = {s['stream_url'] for s in current_yaml['stations']}
+    existing = DedupeIndex()
+    for s in current_yaml['stations']:
+        existing.add(s['id'], s['name'], s.get('country'), s['stream_url'])
     
     country_map = {
         'DE': 'germany',
@@ -74,75 +57,51 @@ def run():
         'MX': 'mexico'
     }
     
-    # Sort all by clickcount
-    sorted_data = sorted(data, key=lambda x: x.get('clickcount', 0), reverse=True)
+    def candidates(cc):
+        # The mirror's top stations of the country, then the next ones for as long as
+        # duplicates are dropped, keeping only stations we could add
+        top = mirror.top(cc)
+        for s in chain(top, mirror.ranked(cc, start=len(top))):
+            name = s['name'].strip()
+            url = stream_url(s)
+            # Deduplicate against the catalog and the stations added so far
+            # (same stream or same name in the country)
+            if existing.find(name, country_map[cc], url):
+                continue
+            # We need at least one recognizable tag to map properly
+            s['tag_list'] = TAG_MATCHER.canonical_tags(s['tags'])
+            if s['tag_list']:
+                yield s
     
     new_stations = []
-    stations_by_country = {code: 0 for code in country_map.keys()}
     
-    for s in sorted_data:
-        cc = s.get('countrycode')
-        if not cc or cc not in country_map:
-            continue
-            
-        if stations_by_country[cc] >= 10:
-            continue
-            
-        name = s.get('name', '').strip()
-        url = s.get('url_resolved') or s.get('url')
-        favicon = s.get('favicon', '').strip()
-        tags_raw = s.get('tags', '')
-        
-        if not name or not url or not favicon or not tags_raw:
-            continue
-            
-        # Deduplicate
-        if url in existing_urls:
-            continue
+    for cc in country_map:
+        for s in islice(candidates(cc), PER_COUNTRY):
+            name = s['name'].strip()
+            url = stream_url(s)
+            station_id = slugify(name)
+            if station_id in existing_ids:
+                station_id = f"{station_id}_{cc.lower()}"
             
-        # Process tags
-        raw_tag_list = tags_raw.split(',')
-        cleaned_tags = []
-        for t in raw_tag_list:
-            ct = clean_tag(t)
-            if ct and ct not in cleaned_tags:
-                cleaned_tags.append(ct)
-        
-        # We need at least one recognizable tag to map properly
-        primary = get_primary_tag(cleaned_tags)
-        if not primary:
-            # Try to find any canonical tag in raw tags even if not separated by comma
-            for ct in CANONICAL_TAGS:
-                if ct in tags_raw.lower():
-                    primary = ct
-                    if ct not in cleaned_tags:
-                        cleaned_tags.append(ct)
-                    break
-        
-        if not primary:
-            continue
+            new_station = {
+                'id': station_id,
+                'name': name,
+                'stream_url': url,
+                'logo_url': s['favicon'].strip(),
+                'description': f"{name} from {s.get('country') or country_map[cc].capitalize()}",
+                'country': country_map[cc],
+                'tags': ",".join(s['tag_list']),
+                'popularity': s.get('clickcount') or 0,
+                'primary_tag': s['tag_list'][0]
+            }
             
-        station_id = slugify(name)
-        if station_id in existing_ids:
-            station_id = f"{station_id}_{cc.lower()}"
-        
-        new_station = {
-            'id': station_id,
-            'name': name,
-            'stream_url': url,
-            'logo_url': favicon,
-            'description': f"{name} from {s.get('country', country_map[cc].capitalize())}",
-            'country': country_map[cc],
-            'tags': ",".join(cleaned_tags),
-            'popularity': s.get('clickcount', 0),
-            'primary_tag': primary
-        }
-        
-        new_stations.append(new_station)
-        stations_by_country[cc] += 1
-        existing_ids.add(station_id)
-        existing_urls.add(url)
+            new_stations.append(new_station)
+            existing_ids.add(station_id)
+            existing.add(station_id, name, country_map[cc], url)
+    mirror.close()
 
+    # Most clicked first, as when they were picked from the whole dump
+    new_stations.sort(key=lambda x: x['popularity'], reverse=True)
     print(f"Adding {len(new_stations)} new stations.")
     current_yaml['stations'].extend(new_stations)
     
@@ -1,28 +1,21 @@
-import json
-from pathlib import Path
-from collections import Counter
+import numpy as np
+
+from radiobrowser_snapshot import load_snapshot
 
 def analyze_countries():
-    root = Path("/home/skadge/src/radio")
-    json_path = root / "allStations.json"
-    
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    
-    sorted_stations = sorted(data, key=lambda x: x.get('clickcount', 0), reverse=True)
-    top_10_percent = sorted_stations[:len(data)//10]
+    snapshot = load_snapshot()
+    top_10_percent = snapshot.top(len(snapshot) // 10)
     
-    quality_stations = [
-        s for s in top_10_percent 
-        if s.get('name') and s.get('url') and s.get('favicon') and s.get('tags')
-    ]
+    quality_stations = top_10_percent[snapshot.quality()[top_10_percent]]
     
-    countries = [s.get('countrycode', '??') for s in quality_stations]
-    counts = Counter(countries)
+    codes = snapshot.codes('countrycode')[quality_stations]
+    counts = np.bincount(codes, minlength=len(snapshot.values('countrycode')))
+    countries = snapshot.values('countrycode')
     
     print("Top countries in the 10% pool:")
-    for code, count in counts.most_common(20):
-        print(f"{code}: {count}")
+    for code in np.argsort(-counts, kind='stable')[:20]:
+        if counts[code]:
+            print(f"{countries[code] or '??'}: {counts[code]}")
 
 if __name__ == "__main__":
     analyze_countries()
@@ -16,20 +16,34 @@ Options:
     --force-logos        Re-download all logos even if they exist
     --dry-run            Don't write any files, just validate
     --verbose            Show detailed output
+    --chunk-size N       Maximum stations per generated initializer function
+    --split-files        Emit station chunks as separate RadioStationsN.kt files
+    --catalog-format F   'kotlin' (default) or 'asset' for the binary stations.bin
+    --vd-tool            Prefer the Android SDK's vd-tool for logo conversion
+    --path-precision N   Decimals kept in converted logo path data (default: 3)
+    --rasterize-logos    Pre-render logo bitmaps for Android Auto (needs cairosvg, Pillow)
+    --raster-format F    Bitmap format for --rasterize-logos: 'webp' (default) or 'png'
+    --raster-jobs N      Number of rasterization processes (default: CPU count)
 """
 
 import argparse
+import dataclasses
 import os
-import re
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 from typing import Optional
-from xml.etree import ElementTree as ET
 
 import requests
 import yaml
 
+import kotlin_codegen
+import logo_raster
+import station_catalog
+import pathdata
+import svg_normalize
+
 
 # Paths relative to project root
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -37,6 +51,8 @@ STATIONS_YAML = PROJECT_ROOT / "stations.yaml"
 SVG_DIR = PROJECT_ROOT / "app/src/main/res/drawable/svgs"
 DRAWABLE_DIR = PROJECT_ROOT / "app/src/main/res/drawable"
 REPOSITORY_PATH = PROJECT_ROOT / "app/src/main/java/org/guakamole/onair/data/RadioRepository.kt"
+CATALOG_ASSET_PATH = PROJECT_ROOT / "app/src/main/assets/stations.bin"
+LOGO_BITMAP_DIR = PROJECT_ROOT / "app/src/main/assets/logo_bitmaps"
 
 
 def log(msg: str, verbose: bool = False, force: bool = False):
@@ -108,10 +124,13 @@ def fetch_svg(station: dict, force: bool = False, verbose: bool = False, dry_run
         return None
 
 
-def convert_svg_to_vector(svg_path: Path, force: bool = False, verbose: bool = False, dry_run: bool = False) -> Optional[Path]:
+def convert_svg_to_vector(svg_path: Path, force: bool = False, verbose: bool = False, dry_run: bool = False,
+                          precision: int = pathdata.DEFAULT_PRECISION,
+                          prefer_vd_tool: bool = False) -> Optional[Path]:
     """
     Convert SVG to Android Vector Drawable XML.
-    Uses a simple Python-based conversion for common SVG patterns.
+    Uses the pure-Python converter (svg_normalize.py); the Android SDK's
+    vd-tool is only tried first with `prefer_vd_tool`, or as a last resort.
     Re-converts if the SVG file is newer than the existing XML.
     """
     xml_path = DRAWABLE_DIR / svg_path.name.replace('.svg', '.xml')
@@ -130,24 +149,20 @@ def convert_svg_to_vector(svg_path: Path, force: bool = False, verbose: bool = F
     
     log(f"  ⚙ Converting {svg_path.name} to Android Vector...", verbose, force=True)
     
-    try:
-        # Try using vd-tool if available (from Android SDK)
-        result = convert_svg_with_vd_tool(svg_path, xml_path)
-        if result:
-            log(f"  ✓ Converted with vd-tool: {xml_path.name}", verbose, force=True)
-            return xml_path
-    except Exception as e:
-        log(f"  ⚠ vd-tool not available, using fallback: {e}", verbose)
+    if prefer_vd_tool and convert_svg_with_vd_tool(svg_path, xml_path):
+        log(f"  ✓ Converted with vd-tool: {xml_path.name}", verbose, force=True)
+        return xml_path
     
-    # Fallback: simple SVG to VectorDrawable conversion
     try:
-        result = convert_svg_simple(svg_path, xml_path)
-        if result:
+        if convert_svg_simple(svg_path, xml_path, precision=precision, verbose=verbose):
             log(f"  ✓ Converted: {xml_path.name}", verbose, force=True)
             return xml_path
     except Exception as e:
         log(f"  ✗ Failed to convert {svg_path.name}: {e}", force=True)
-        return None
+    
+    if not prefer_vd_tool and convert_svg_with_vd_tool(svg_path, xml_path):
+        log(f"  ✓ Converted with vd-tool: {xml_path.name}", verbose, force=True)
+        return xml_path
     
     return None
 
@@ -182,64 +197,35 @@ def convert_svg_with_vd_tool(svg_path: Path, xml_path: Path) -> bool:
     return result.returncode == 0 and xml_path.exists()
 
 
-def convert_svg_simple(svg_path: Path, xml_path: Path) -> bool:
+def convert_svg_simple(svg_path: Path, xml_path: Path, precision: int = pathdata.DEFAULT_PRECISION,
+                       verbose: bool = False) -> bool:
     """
-    Simple SVG to VectorDrawable conversion.
-    Handles basic SVG files with paths, rectangles, circles.
+    Pure-Python SVG to VectorDrawable conversion.
+    The SVG is flattened by svg_normalize (transforms applied to the coordinates,
+    <use> and CSS classes resolved, clip paths kept as <group> elements), then
+    path data is optimized (see optimize_vector_paths) and the size reduction is reported.
     """
     with open(svg_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Parse SVG
-    # Remove namespaces for easier parsing
-    content_clean = re.sub(r'\sxmlns[^=]*="[^"]*"', '', content)
-    content_clean = re.sub(r'<\?xml[^>]*\?>', '', content_clean)
-    content_clean = re.sub(r'<!DOCTYPE[^>]*>', '', content_clean)
-    content_clean = re.sub(r'<!--.*?-->', '', content_clean, flags=re.DOTALL)
-    
-    try:
-        root = ET.fromstring(content_clean)
-    except ET.ParseError as e:
-        raise ValueError(f"Failed to parse SVG: {e}")
-    
-    # Get viewBox or width/height
-    viewbox = root.get('viewBox')
-    if viewbox:
-        parts = viewbox.split()
-        vp_width = float(parts[2])
-        vp_height = float(parts[3])
-    else:
-        vp_width = float(root.get('width', '24').replace('px', '').replace('pt', ''))
-        vp_height = float(root.get('height', '24').replace('px', '').replace('pt', ''))
-    
-    # Collect paths
-    paths = []
-    collect_paths(root, paths, '')
-    
-    if not paths:
-        raise ValueError("No paths found in SVG")
+    image = svg_normalize.normalize_svg(content)
+    for warning in image.warnings:
+        log(f"  ⚠ {svg_path.name}: {warning}", verbose)
     
+    unoptimized = render_vector_xml(serialize_vector_items(image.items, None),
+                                    image.viewport_width, image.viewport_height)
+    items = serialize_vector_items(optimize_vector_paths(image.items), precision)
+    if not items:
+        raise ValueError("No visible paths found in SVG")
+
     # Generate VectorDrawable XML
-    vector_xml = f'''<vector xmlns:android="http://schemas.android.com/apk/res/android"
-    android:width="{vp_width}dp"
-    android:height="{vp_height}dp"
-    android:viewportWidth="{vp_width}"
-    android:viewportHeight="{vp_height}">
-'''
-    
-    for path_data, fill_color, stroke_color, fill_rule in paths:
-        vector_xml += '  <path\n'
-        vector_xml += f'      android:pathData="{path_data}"\n'
-        if fill_color and fill_color != 'none':
-            vector_xml += f'      android:fillColor="{normalize_color(fill_color)}"\n'
-        if stroke_color and stroke_color != 'none':
-            vector_xml += f'      android:strokeColor="{normalize_color(stroke_color)}"\n'
-        if fill_rule == 'evenodd':
-            vector_xml += '      android:fillType="evenOdd"\n'
-        vector_xml = vector_xml.rstrip('\n') + '/>\n'
-    
-    vector_xml += '</vector>\n'
-    
+    vector_xml = render_vector_xml(items, image.viewport_width, image.viewport_height)
+
+    unoptimized_size = len(unoptimized.encode('utf-8'))
+    optimized_size = len(vector_xml.encode('utf-8'))
+    saved = 100 * (unoptimized_size - optimized_size) / unoptimized_size
+    log(f"  ↘ {xml_path.name}: {unoptimized_size} → {optimized_size} bytes (-{saved:.0f}%)", verbose)
+
     # Write output
     with open(xml_path, 'w', encoding='utf-8') as f:
         f.write(vector_xml)
@@ -247,129 +233,159 @@ def convert_svg_simple(svg_path: Path, xml_path: Path) -> bool:
     return True
 
 
-def collect_paths(element, paths: list, parent_transform: str):
-    """Recursively collect path data from SVG elements."""
-    tag = element.tag.split('}')[-1] if '}' in element.tag else element.tag
-    
-    # Get style attributes
-    style = element.get('style', '')
-    fill = element.get('fill') or extract_style(style, 'fill') or '#000000'
-    stroke = element.get('stroke') or extract_style(style, 'stroke')
-    fill_rule = element.get('fill-rule') or extract_style(style, 'fill-rule')
-    
-    if tag == 'path':
-        d = element.get('d')
-        if d:
-            # Clean up path data
-            d = normalize_path_data(d)
-            paths.append((d, fill, stroke, fill_rule))
-    
-    elif tag == 'rect':
-        x = float(element.get('x', 0))
-        y = float(element.get('y', 0))
-        w = float(element.get('width', 0))
-        h = float(element.get('height', 0))
-        rx = float(element.get('rx', 0))
-        ry = float(element.get('ry', rx))
-        
-        if rx > 0 or ry > 0:
-            # Rounded rectangle
-            d = f"M{x+rx},{y} L{x+w-rx},{y} Q{x+w},{y} {x+w},{y+ry} L{x+w},{y+h-ry} Q{x+w},{y+h} {x+w-rx},{y+h} L{x+rx},{y+h} Q{x},{y+h} {x},{y+h-ry} L{x},{y+ry} Q{x},{y} {x+rx},{y} Z"
-        else:
-            d = f"M{x},{y} L{x+w},{y} L{x+w},{y+h} L{x},{y+h} Z"
-        paths.append((d, fill, stroke, fill_rule))
-    
-    elif tag == 'circle':
-        cx = float(element.get('cx', 0))
-        cy = float(element.get('cy', 0))
-        r = float(element.get('r', 0))
-        # Approximate circle with bezier curves
-        k = 0.5522847498  # Magic number for circle approximation
-        d = f"M{cx},{cy-r} C{cx+r*k},{cy-r} {cx+r},{cy-r*k} {cx+r},{cy} C{cx+r},{cy+r*k} {cx+r*k},{cy+r} {cx},{cy+r} C{cx-r*k},{cy+r} {cx-r},{cy+r*k} {cx-r},{cy} C{cx-r},{cy-r*k} {cx-r*k},{cy-r} {cx},{cy-r} Z"
-        paths.append((d, fill, stroke, fill_rule))
-    
-    elif tag == 'ellipse':
-        cx = float(element.get('cx', 0))
-        cy = float(element.get('cy', 0))
-        rx = float(element.get('rx', 0))
-        ry = float(element.get('ry', 0))
-        k = 0.5522847498
-        d = f"M{cx},{cy-ry} C{cx+rx*k},{cy-ry} {cx+rx},{cy-ry*k} {cx+rx},{cy} C{cx+rx},{cy+ry*k} {cx+rx*k},{cy+ry} {cx},{cy+ry} C{cx-rx*k},{cy+ry} {cx-rx},{cy+ry*k} {cx-rx},{cy} C{cx-rx},{cy-ry*k} {cx-rx*k},{cy-ry} {cx},{cy-ry} Z"
-        paths.append((d, fill, stroke, fill_rule))
-    
-    elif tag == 'polygon':
-        points = element.get('points', '').strip()
-        if points:
-            # Parse points
-            coords = re.findall(r'[-+]?\d*\.?\d+', points)
-            if len(coords) >= 4:
-                d = f"M{coords[0]},{coords[1]}"
-                for i in range(2, len(coords), 2):
-                    d += f" L{coords[i]},{coords[i+1]}"
-                d += " Z"
-                paths.append((d, fill, stroke, fill_rule))
-    
-    elif tag == 'polyline':
-        points = element.get('points', '').strip()
-        if points:
-            coords = re.findall(r'[-+]?\d*\.?\d+', points)
-            if len(coords) >= 4:
-                d = f"M{coords[0]},{coords[1]}"
-                for i in range(2, len(coords), 2):
-                    d += f" L{coords[i]},{coords[i+1]}"
-                paths.append((d, fill, stroke, fill_rule))
-    
-    # Recurse into children
-    for child in element:
-        collect_paths(child, paths, parent_transform)
+def format_dimension(value: float) -> str:
+    """Format a viewport dimension or stroke width without float noise."""
+    return f"{round(value, 3):g}"
 
 
-def extract_style(style: str, prop: str) -> Optional[str]:
-    """Extract a property value from CSS style string."""
-    match = re.search(rf'{prop}\s*:\s*([^;]+)', style)
-    return match.group(1).strip() if match else None
+def serialize_vector_items(items: list, precision: Optional[int]) -> list:
+    """
+    Turn normalized paths and groups into (path_data, path) / (clip_data, [items])
+    pairs. A `precision` of None keeps full float precision (the unoptimized baseline).
+    """
+    def path_string(segments):
+        if precision is None:
+            return ' '.join(command + ','.join(repr(v) for v in args) for command, args in segments)
+        return pathdata.serialize_path(segments, precision)
+
+    result = []
+    for item in items:
+        if isinstance(item, svg_normalize.VectorGroup):
+            children = serialize_vector_items(item.items, precision)
+            if children:
+                result.append((path_string(item.clip_segments), children))
+        else:
+            result.append((path_string(item.segments), item))
+    return result
+
+
+def _gradient_xml(attribute: str, gradient: dict, indent: str) -> str:
+    """Render a gradient as an inline aapt:attr resource."""
+    lines = [f'{indent}<aapt:attr name="android:{attribute}">']
+    if gradient['type'] == 'linear':
+        (start_x, start_y), (end_x, end_y) = gradient['start'], gradient['end']
+        lines.append(f'{indent}  <gradient android:type="linear"'
+                     f' android:startX="{format_dimension(start_x)}" android:startY="{format_dimension(start_y)}"'
+                     f' android:endX="{format_dimension(end_x)}" android:endY="{format_dimension(end_y)}"'
+                     f' android:tileMode="{gradient["tile"]}">')
+    else:
+        center_x, center_y = gradient['center']
+        lines.append(f'{indent}  <gradient android:type="radial"'
+                     f' android:centerX="{format_dimension(center_x)}" android:centerY="{format_dimension(center_y)}"'
+                     f' android:gradientRadius="{format_dimension(gradient["radius"])}"'
+                     f' android:tileMode="{gradient["tile"]}">')
+    for offset, color in gradient['stops']:
+        lines.append(f'{indent}    <item android:offset="{format_dimension(offset)}" android:color="{color}"/>')
+    lines.append(f'{indent}  </gradient>')
+    lines.append(f'{indent}</aapt:attr>')
+    return '\n'.join(lines) + '\n'
+
+
+def _render_items(items: list, indent: str) -> str:
+    xml = ''
+    for path_data, item in items:
+        if isinstance(item, list):
+            xml += f'{indent}<group>\n'
+            xml += f'{indent}  <clip-path android:pathData="{path_data}"/>\n'
+            xml += _render_items(item, indent + '  ')
+            xml += f'{indent}</group>\n'
+            continue
+
+        attributes = [f'android:pathData="{path_data}"']
+        gradients = []
+        if isinstance(item.fill, dict):
+            gradients.append(('fillColor', item.fill))
+        elif item.fill:
+            attributes.append(f'android:fillColor="{item.fill}"')
+        if item.fill and item.fill_alpha < 1:
+            attributes.append(f'android:fillAlpha="{item.fill_alpha:g}"')
+        if item.fill and item.fill_rule == 'evenodd':
+            attributes.append('android:fillType="evenOdd"')
+        if item.stroke:
+            if isinstance(item.stroke, dict):
+                gradients.append(('strokeColor', item.stroke))
+            else:
+                attributes.append(f'android:strokeColor="{item.stroke}"')
+            attributes.append(f'android:strokeWidth="{format_dimension(item.stroke_width)}"')
+            if item.stroke_alpha < 1:
+                attributes.append(f'android:strokeAlpha="{item.stroke_alpha:g}"')
+            if item.stroke_line_cap in ('round', 'square'):
+                attributes.append(f'android:strokeLineCap="{item.stroke_line_cap}"')
+            if item.stroke_line_join in ('round', 'bevel'):
+                attributes.append(f'android:strokeLineJoin="{item.stroke_line_join}"')
+            elif item.stroke_miter_limit != 4:
+                attributes.append(f'android:strokeMiterLimit="{item.stroke_miter_limit:g}"')
+
+        xml += f'{indent}<path\n'
+        xml += ''.join(f'{indent}    {attribute}\n' for attribute in attributes)
+        if gradients:
+            xml = xml.rstrip('\n') + '>\n'
+            for attribute, gradient in gradients:
+                xml += _gradient_xml(attribute, gradient, indent + '  ')
+            xml += f'{indent}</path>\n'
+        else:
+            xml = xml.rstrip('\n') + '/>\n'
+    return xml
+
+
+def _has_gradient(items: list) -> bool:
+    for _, item in items:
+        if isinstance(item, list):
+            if _has_gradient(item):
+                return True
+        elif isinstance(item.fill, dict) or isinstance(item.stroke, dict):
+            return True
+    return False
+
+
+def render_vector_xml(items: list, vp_width: float, vp_height: float) -> str:
+    """Render serialized items (see serialize_vector_items) as a VectorDrawable document."""
+    aapt = '\n    xmlns:aapt="http://schemas.android.com/aapt"' if _has_gradient(items) else ''
+    width, height = format_dimension(vp_width), format_dimension(vp_height)
+    vector_xml = f'''<vector xmlns:android="http://schemas.android.com/apk/res/android"{aapt}
+    android:width="{width}dp"
+    android:height="{height}dp"
+    android:viewportWidth="{width}"
+    android:viewportHeight="{height}">
+'''
+    vector_xml += _render_items(items, '  ')
+    vector_xml += '</vector>\n'
+    return vector_xml
 
 
-def normalize_color(color: str) -> str:
-    """Normalize color to Android-compatible format."""
-    if not color:
-        return '#000000'
-    
-    color = color.strip()
-    
-    # Named colors
-    named_colors = {
-        'black': '#000000', 'white': '#FFFFFF', 'red': '#FF0000',
-        'green': '#00FF00', 'blue': '#0000FF', 'yellow': '#FFFF00',
-        'cyan': '#00FFFF', 'magenta': '#FF00FF', 'none': '#00000000',
-        'transparent': '#00000000'
-    }
-    if color.lower() in named_colors:
-        return named_colors[color.lower()]
-    
-    # Already hex
-    if color.startswith('#'):
-        if len(color) == 4:  # #RGB -> #RRGGBB
-            return f"#{color[1]*2}{color[2]*2}{color[3]*2}"
-        return color.upper()
-    
-    # RGB/RGBA
-    rgb_match = re.match(r'rgba?\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)', color)
-    if rgb_match:
-        r, g, b = int(rgb_match.group(1)), int(rgb_match.group(2)), int(rgb_match.group(3))
-        return f"#{r:02X}{g:02X}{b:02X}"
-    
-    return color
-
+def optimize_vector_paths(items: list) -> list:
+    """
+    Shrink normalized paths and groups for VectorDrawable output:
+    - drop paths without drawing commands, and groups left empty
+    - merge adjacent paths with identical paint whose bounding boxes don't overlap,
+      so the merge can't change winding or blending (never across a clip group)
+    Coordinates are rounded later, by serialize_vector_items.
+    """
+    merged = []
+    previous_bbox = None
+    for item in items:
+        if isinstance(item, svg_normalize.VectorGroup):
+            children = optimize_vector_paths(item.items)
+            if children:
+                merged.append(svg_normalize.VectorGroup(item.clip_segments, children))
+            previous_bbox = None
+            continue
+        if all(command in 'MZ' for command, _ in item.segments):
+            continue
+
+        bbox = pathdata.bounding_box(item.segments)
+        previous = merged[-1] if merged else None
+        if (previous_bbox is not None and isinstance(previous, svg_normalize.VectorPath)
+                and previous.paint_key() == item.paint_key()
+                and not pathdata.boxes_overlap(previous_bbox, bbox)):
+            previous.segments = previous.segments + item.segments
+            previous_bbox = (min(previous_bbox[0], bbox[0]), min(previous_bbox[1], bbox[1]),
+                             max(previous_bbox[2], bbox[2]), max(previous_bbox[3], bbox[3]))
+        else:
+            merged.append(dataclasses.replace(item))
+            previous_bbox = bbox
 
-def normalize_path_data(d: str) -> str:
-    """Clean up path data for Android compatibility."""
-    # Remove newlines and excess whitespace
-    d = ' '.join(d.split())
-    # Ensure proper spacing around commands
-    d = re.sub(r'([a-zA-Z])', r' \1 ', d)
-    d = ' '.join(d.split())
-    return d.strip()
+    return merged
 
 
 def validate_stream(station: dict, verbose: bool = False) -> tuple[bool, str]:
@@ -408,270 +424,68 @@ def validate_stream(station: dict, verbose: bool = False) -> tuple[bool, str]:
         return False, str(e)
 
 
-def generate_repository(data: dict, dry_run: bool = False, verbose: bool = False) -> bool:
-    """Generate RadioRepository.kt from station data."""
+def prepare_station_entry(station: dict, constants: dict) -> dict:
+    """Resolve the resource references and defaults of a station for code generation."""
+    country_key = station.get('country', '')
+
+    # Map country to R.string reference
+    country_res = f"R.string.{constants['countries'].get(country_key, 'country_' + country_key)}" if country_key else "0"
+
+    # Check if logo XML exists
+    logo_xml = DRAWABLE_DIR / f"logo_{station['id']}.xml"
+    logo_res_id = f"R.drawable.logo_{station['id']}" if logo_xml.exists() else "0"
+
+    return {
+        'id': station['id'],
+        'name': station['name'],
+        'stream_url': station['stream_url'],
+        'logo_url': station.get('logo_url', ''),
+        'logo_res_id': logo_res_id,
+        'description': station.get('description', ''),
+        'primary_tag': station.get('primary_tag', ''),
+        'country': country_key,
+        'country_res': country_res,
+        'popularity': station.get('popularity', 0),
+        'tags': station.get('tags', ''),
+        'website_url': station.get('website_url', ''),
+        'metadata_type': station.get('metadata_type'),
+        'metadata_param': station.get('metadata_param'),
+    }
+
+
+def generate_repository(data: dict, dry_run: bool = False, verbose: bool = False,
+                        chunk_size: int = kotlin_codegen.DEFAULT_CHUNK_SIZE,
+                        split_files: bool = False, catalog_format: str = 'kotlin') -> bool:
+    """
+    Generate RadioRepository.kt from station data.
+
+    With catalog_format='asset' the stations are written to the binary
+    catalog asset and RadioRepository.kt only contains a thin accessor.
+    """
     constants = data['constants']
     stations = sorted(data['stations'], key=lambda x: x['name'].lower())
     #stations = sorted(data['stations'], key=lambda x: x.get('popularity', 0), reverse=True)
-    
-    # Build station entries
-    station_entries = []
-    for station in stations:
-        primary_tag = station.get('primary_tag', '')
-        country_key = station.get('country', '')
-        
-        # Map country to R.string reference
-        country_res = f"R.string.{constants['countries'].get(country_key, 'country_' + country_key)}" if country_key else "0"
-        
-        # Check if logo XML exists
-        logo_xml = DRAWABLE_DIR / f"logo_{station['id']}.xml"
-        logo_res_id = f"R.drawable.logo_{station['id']}" if logo_xml.exists() else "0"
-        
-        # Escape quotes in strings
-        name = station['name'].replace('"', '\\"')
-        description = station.get('description', '').replace('"', '\\"')
-        tags = station.get('tags', '').replace('"', '\\"')
-        website_url = station.get('website_url', '').replace('"', '\\"')
-        popularity = station.get('popularity', 0)
-        
-        entry = f'''                        RadioStation(
-                                id = "{station['id']}",
-                                name = "{name}",
-                                streamUrl = "{station['stream_url']}",
-                                logoUrl = "{station.get('logo_url', '')}",
-                                logoResId = {logo_res_id},
-                                description = "{description}",
-                                primaryTag = "{primary_tag}",
-                                country = {country_res},
-                                popularity = {popularity},
-                                tags = "{tags}",
-                                websiteUrl = "{website_url}",
-                                metadataType = {f'"{station["metadata_type"]}"' if "metadata_type" in station else "null"},
-                                metadataParam = {f'"{station["metadata_param"]}"' if "metadata_param" in station else "null"}
-                        )'''
-        station_entries.append(entry)
-    
-    # Generate the full file
-    stations_list = ',\n'.join(station_entries)
-    
-    repository_content = f'''// AUTO-GENERATED from stations.yaml - DO NOT EDIT MANUALLY
-// Run: ./gradlew buildStations (or python scripts/build_stations.py)
-// Generated with {len(stations)} stations
-
-package org.guakamole.onair.data
-
-import android.content.Context
-import android.content.SharedPreferences
-import org.guakamole.onair.R
-
-/** Sort order options for non-favorite stations */
-enum class SortOrder {{
-    ALPHABETICAL,
-    MOST_LISTENED
-}}
-
-/** Repository providing a curated list of public radio stations */
-object RadioRepository {{
-
-        private const val PREFS_NAME = "radio_prefs"
-        private const val FAVORITES_KEY = "favorite_stations"
-        private const val REGIONS_KEY = "selected_regions"
-        private const val STYLES_KEY = "selected_styles"
-        private const val LISTEN_COUNTS_KEY = "listen_counts"
-        private const val SORT_ORDER_KEY = "sort_order"
-        private var prefs: SharedPreferences? = null
-        private val favoriteIds = mutableSetOf<String>()
-        private val listenCounts = mutableMapOf<String, Int>()
-
-        private val baseStations: List<RadioStation> =
-                listOf(
-{stations_list}
-                )
-
-        /** Initialize favorites and listen counts from persistent storage */
-        fun initialize(context: Context) {{
-                if (prefs == null) {{
-                        prefs = context.getSharedPreferences(PREFS_NAME, Context.MODE_PRIVATE)
-                        val savedFavorites =
-                                prefs?.getStringSet(FAVORITES_KEY, emptySet()) ?: emptySet()
-                        favoriteIds.clear()
-                        favoriteIds.addAll(savedFavorites)
-                        
-                        // Load listen counts
-                        val countsString = prefs?.getString(LISTEN_COUNTS_KEY, null)
-                        listenCounts.clear()
-                        countsString?.split(",")?.forEach {{ entry ->
-                                val parts = entry.split(":")
-                                if (parts.size == 2) {{
-                                        parts[0].let {{ id ->
-                                                parts[1].toIntOrNull()?.let {{ count ->
-                                                        listenCounts[id] = count
-                                                }}
-                                        }}
-                                }}
-                        }}
-                }}
-        }}
-
-        /**
-         * Returns the list of stations with correctly set isFavorite flags, sorted by favorite
-         * status
-         */
-        val stations: List<RadioStation>
-                get() =
-                        baseStations
-                                .map {{ station ->
-                                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                                }}
-                                .sortedByDescending {{ it.isFavorite }}
-        
-        /** Get non-favorite stations sorted by the specified order */
-        fun getNonFavoritesSorted(sortOrder: SortOrder): List<RadioStation> {{
-                val nonFavorites = baseStations
-                        .map {{ station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }}
-                        .filter {{ !it.isFavorite }}
-                
-                return when (sortOrder) {{
-                        SortOrder.ALPHABETICAL -> nonFavorites.sortedBy {{ it.name.lowercase() }}
-                        SortOrder.MOST_LISTENED -> nonFavorites.sortedByDescending {{ getListenCount(it.id) }}
-                }}
-        }}
-        
-        /** Get favorite stations */
-        fun getFavorites(): List<RadioStation> {{
-                return baseStations
-                        .map {{ station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }}
-                        .filter {{ it.isFavorite }}
-        }}
-        
-        /** Increment listen count for a station */
-        fun incrementListenCount(stationId: String) {{
-                val currentCount = listenCounts[stationId] ?: 0
-                listenCounts[stationId] = currentCount + 1
-                saveListenCounts()
-        }}
-        
-        /** Get listen count for a station */
-        fun getListenCount(stationId: String): Int {{
-                return listenCounts[stationId] ?: 0
-        }}
-        
-        private fun saveListenCounts() {{
-                val countsString = listenCounts.entries.joinToString(",") {{ "${{it.key}}:${{it.value}}" }}
-                prefs?.edit()?.putString(LISTEN_COUNTS_KEY, countsString)?.apply()
-        }}
-        
-        /** Get saved sort order */
-        fun getSortOrder(): SortOrder {{
-                val ordinal = prefs?.getInt(SORT_ORDER_KEY, SortOrder.ALPHABETICAL.ordinal) 
-                        ?: SortOrder.ALPHABETICAL.ordinal
-                return SortOrder.values().getOrElse(ordinal) {{ SortOrder.ALPHABETICAL }}
-        }}
-        
-        /** Save sort order preference */
-        fun setSortOrder(sortOrder: SortOrder) {{
-                prefs?.edit()?.putInt(SORT_ORDER_KEY, sortOrder.ordinal)?.apply()
-        }}
-        
-        /**
-         * Get stations ordered for Android Auto:
-         * 1. Favorites first
-         * 2. Most listened (non-favorites)
-         * 3. Remaining stations with alphabet distribution
-         */
-        fun getStationsForAndroidAuto(): List<RadioStation> {{
-                val allStations = baseStations.map {{ station ->
-                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                }}
-                
-                val favorites = allStations.filter {{ it.isFavorite }}.sortedBy {{ it.name.lowercase() }}
-                val nonFavorites = allStations.filter {{ !it.isFavorite }}
-                
-                // Get most listened non-favorites (top 10)
-                val mostListenedIds = listenCounts.entries
-                        .filter {{ entry -> nonFavorites.any {{ it.id == entry.key }} }}
-                        .sortedByDescending {{ it.value }}
-                        .take(10)
-                        .map {{ it.key }}
-                        .toSet()
-                
-                val mostListened = nonFavorites.filter {{ it.id in mostListenedIds }}
-                        .sortedByDescending {{ getListenCount(it.id) }}
-                
-                // Remaining stations sorted alphabetically
-                val remaining = nonFavorites.filter {{ it.id !in mostListenedIds }}
-                        .sortedBy {{ it.name.lowercase() }}
-                
-                return favorites + mostListened + remaining
-        }}
-        
-        /** Get top N most listened stations */
-        fun getMostListened(limit: Int = 10): List<RadioStation> {{
-                val allStations = baseStations.map {{ station ->
-                        station.copy(isFavorite = favoriteIds.contains(station.id))
-                }}
-                
-                return allStations
-                        .filter {{ getListenCount(it.id) > 0 }}
-                        .sortedByDescending {{ getListenCount(it.id) }}
-                        .take(limit)
-        }}
-        
-        /** Get stations by genre/tag */
-        fun getStationsByGenre(tag: String): List<RadioStation> {{
-                return baseStations
-                        .filter {{ it.primaryTag == tag }}
-                        .map {{ station -> station.copy(isFavorite = favoriteIds.contains(station.id)) }}
-                        .sortedBy {{ it.name.lowercase() }}
-        }}
-
-        fun toggleFavorite(stationId: String) {{
-                if (favoriteIds.contains(stationId)) {{
-                        favoriteIds.remove(stationId)
-                }} else {{
-                        favoriteIds.add(stationId)
-                }}
-
-                prefs?.edit()?.putStringSet(FAVORITES_KEY, favoriteIds)?.apply()
-        }}
-
-        fun getSelectedRegions(): Set<String> {{
-                return prefs?.getStringSet(REGIONS_KEY, emptySet()) ?: emptySet()
-        }}
-
-        fun setSelectedRegions(regions: Set<String>) {{
-                prefs?.edit()?.putStringSet(REGIONS_KEY, regions)?.apply()
-        }}
-
-        fun getSelectedStyles(): Set<String> {{
-                return prefs?.getStringSet(STYLES_KEY, emptySet()) ?: emptySet()
-        }}
-
-        fun setSelectedStyles(styles: Set<String>) {{
-                prefs?.edit()?.putStringSet(STYLES_KEY, styles)?.apply()
-        }}
-
-        fun getStationById(id: String): RadioStation? {{
-                return stations.find {{ it.id == id }}
-        }}
-
-        fun getStationByIndex(index: Int): RadioStation? {{
-                return stations.getOrNull(index)
-        }}
-
-        fun getStationIndex(id: String): Int {{
-                return stations.indexOfFirst {{ it.id == id }}
-        }}
-}}
-'''
+
+    entries = [prepare_station_entry(station, constants) for station in stations]
 
     if dry_run:
         log(f"[DRY-RUN] Would generate RadioRepository.kt with {len(stations)} stations", force=True)
         return True
-    
-    with open(REPOSITORY_PATH, 'w', encoding='utf-8') as f:
-        f.write(repository_content)
-    
+
+    if catalog_format == 'asset':
+        catalog, country_res, logo_res = station_catalog.build_catalog(entries)
+        station_catalog.write_catalog(CATALOG_ASSET_PATH, catalog)
+        log(f"  ✓ Generated {CATALOG_ASSET_PATH.name} ({len(catalog)} bytes)", verbose)
+        written = kotlin_codegen.write_asset_repository(REPOSITORY_PATH, len(entries),
+                                                        country_res, logo_res)
+    else:
+        # Don't ship a stale asset next to the compiled-in catalog
+        CATALOG_ASSET_PATH.unlink(missing_ok=True)
+        written = kotlin_codegen.write_repository(REPOSITORY_PATH, entries,
+                                                  chunk_size=chunk_size, split_files=split_files)
+    for path in written[1:]:
+        log(f"  ✓ Generated {path.name}", verbose)
+
     log(f"✓ Generated RadioRepository.kt with {len(stations)} stations", force=True)
     return True
 
@@ -686,6 +500,22 @@ def main():
                         help="Don't write any files, just validate")
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Show detailed output')
+    parser.add_argument('--chunk-size', type=int, default=kotlin_codegen.DEFAULT_CHUNK_SIZE,
+                        help='Maximum stations per generated initializer function')
+    parser.add_argument('--split-files', action='store_true',
+                        help='Emit station chunks as separate RadioStationsN.kt files')
+    parser.add_argument('--catalog-format', choices=['kotlin', 'asset'], default='kotlin',
+                        help='Compile stations into Kotlin, or write them to a binary asset')
+    parser.add_argument('--vd-tool', action='store_true',
+                        help="Convert logos with the Android SDK's vd-tool before the Python converter")
+    parser.add_argument('--path-precision', type=int, default=pathdata.DEFAULT_PRECISION,
+                        help='Decimals kept in converted logo path data')
+    parser.add_argument('--rasterize-logos', action='store_true',
+                        help='Pre-render logo bitmaps for Android Auto')
+    parser.add_argument('--raster-format', choices=logo_raster.FORMATS, default='webp',
+                        help='Bitmap format for --rasterize-logos')
+    parser.add_argument('--raster-jobs', type=int, default=None,
+                        help='Number of rasterization processes')
     
     args = parser.parse_args()
     
@@ -701,11 +531,38 @@ def main():
     
     # Process logos
     print("\n📥 Processing logos...")
+    vector_svgs = []
     for station in data['stations']:
         log(f"\n  {station['name']}:", args.verbose, force=args.verbose)
         svg_path = fetch_svg(station, force=args.force_logos, verbose=args.verbose, dry_run=args.dry_run)
         if svg_path and svg_path.exists():
-            convert_svg_to_vector(svg_path, force=args.force_logos, verbose=args.verbose, dry_run=args.dry_run)
+            xml_path = convert_svg_to_vector(svg_path, force=args.force_logos, verbose=args.verbose,
+                                             dry_run=args.dry_run, precision=args.path_precision,
+                                             prefer_vd_tool=args.vd_tool)
+            if xml_path:
+                vector_svgs.append(svg_path)
+
+    # Rasterize logos
+    if args.rasterize_logos:
+        print("\n🖼  Rasterizing logos...")
+        if args.dry_run:
+            log(f"  [DRY-RUN] Would rasterize {len(vector_svgs)} logos", force=True)
+        else:
+            try:
+                manifest = logo_raster.rasterize_logos(
+                    vector_svgs, LOGO_BITMAP_DIR, fmt=args.raster_format,
+                    jobs=args.raster_jobs, verbose=args.verbose)
+                print(f"  ✓ {len(manifest['logos'])} logos in {LOGO_BITMAP_DIR.name}/{logo_raster.MANIFEST_NAME}")
+            except RuntimeError as e:
+                print(f"  ✗ {e}")
+                sys.exit(1)
+    elif LOGO_BITMAP_DIR.exists():
+        # Don't ship stale bitmaps and manifest from an earlier --rasterize-logos build
+        if args.dry_run:
+            log(f"  [DRY-RUN] Would remove {LOGO_BITMAP_DIR.name}/", force=True)
+        else:
+            shutil.rmtree(LOGO_BITMAP_DIR)
+            log(f"  ✓ Removed {LOGO_BITMAP_DIR.name}/ (built without --rasterize-logos)", args.verbose)
     
     # Validate streams
     if args.validate_streams:
@@ -717,7 +574,9 @@ def main():
     
     # Generate repository
     print("\n📝 Generating RadioRepository.kt...")
-    generate_repository(data, dry_run=args.dry_run, verbose=args.verbose)
+    generate_repository(data, dry_run=args.dry_run, verbose=args.verbose,
+                        chunk_size=args.chunk_size, split_files=args.split_files,
+                        catalog_format=args.catalog_format)
     
     print("\n✅ Done!")
     return 0
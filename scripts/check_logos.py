@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Golden check for the pure-Python logo converter.
+
+Converts every logo SVG in app/src/main/res/drawable/svgs with the Python
+converter (build_stations.convert_svg_simple) and compares the result with
+the committed vector drawable of the same name, which serves as the golden
+reference. Both drawables are rasterized on a coarse grid by a small
+pure-Python scanline renderer and compared pixel by pixel, so no JVM or
+Android tooling is needed.
+
+Usage:
+    python scripts/check_logos.py [--grid N] [--threshold PCT] [--verbose] [NAME ...]
+
+Exits with status 1 if any logo differs from its reference by more than
+the threshold (percentage of grid pixels with a visibly different color).
+"""
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import build_stations
+import pathdata
+import svg_normalize
+
+
+ANDROID = '{http://schemas.android.com/apk/res/android}'
+
+DEFAULT_GRID = 96
+DEFAULT_THRESHOLD = 3.0
+
+# Per-channel difference (0-255) above which a pixel counts as different
+COLOR_TOLERANCE = 48
+
+CURVE_STEPS = 8
+
+# Committed drawables that were recolored by hand for dark backgrounds; only
+# their shape is compared
+RECOLORED = {'logo_franceinfo', 'logo_radio_nova'}
+
+
+def parse_android_color(value: str) -> tuple:
+    """Parse #RGB, #ARGB, #RRGGBB or #AARRGGBB into (r, g, b, a) with a in 0..1."""
+    digits = value.strip().lstrip('#')
+    if len(digits) in (3, 4):
+        digits = ''.join(c * 2 for c in digits)
+    if len(digits) == 6:
+        digits = 'FF' + digits
+    if len(digits) != 8:
+        return 0, 0, 0, 0.0
+    a, r, g, b = (int(digits[i:i + 2], 16) for i in range(0, 8, 2))
+    return r, g, b, a / 255
+
+
+def gradient_color(element) -> tuple:
+    """Average color of an inline <gradient>, good enough for a coarse check."""
+    colors = [parse_android_color(item.get(ANDROID + 'color', '#0000'))
+              for item in element.iter('item')]
+    for name in ('startColor', 'centerColor', 'endColor'):
+        if element.get(ANDROID + name):
+            colors.append(parse_android_color(element.get(ANDROID + name)))
+    if not colors:
+        return 0, 0, 0, 0.0
+    return tuple(sum(c[i] for c in colors) / len(colors) for i in range(4))
+
+
+def flatten(path_data: str) -> list:
+    """Flatten path data into closed polylines (lists of points)."""
+    segments = svg_normalize.to_curves(pathdata.to_absolute(pathdata.parse_path(path_data)))
+    polylines = []
+    current = []
+    x = y = 0.0
+    for command, args in segments:
+        if command == 'M':
+            if len(current) > 1:
+                polylines.append(current)
+            x, y = args
+            current = [(x, y)]
+        elif command == 'Z':
+            if len(current) > 1:
+                polylines.append(current)
+            current = [current[0]] if current else []
+            if current:
+                x, y = current[0]
+        elif command == 'L':
+            x, y = args
+            current.append((x, y))
+        else:
+            points = [(x, y)] + [(args[i], args[i + 1]) for i in range(0, len(args), 2)]
+            for step in range(1, CURVE_STEPS + 1):
+                t = step / CURVE_STEPS
+                level = points
+                while len(level) > 1:
+                    level = [(a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t)
+                             for a, b in zip(level, level[1:])]
+                current.append(level[0])
+            x, y = args[-2], args[-1]
+    if len(current) > 1:
+        polylines.append(current)
+    return polylines
+
+
+class Raster:
+    """RGBA coverage grid over a drawable's viewport."""
+
+    def __init__(self, width: float, height: float, grid: int):
+        self.scale = grid / max(width, height)
+        self.columns = max(1, round(width * self.scale))
+        self.rows = max(1, round(height * self.scale))
+        self.pixels = [[(0.0, 0.0, 0.0, 0.0)] * self.columns for _ in range(self.rows)]
+
+    def fill_mask(self, polylines: list, even_odd: bool) -> set:
+        """Pixels whose centers are inside the polylines."""
+        edges = []
+        for line in polylines:
+            closed = line + [line[0]]
+            for (x0, y0), (x1, y1) in zip(closed, closed[1:]):
+                if y0 != y1:
+                    edges.append((x0 * self.scale, y0 * self.scale, x1 * self.scale, y1 * self.scale))
+        inside = set()
+        for row in range(self.rows):
+            center_y = row + 0.5
+            crossings = []
+            for x0, y0, x1, y1 in edges:
+                if (y0 <= center_y < y1) or (y1 <= center_y < y0):
+                    crossing_x = x0 + (center_y - y0) * (x1 - x0) / (y1 - y0)
+                    crossings.append((crossing_x, 1 if y1 > y0 else -1))
+            if not crossings:
+                continue
+            crossings.sort()
+            winding = 0
+            index = 0
+            for column in range(self.columns):
+                center_x = column + 0.5
+                while index < len(crossings) and crossings[index][0] < center_x:
+                    winding += 1 if even_odd else crossings[index][1]
+                    index += 1
+                if (winding % 2 if even_odd else winding) != 0:
+                    inside.add((row, column))
+        return inside
+
+    def stroke_mask(self, polylines: list, width: float) -> set:
+        """Pixels whose centers are within half the stroke width of the outline."""
+        radius = width * self.scale / 2
+        inside = set()
+        for line in polylines:
+            for (x0, y0), (x1, y1) in zip(line, line[1:]):
+                x0, y0, x1, y1 = (v * self.scale for v in (x0, y0, x1, y1))
+                dx, dy = x1 - x0, y1 - y0
+                length_squared = dx * dx + dy * dy
+                for row in range(max(0, int(min(y0, y1) - radius)),
+                                 min(self.rows, int(max(y0, y1) + radius) + 1)):
+                    for column in range(max(0, int(min(x0, x1) - radius)),
+                                        min(self.columns, int(max(x0, x1) + radius) + 1)):
+                        px, py = column + 0.5, row + 0.5
+                        t = 0.0 if not length_squared else \
+                            max(0.0, min(1.0, ((px - x0) * dx + (py - y0) * dy) / length_squared))
+                        if math.hypot(px - x0 - t * dx, py - y0 - t * dy) <= radius:
+                            inside.add((row, column))
+        return inside
+
+    def paint(self, mask: set, color: tuple, alpha: float):
+        r, g, b, a = color
+        a *= alpha
+        if a <= 0:
+            return
+        for row, column in mask:
+            pr, pg, pb, pa = self.pixels[row][column]
+            out_a = a + pa * (1 - a)
+            if out_a <= 0:
+                continue
+            self.pixels[row][column] = (
+                (r * a + pr * pa * (1 - a)) / out_a,
+                (g * a + pg * pa * (1 - a)) / out_a,
+                (b * a + pb * pa * (1 - a)) / out_a,
+                out_a,
+            )
+
+
+def paint_color(path, attribute: str):
+    value = path.get(ANDROID + attribute)
+    if value:
+        return parse_android_color(value)
+    for attr in path.findall('{http://schemas.android.com/aapt}attr'):
+        if attr.get('name') == 'android:' + attribute:
+            gradient = attr.find('gradient')
+            if gradient is not None:
+                return gradient_color(gradient)
+    return None
+
+
+def render_drawable(xml_path: Path, grid: int) -> Raster:
+    """Rasterize a vector drawable (paths, nested groups with clip paths)."""
+    root = ET.parse(xml_path).getroot()
+    raster = Raster(float(root.get(ANDROID + 'viewportWidth')),
+                    float(root.get(ANDROID + 'viewportHeight')), grid)
+
+    def draw(element, clip):
+        for child in element:
+            if child.tag == 'clip-path':
+                mask = raster.fill_mask(flatten(child.get(ANDROID + 'pathData', '')), False)
+                clip = mask if clip is None else clip & mask
+            elif child.tag == 'group':
+                if any(child.get(ANDROID + name) for name in
+                       ('translateX', 'translateY', 'scaleX', 'scaleY', 'rotation')):
+                    raise ValueError("group transforms are not supported by this check")
+                draw(child, clip)
+            elif child.tag == 'path':
+                polylines = flatten(child.get(ANDROID + 'pathData', ''))
+                fill = paint_color(child, 'fillColor')
+                if fill:
+                    even_odd = child.get(ANDROID + 'fillType') == 'evenOdd'
+                    mask = raster.fill_mask(polylines, even_odd)
+                    raster.paint(mask if clip is None else mask & clip, fill,
+                                 float(child.get(ANDROID + 'fillAlpha', 1)))
+                stroke = paint_color(child, 'strokeColor')
+                width = float(child.get(ANDROID + 'strokeWidth', 0))
+                if stroke and width > 0:
+                    mask = raster.stroke_mask(polylines, width)
+                    raster.paint(mask if clip is None else mask & clip, stroke,
+                                 float(child.get(ANDROID + 'strokeAlpha', 1)))
+
+    draw(root, None)
+    return raster
+
+
+def difference(a: Raster, b: Raster, shape_only: bool = False) -> float:
+    """Percentage of pixels whose premultiplied colors (or only coverage) differ visibly."""
+    if (a.rows, a.columns) != (b.rows, b.columns):
+        return 100.0
+    different = 0
+    for row_a, row_b in zip(a.pixels, b.pixels):
+        for pixel_a, pixel_b in zip(row_a, row_b):
+            if shape_only:
+                if (pixel_a[3] > 0) != (pixel_b[3] > 0):
+                    different += 1
+                continue
+            premultiplied_a = [c * pixel_a[3] for c in pixel_a[:3]] + [255 * pixel_a[3]]
+            premultiplied_b = [c * pixel_b[3] for c in pixel_b[:3]] + [255 * pixel_b[3]]
+            if max(abs(x - y) for x, y in zip(premultiplied_a, premultiplied_b)) > COLOR_TOLERANCE:
+                different += 1
+    return 100 * different / (a.rows * a.columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare converted logos with the committed drawables')
+    parser.add_argument('names', nargs='*', help='Logo names to check (default: all)')
+    parser.add_argument('--grid', type=int, default=DEFAULT_GRID,
+                        help='Raster size of the longest viewport side')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Maximum percentage of differing pixels')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show every logo')
+    args = parser.parse_args()
+
+    svgs = sorted(build_stations.SVG_DIR.glob('logo_*.svg'))
+    if args.names:
+        svgs = [svg for svg in svgs if svg.stem in args.names]
+
+    failures = []
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for svg in svgs:
+            reference = build_stations.DRAWABLE_DIR / f"{svg.stem}.xml"
+            if not reference.exists():
+                continue
+            converted = Path(tmp) / reference.name
+            try:
+                build_stations.convert_svg_simple(svg, converted)
+                diff = difference(render_drawable(converted, args.grid),
+                                  render_drawable(reference, args.grid),
+                                  shape_only=svg.stem in RECOLORED)
+            except Exception as e:
+                failures.append(svg.stem)
+                print(f"  ✗ {svg.stem}: {e}")
+                continue
+            if diff > args.threshold:
+                failures.append(svg.stem)
+                print(f"  ✗ {svg.stem}: {diff:.1f}% of pixels differ")
+            elif args.verbose:
+                print(f"  ✓ {svg.stem}: {diff:.1f}%")
+
+    elapsed = time.perf_counter() - started
+    print(f"{len(svgs) - len(failures)}/{len(svgs)} logos match their reference ({elapsed:.1f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
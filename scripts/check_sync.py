@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Check for the incremental radio-browser mirror (radiobrowser_sync.py).
+
+Runs a local stand-in for the radio-browser API (/json/stations and
+/json/stations/changed) over a synthetic station list, seeds a mirror from
+a dump of it, then edits, adds, moves and deletes stations on the server
+and checks that incremental and full syncs leave every country's top-N
+identical to a recomputation from scratch, and that an incremental sync
+only touches the countries it should.
+
+Usage:
+    python scripts/check_sync.py [--stations N] [--seed N]
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from radiobrowser_sync import RadioBrowserApi, StationMirror, seed_from_dump, sync
+
+
+COUNTRIES = ['DE', 'FR', 'GB', 'US', 'IT', 'ES', 'NL']
+TOP_N = 10
+
+
+class FakeRadioBrowser:
+    """Station list plus change log, served like the radio-browser API."""
+
+    def __init__(self, rng: random.Random, count: int):
+        self.rng = rng
+        self.stations = {}
+        self.log = []
+        self.clock = 0
+        for _ in range(count):
+            self.edit(self.new_station())
+
+    def new_station(self) -> dict:
+        rng = self.rng
+        return {
+            'stationuuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'name': rng.choice(['', 'Radio', 'Jazz FM', 'News 24', 'Rock Antenne']),
+            'url': rng.choice(['', 'http://stream.example/live']),
+            'url_resolved': '',
+            'favicon': rng.choice(['', 'https://example/favicon.png']),
+            'tags': rng.choice(['', 'pop', 'jazz,news']),
+            'country': '',
+            'countrycode': rng.choice(COUNTRIES),
+            'clickcount': rng.randint(0, 2000),
+        }
+
+    def edit(self, station: dict):
+        self.clock += 1
+        station = dict(station, changeuuid=str(uuid.UUID(int=self.rng.getrandbits(128))),
+                       lastchangetime=f"2026-01-01 {self.clock // 3600 % 24:02d}:{self.clock // 60 % 60:02d}:{self.clock % 60:02d}")
+        self.stations[station['stationuuid']] = station
+        self.log.append(station)
+
+    def changed(self, last_change_uuid, limit):
+        start = 0
+        if last_change_uuid:
+            start = next(i for i, s in enumerate(self.log) if s['changeuuid'] == last_change_uuid) + 1
+        return self.log[start:start + limit]
+
+    def listing(self, offset, limit):
+        return list(self.stations.values())[offset:offset + limit]
+
+    def expected_top(self, country: str) -> list:
+        quality = [s for s in self.stations.values() if s['countrycode'] == country
+                   and s['name'] and s['url'] and s['favicon'] and s['tags']]
+        quality.sort(key=lambda s: (-s['clickcount'], s['stationuuid']))
+        return [s['stationuuid'] for s in quality[:TOP_N]]
+
+
+def serve(api: FakeRadioBrowser) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            limit = int(query.get('limit', 100000))
+            if url.path == '/json/stations/changed':
+                body = api.changed(query.get('lastchangeuuid'), limit)
+            elif url.path == '/json/stations':
+                body = api.listing(int(query.get('offset', 0)), limit)
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def compare(mirror: StationMirror, api: FakeRadioBrowser, label: str) -> bool:
+    ok = True
+    for country in COUNTRIES:
+        got = [s['stationuuid'] for s in mirror.top(country)]
+        if got != api.expected_top(country):
+            print(f"FAIL {label}: top {TOP_N} of {country} differs")
+            ok = False
+    if len(mirror) != len(api.stations):
+        print(f"FAIL {label}: mirror has {len(mirror)} stations, server {len(api.stations)}")
+        ok = False
+    if ok:
+        print(f"ok   {label}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check radiobrowser_sync against a local API stand-in')
+    parser.add_argument('--stations', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    api = FakeRadioBrowser(rng, args.stations)
+    server = serve(api)
+    client = RadioBrowserApi(f"http://127.0.0.1:{server.server_address[1]}", page_size=97)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = Path(tmp) / 'allStations.json'
+        dump.write_text(json.dumps(list(api.stations.values())), encoding='utf-8')
+        mirror = StationMirror(Path(tmp) / 'mirror.sqlite', top_n=TOP_N)
+        seed_from_dump(mirror, dump)
+        ok = compare(mirror, api, 'seed from dump')
+
+        # Edits confined to two countries, including station moves between them
+        touched = {'DE', 'FR'}
+        stations = [s for s in api.stations.values() if s['countrycode'] in touched]
+        for station in rng.sample(stations, 150):
+            api.edit(dict(station, clickcount=rng.randint(0, 5000),
+                          countrycode=rng.choice(sorted(touched))))
+        for _ in range(20):
+            api.edit(dict(api.new_station(), countrycode='DE', clickcount=rng.randint(1500, 3000)))
+        stats = sync(mirror, client)
+        ok &= compare(mirror, api, f"incremental sync ({stats['records']} changes)")
+        if stats['affected_countries'] > len(touched):
+            print(f"FAIL incremental sync recomputed {stats['affected_countries']} countries, "
+                  f"expected at most {len(touched)}")
+            ok = False
+
+        stats = sync(mirror, client)
+        if stats['records'] or stats['affected_countries']:
+            print(f"FAIL no-op sync applied {stats['records']} records")
+            ok = False
+        ok &= compare(mirror, api, 'no-op sync')
+
+        # Deletions only show up in a full listing
+        for station_uuid in rng.sample(sorted(api.stations), 30):
+            del api.stations[station_uuid]
+        sync(mirror, client, full=True)
+        ok &= compare(mirror, api, 'full sync after deletions')
+        mirror.close()
+
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
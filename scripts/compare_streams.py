@@ -1,88 +1,96 @@
-import requests
+import argparse
 import yaml
-import time
 import os
 
-# Wikidata API requires a User-Agent header
-HEADERS = {
-    "User-Agent": "OnAirRadioBot/0.1 (https://github.com/skadge/radio; contact@example.com) python-requests/2.x"
-}
+from stream_probe import DEFAULT_TIMEOUT, canonical_url, compare_many
+from wikidata_client import (WikidataError, STREAM, add_client_arguments, client_from_args,
+                             first_value, qid_from_url)
 
-def get_wikidata_stream_url(qid):
-    entity_url = f"https://www.wikidata.org/wiki/Special:EntityData/{qid}.json"
+def get_wikidata_stream_urls(client, qids):
+    """P963 (streaming media URL) per QID, fetched in batches of 50."""
     try:
-        response = requests.get(entity_url, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json().get("entities", {}).get(qid, {})
-    except Exception as e:
-        print(f"  Error fetching Wikidata for {qid}: {e}")
-        return None
-    
-    claims = data.get("claims", {})
-    
-    # Property P963: streaming media URL
-    if "P963" in claims:
-        try:
-            # There could be multiple, take the first one
-            return claims["P963"][0]["mainsnak"]["datavalue"]["value"]
-        except (KeyError, IndexError):
-            pass
-            
-    return None
+        claims = client.get_claims(qids, properties=(STREAM,))
+    except WikidataError as e:
+        print(f"  Error fetching Wikidata: {e}")
+        return {}
+    # There could be multiple, take the first one
+    return {qid: first_value(c, STREAM) for qid, c in claims.items()}
 
 def main():
+    parser = argparse.ArgumentParser(description='Compare stream URLs with Wikidata (P963)')
+    parser.add_argument('--no-probe', action='store_true',
+                        help='Only compare canonicalized URLs, without connecting to the streams')
+    parser.add_argument('--jobs', type=int, default=16,
+                        help='Number of URLs probed concurrently')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='Timeout per request, in seconds')
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
     if not os.path.exists('stations.yaml'):
         print("stations.yaml not found.")
         return
 
     with open('stations.yaml', 'r', encoding='utf-8') as f:
         data = yaml.safe_load(f)
-    
+
     stations = data.get('stations', [])
     report = []
-    
+
     print(f"Comparing stream URLs for {len(stations)} stations...")
-    
-    for s in stations:
-        name = s['name']
-        wiki_url = s.get('wikidata_url')
-        current_stream = s.get('stream_url')
-        
-        if not wiki_url:
-            continue
-            
-        qid = wiki_url.split('/')[-1]
-        print(f"Checking {name} ({qid})...")
-        
-        wiki_stream = get_wikidata_stream_url(qid)
-        
-        if wiki_stream:
-            # Normalize for comparison? (Remove trailing slashes, etc.)
-            norm_current = current_stream.strip().lower().rstrip('/')
-            norm_wiki = wiki_stream.strip().lower().rstrip('/')
-            
-            if norm_current != norm_wiki:
-                print(f"  DIFFERENCE FOUND!")
-                report.append({
-                    "name": name,
-                    "id": s.get('id'),
-                    "current": current_stream,
-                    "wikidata": wiki_stream,
-                    "wikidata_item": wiki_url
-                })
-        
-        # Rate limit
-        time.sleep(0.3)
-        
+
+    linked = [s for s in stations if s.get('wikidata_url')]
+    client = client_from_args(args)
+    wiki_streams = get_wikidata_stream_urls(client, [qid_from_url(s['wikidata_url']) for s in linked])
+    client.close()
+
+    candidates = []
+    for s in linked:
+        wiki_stream = wiki_streams.get(qid_from_url(s['wikidata_url']))
+        # http/https, CDN edge hosts and session tokens don't make a difference
+        if wiki_stream and canonical_url(s['stream_url']) != canonical_url(wiki_stream):
+            candidates.append((s, wiki_stream))
+
+    if args.no_probe:
+        comparisons = [None] * len(candidates)
+    else:
+        print(f"Probing {len(candidates)} URL pairs...")
+        comparisons = compare_many([(s['stream_url'], wiki_stream) for s, wiki_stream in candidates],
+                                   jobs=args.jobs, timeout=args.timeout)
+
+    for (s, wiki_stream), comparison in zip(candidates, comparisons):
+        if comparison is not None:
+            print(f"  {s['name']}: {comparison.verdict}")
+            if not comparison.actionable:
+                continue
+        report.append({
+            "name": s['name'],
+            "id": s.get('id'),
+            "current": s['stream_url'],
+            "wikidata": wiki_stream,
+            "wikidata_item": s['wikidata_url'],
+            "comparison": comparison,
+        })
+
     if report:
         print(f"\nFound {len(report)} differences. Generating report...")
         with open('stream_comparison_report.md', 'w', encoding='utf-8') as f:
             f.write("# Stream URL Comparison Report\n\n")
             f.write("Found differences between `stations.yaml` and Wikidata (P963).\n\n")
-            f.write("| Station | ID | Current URL | Wikidata URL | Wikidata Item |\n")
-            f.write("| :--- | :--- | :--- | :--- | :--- |\n")
-            for item in report:
-                f.write(f"| {item['name']} | `{item['id']}` | `{item['current']}` | `{item['wikidata']}` | [Item]({item['wikidata_item']}) |\n")
+            if args.no_probe:
+                f.write("| Station | ID | Current URL | Wikidata URL | Wikidata Item |\n")
+                f.write("| :--- | :--- | :--- | :--- | :--- |\n")
+                for item in report:
+                    f.write(f"| {item['name']} | `{item['id']}` | `{item['current']}` | `{item['wikidata']}` | [Item]({item['wikidata_item']}) |\n")
+            else:
+                f.write("Both URLs were resolved through redirects and playlists; only differences "
+                        "worth acting on are listed. Probe results: kind, codec, bitrate, time to first byte.\n\n")
+                f.write("| Station | ID | Verdict | Current URL | Current | Wikidata URL | Wikidata | Faster | Wikidata Item |\n")
+                f.write("| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |\n")
+                for item in report:
+                    c = item['comparison']
+                    f.write(f"| {item['name']} | `{item['id']}` | {c.verdict} | `{item['current']}` | {c.current.describe()} "
+                            f"| `{item['wikidata']}` | {c.candidate.describe()} | {c.faster or '—'} | [Item]({item['wikidata_item']}) |\n")
         print("Report saved to stream_comparison_report.md")
     else:
         print("\nNo differences found or no Wikidata stream URLs found.")
@@ -1,13 +1,13 @@
-import requests
+import argparse
+import asyncio
+import json
 import yaml
-import time
 import os
 import shutil
 
-# Wikidata API requires a User-Agent header
-HEADERS = {
-    "User-Agent": "OnAirRadioBot/0.1 (https://github.com/skadge/radio; skadge@guakamole.org) python-requests/2.x"
-}
+from wikidata_client import (BATCH_SIZE, WikidataClient, WikidataError, COUNTRY, WEBSITE, LOGO,
+                             add_client_arguments, client_from_args, commons_file_url,
+                             first_value)
 
 COUNTRY_MAP = {
     "uk": "Q145",
@@ -31,76 +31,43 @@ COUNTRY_MAP = {
     "mexico": "Q96"
 }
 
-def search_wikidata(name, country_code):
-    country_q = COUNTRY_MAP.get(country_code)
+# Number of search results checked per station
+CANDIDATES = 3
+
+def search_candidates(client, name, country_code):
+    """
+    QIDs of the first search results for a station, [] if its country isn't
+    mapped, or None if the search failed.
+    """
     # If country is not in our map, we search without country restriction but it's riskier
     # For now, let's stick to the mapped countries for quality
-    if not country_q:
-        return None
-
-    url = "https://www.wikidata.org/w/api.php"
-    params = {
-        "action": "wbsearchentities",
-        "format": "json",
-        "language": "en",
-        "search": name,
-        "type": "item"
-    }
-    
+    if not COUNTRY_MAP.get(country_code):
+        return []
     try:
-        response = requests.get(url, params=params, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-    except Exception as e:
+        results = client.search(name)
+    except WikidataError as e:
         print(f"  Error searching for {name}: {e}")
         return None
-    
-    results = data.get("search", [])
-    if not results:
-        return None
-    
-    # Check the first few results
-    for result in results[:3]:
-        qid = result["id"]
-        entity_url = f"https://www.wikidata.org/wiki/Special:EntityData/{qid}.json"
-        try:
-            res = requests.get(entity_url, headers=HEADERS)
-            res.raise_for_status()
-            entity_data = res.json().get("entities", {}).get(qid, {})
-        except Exception as e:
-            continue
-        
-        claims = entity_data.get("claims", {})
-        
-        # Verify country
-        item_country_q = None
-        if "P17" in claims:
-            try:
-                item_country_q = claims["P17"][0]["mainsnak"]["datavalue"]["value"]["id"]
-            except (KeyError, IndexError):
-                pass
-        
+    return [result["id"] for result in results[:CANDIDATES]]
+
+def pick_match(candidates, claims_by_qid, country_code):
+    """First candidate in the right country (or without one) that has a website."""
+    country_q = COUNTRY_MAP.get(country_code)
+    for qid in candidates:
+        claims = claims_by_qid.get(qid, {})
+
         # If country doesn't match, skip
+        item_country_q = first_value(claims, COUNTRY)
         if country_q and item_country_q and item_country_q != country_q:
             continue
-            
-        # Get website (P856)
-        website = None
-        if "P856" in claims:
-            try:
-                website = claims["P856"][0]["mainsnak"]["datavalue"]["value"]
-            except (KeyError, IndexError):
-                pass
-        
+
+        website = first_value(claims, WEBSITE)
+
         # Get SVG logo (P154)
         logo_svg = None
-        if "P154" in claims:
-            try:
-                logo_file = claims["P154"][0]["mainsnak"]["datavalue"]["value"]
-                if logo_file.lower().endswith('.svg'):
-                    logo_svg = f"https://commons.wikimedia.org/wiki/Special:FilePath/{logo_file.replace(' ', '_')}"
-            except (KeyError, IndexError):
-                pass
+        logo_file = first_value(claims, LOGO)
+        if logo_file and logo_file.lower().endswith('.svg'):
+            logo_svg = commons_file_url(logo_file)
 
         if website:
             return {
@@ -109,9 +76,20 @@ def search_wikidata(name, country_code):
                 "logo_svg": logo_svg,
                 "wikidata_url": f"https://www.wikidata.org/wiki/{qid}"
             }
-            
+
     return None
 
+def search_wikidata(name, country_code, client=None):
+    client = client or WikidataClient()
+    candidates = search_candidates(client, name, country_code)
+    if not candidates:
+        return None
+    try:
+        claims = client.get_claims(candidates)
+    except WikidataError:
+        return None
+    return pick_match(candidates, claims, country_code)
+
 import re
 
 def normalize_search_name(name):
@@ -122,66 +100,187 @@ def normalize_search_name(name):
     name = ' '.join(name.split())
     return name
 
+DEFAULT_CONCURRENCY = 8
+CHECKPOINT_PATH = 'stations.curate.jsonl'
+
+def station_key(s):
+    return s.get('id') or s['name']
+
+def load_checkpoint(path):
+    """Results recorded by a previous, interrupted run: {station key: result or None}."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line of a run that was killed mid-write
+                continue
+            done[entry['key']] = entry['result']
+    return done
+
+class Checkpoint:
+    """Append-only JSONL log of finished stations, flushed after every entry."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def record(self, key, result):
+        self.file.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+async def curate(client, stations, done, checkpoint, concurrency):
+    """
+    Search stations concurrently (at most `concurrency` requests in flight,
+    paced globally by the client's token bucket) and resolve their candidates
+    with batched entity fetches as soon as 50 QIDs are pending.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = asyncio.Queue()
+    total = len(stations)
+
+    async def search(i, s):
+        async with semaphore:
+            candidates = await asyncio.to_thread(
+                search_candidates, client, normalize_search_name(s['name']), s.get('country'))
+        if candidates is None:
+            # Not checkpointed, so a rerun retries this station
+            return
+        print(f"[{i+1}/{total}] Searched {s['name']} ({s.get('country')}): {len(candidates)} candidates")
+        await pending.put((s, candidates))
+
+    async def resolve(batch):
+        qids = [qid for _, candidates in batch for qid in candidates]
+        try:
+            async with semaphore:
+                claims = await asyncio.to_thread(client.get_claims, qids)
+        except WikidataError as e:
+            # Not checkpointed, so a rerun retries these stations
+            print(f"  Error fetching Wikidata entities: {e}")
+            return
+        for s, candidates in batch:
+            result = pick_match(candidates, claims, s.get('country'))
+            done[station_key(s)] = result
+            checkpoint.record(station_key(s), result)
+
+    async def batcher():
+        batch, qid_count, resolvers = [], 0, []
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            batch.append(item)
+            qid_count += len(item[1])
+            if qid_count >= BATCH_SIZE - CANDIDATES:
+                resolvers.append(asyncio.create_task(resolve(batch)))
+                batch, qid_count = [], 0
+        if batch:
+            resolvers.append(asyncio.create_task(resolve(batch)))
+        await asyncio.gather(*resolvers)
+
+    batching = asyncio.create_task(batcher())
+    await asyncio.gather(*(search(i, s) for i, s in enumerate(stations)))
+    await pending.put(None)
+    await batching
+
+def write_yaml_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        yaml.dump(data, f, sort_keys=False, allow_unicode=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
 def main():
+    parser = argparse.ArgumentParser(description='Match stations to Wikidata items')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Maximum Wikidata requests in flight')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH,
+                        help='Progress file used to resume an interrupted run')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore the progress of a previous run')
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
     if not os.path.exists('stations.yaml'):
         print("stations.yaml not found.")
         return
 
-    # Backup
-    shutil.copy('stations.yaml', 'stations.yaml.bak')
-    print("Backup created as stations.yaml.bak")
-
     with open('stations.yaml', 'r', encoding='utf-8') as f:
         data = yaml.safe_load(f)
     
     stations = data.get('stations', [])
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+    if done:
+        print(f"Resuming: {len(done)} stations already processed in {args.checkpoint}")
+
+    # If it already has wikidata_url AND website_url, we keep it as is (or update logo)
+    todo = [s for s in stations
+            if not (s.get('wikidata_url') and s.get('website_url')) and station_key(s) not in done]
+
+    client = client_from_args(args)
+    checkpoint = Checkpoint(args.checkpoint)
+    try:
+        asyncio.run(curate(client, todo, done, checkpoint, args.concurrency))
+    finally:
+        checkpoint.close()
+        print(f"  ({client.requests_sent} Wikidata requests)")
+        client.close()
+
+    missing = [s['name'] for s in todo if station_key(s) not in done]
+    if missing:
+        print(f"\n{len(missing)} stations could not be processed; rerun to retry them "
+              f"(progress is kept in {args.checkpoint}).")
+        return
+
     updated_stations = []
     removed_count = 0
     updated_count = 0
-    
-    total = len(stations)
-    for i, s in enumerate(stations):
-        country = s.get('country')
-        name = s['name']
-        print(f"[{i+1}/{total}] Processing {name} ({country})...")
-        
-        # If it already has wikidata_url AND website_url, we keep it as is (or update logo)
-        if s.get('wikidata_url') and s.get('website_url'):
+    for s in stations:
+        key = station_key(s)
+        if key not in done or (s.get('wikidata_url') and s.get('website_url')):
             updated_stations.append(s)
             continue
 
-        search_name = normalize_search_name(name)
-        res = search_wikidata(search_name, country)
-        
+        res = done[key]
         if res:
             s['website_url'] = res['website']
             s['wikidata_url'] = res['wikidata_url']
             if res['logo_svg'] and not s.get('logo_svg_url'):
                 s['logo_svg_url'] = res['logo_svg']
-            print(f"  Found Wikidata: {res['wikidata_url']} and Website: {res['website']}")
+            print(f"  {s['name']}: found Wikidata: {res['wikidata_url']} and Website: {res['website']}")
             updated_stations.append(s)
             updated_count += 1
         else:
-            print(f"  No Wikidata entry with website found. REMOVING.")
+            print(f"  {s['name']}: no Wikidata entry with website found. REMOVING.")
             removed_count += 1
-        
-        # Rate limiting to be polite
-        time.sleep(0.3)
-            
+
     data['stations'] = updated_stations
     
     print(f"\nSummary:")
-    print(f"  Total stations processed: {total}")
+    print(f"  Total stations processed: {len(stations)}")
     print(f"  Stations updated/kept: {len(updated_stations)}")
     print(f"  Stations removed: {removed_count}")
     print(f"  New Wikidata matches: {updated_count}")
 
     if updated_count > 0 or removed_count > 0:
+        # Backup
+        shutil.copy('stations.yaml', 'stations.yaml.bak')
+        print("Backup created as stations.yaml.bak")
         print(f"Saving changes to stations.yaml...")
-        with open('stations.yaml', 'w', encoding='utf-8') as f:
-            yaml.dump(data, f, sort_keys=False, allow_unicode=True)
+        write_yaml_atomic('stations.yaml', data)
     else:
         print("No changes to save.")
+    os.remove(args.checkpoint)
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,12 @@
+import os
 import socket
 import ssl
 from urllib.parse import urlparse
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from stream_metadata import IcyParser, parser_for  # noqa: E402
+
 
 def read_icy_metadata(stream_url, timeout=15):
     url = urlparse(stream_url)
@@ -39,62 +43,36 @@ def read_icy_metadata(stream_url, timeout=15):
 
     headers = header_data.decode(errors="ignore").split("\r\n")
 
-    meta_int = None
-
     print("=== Response Headers ===")
+    fields = {}
     for h in headers:
         print(h)
-        if h.lower().startswith("icy-metaint"):
-            meta_int = int(h.split(":")[1].strip())
-
-    if not meta_int:
-        print("\nNo ICY metadata supported by this stream.")
+        name, sep, value = h.partition(":")
+        if sep:
+            fields[name.strip().lower()] = value.strip()
+
+    # ICY blocks, or Vorbis comments of Ogg Vorbis/Opus streams
+    parser = parser_for(fields)
+    if parser is None:
+        print("\nNo in-stream metadata (ICY or Ogg) supported by this stream.")
         sock.close()
         return
 
-    print(f"\nicy-metaint = {meta_int}")
+    if isinstance(parser, IcyParser):
+        print(f"\nicy-metaint = {parser.metaint}")
+    else:
+        print("\nOgg stream, reading comment headers")
     print("\nWaiting for metadata...\n")
 
     data = stream_data
-
-    while True:
-        # Make sure we have enough audio data
-        while len(data) < meta_int + 1:
-            chunk = sock.recv(4096)
-            if not chunk:
-                return
-            data += chunk
-
-        # Skip audio data
-        data = data[meta_int:]
-
-        # Metadata length byte
-        meta_len = data[0] * 16
-        data = data[1:]
-
-        # Make sure we have full metadata block
-        while len(data) < meta_len:
-            data += sock.recv(4096)
-
-        meta_block = data[:meta_len]
-        data = data[meta_len:]
-
-        if meta_len > 0:
-            meta_str = meta_block.rstrip(b"\x00").decode("utf-8", errors="ignore")
-
-            if meta_str:
-                print("=== ICY Metadata ===")
-                print(meta_str)
-                print()
-
-                # Optional: parse StreamTitle
-                parts = meta_str.split(";")
-                for p in parts:
-                    if p.startswith("StreamTitle="):
-                        title = p.split("=", 1)[1].strip("'")
-                        print("Now Playing:", title)
-                        print()
-
+    while data:
+        for event in parser.feed(data):
+            if event["artist"]:
+                print("Now Playing:", f"{event['artist']} - {event['title']}")
+            else:
+                print("Now Playing:", event["title"])
+            print()
+        data = sock.recv(4096)
         # Keep listening
 
 
@@ -0,0 +1,613 @@
+"""
+Kotlin code generation for the station catalog.
+
+Streams RadioRepository.kt (and optional station chunk files) to disk from
+templates instead of building the whole source in memory. All string values
+go through kotlin_string() so that quotes, backslashes, `$` templates and
+control characters coming from stations.yaml can't break the Kotlin build.
+
+Large catalogs are split into chunked initializer functions (and optionally
+into separate files) to stay under the JVM's 64 KB method-size limit.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+# Stations per generated initializer function. A RadioStation(...) call with
+# 13 arguments compiles to roughly 100-150 bytes of bytecode, so 250 stations
+# keeps each function comfortably below the 64 KB method limit.
+DEFAULT_CHUNK_SIZE = 250
+
+# Station positions per generated index function. An intArrayOf element
+# compiles to about 8 bytes of bytecode, so 2000 positions stay far below the
+# 64 KB method limit whatever the number of distinct keys.
+INDEX_CHUNK_SIZE = 2000
+
+# Name of the generated per-chunk files when split_files is enabled
+CHUNK_FILE_PREFIX = "RadioStations"
+
+_KOTLIN_ESCAPES = {
+    '\\': '\\\\',
+    '"': '\\"',
+    '$': '\\$',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\b': '\\b',
+}
+
+
+def kotlin_string(value) -> str:
+    """Return `value` as a double-quoted, correctly escaped Kotlin string literal."""
+    out = ['"']
+    for ch in str(value):
+        escaped = _KOTLIN_ESCAPES.get(ch)
+        if escaped is not None:
+            out.append(escaped)
+        elif ord(ch) < 0x20 or ord(ch) == 0x7f:
+            out.append(f"\\u{ord(ch):04x}")
+        else:
+            out.append(ch)
+    out.append('"')
+    return ''.join(out)
+
+
+def kotlin_nullable_string(value: Optional[str]) -> str:
+    """Return a Kotlin string literal, or `null` if value is None."""
+    return "null" if value is None else kotlin_string(value)
+
+
+def chunked(items: list, size: int) -> Iterator[list]:
+    """Split items into consecutive lists of at most `size` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class KotlinFileWriter:
+    """
+    Streams generated source to a temporary file and atomically moves it into
+    place on success, so an interrupted build never leaves a truncated .kt file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self._file = None
+        self.bytes_written = 0
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+        return False
+
+    def write(self, text: str):
+        self._file.write(text)
+        self.bytes_written += len(text.encode('utf-8'))
+
+
+# -----------------------------------------------------------------------------
+# Templates
+# -----------------------------------------------------------------------------
+
+FILE_HEADER_TEMPLATE = '''// AUTO-GENERATED from stations.yaml - DO NOT EDIT MANUALLY
+// Run: ./gradlew buildStations (or python scripts/build_stations.py)
+// Generated with {station_count} stations
+
+package org.guakamole.onair.data
+
+'''
+
+STATION_TEMPLATE = '''{indent}RadioStation(
+{indent}        id = {id},
+{indent}        name = {name},
+{indent}        streamUrl = {stream_url},
+{indent}        logoUrl = {logo_url},
+{indent}        logoResId = {logo_res_id},
+{indent}        description = {description},
+{indent}        primaryTag = {primary_tag},
+{indent}        country = {country_res},
+{indent}        popularity = {popularity},
+{indent}        tags = {tags},
+{indent}        websiteUrl = {website_url},
+{indent}        metadataType = {metadata_type},
+{indent}        metadataParam = {metadata_param}
+{indent})'''
+
+# Indentation of station entries inside RadioRepository's listOf(...)
+STATION_INDENT = ' ' * 24
+
+CHUNK_FILE_TEMPLATE_HEADER = '''import org.guakamole.onair.R
+
+/** Stations {first} to {last} of the generated catalog */
+internal fun {function}(): List<RadioStation> =
+        listOf(
+'''
+
+CHUNK_FUNCTION_TEMPLATE_HEADER = '''
+        /** Stations {first} to {last} of the generated catalog */
+        private fun {function}(): List<RadioStation> =
+                listOf(
+'''
+
+REPOSITORY_HEADER_TEMPLATE = '''import android.content.Context
+import android.content.SharedPreferences
+import org.guakamole.onair.R
+
+/** Sort order options for non-favorite stations */
+enum class SortOrder {{
+    ALPHABETICAL,
+    MOST_LISTENED
+}}
+
+/** Repository providing a curated list of public radio stations */
+object RadioRepository {{
+
+        private const val PREFS_NAME = "radio_prefs"
+        private const val FAVORITES_KEY = "favorite_stations"
+        private const val REGIONS_KEY = "selected_regions"
+        private const val STYLES_KEY = "selected_styles"
+        private const val LISTEN_COUNTS_KEY = "listen_counts"
+        private const val SORT_ORDER_KEY = "sort_order"
+        private var prefs: SharedPreferences? = null
+        private val favoriteIds = mutableSetOf<String>()
+        private val listenCounts = mutableMapOf<String, Int>()
+
+'''
+
+REPOSITORY_BODY = '''
+        /** Position of every station id in baseStations */
+        private val indexById: Map<String, Int> by lazy {
+                HashMap<String, Int>(baseStations.size * 2).apply {
+                        baseStations.forEachIndexed { index, station -> put(station.id, index) }
+                }
+        }
+
+        /** Favorite-dependent views of the catalog, rebuilt only when favorites change */
+        private class StationViews(
+                /** All stations in alphabetical order, with isFavorite set */
+                val all: List<RadioStation>,
+                val favorites: List<RadioStation>,
+                val nonFavorites: List<RadioStation>,
+                /** Favorites first, then the other stations, both alphabetical */
+                val ordered: List<RadioStation>,
+                /** Position of every station id in [ordered] */
+                val orderedIndex: Map<String, Int>
+        )
+
+        @Volatile private var viewsCache: StationViews? = null
+
+        private fun views(): StationViews {
+                viewsCache?.let { return it }
+                val all = baseStations.map { station ->
+                        station.copy(isFavorite = favoriteIds.contains(station.id))
+                }
+                val favorites = all.filter { it.isFavorite }
+                val nonFavorites = all.filter { !it.isFavorite }
+                val ordered = favorites + nonFavorites
+                val orderedIndex = HashMap<String, Int>(ordered.size * 2)
+                ordered.forEachIndexed { index, station -> orderedIndex[station.id] = index }
+                return StationViews(all, favorites, nonFavorites, ordered, orderedIndex).also {
+                        viewsCache = it
+                }
+        }
+
+        /** Initialize favorites and listen counts from persistent storage */
+        fun initialize(context: Context) {
+                if (prefs == null) {
+                        prefs = context.getSharedPreferences(PREFS_NAME, Context.MODE_PRIVATE)
+                        val savedFavorites =
+                                prefs?.getStringSet(FAVORITES_KEY, emptySet()) ?: emptySet()
+                        favoriteIds.clear()
+                        favoriteIds.addAll(savedFavorites)
+                        viewsCache = null
+
+                        // Load listen counts
+                        val countsString = prefs?.getString(LISTEN_COUNTS_KEY, null)
+                        listenCounts.clear()
+                        countsString?.split(",")?.forEach { entry ->
+                                val parts = entry.split(":")
+                                if (parts.size == 2) {
+                                        parts[0].let { id ->
+                                                parts[1].toIntOrNull()?.let { count ->
+                                                        listenCounts[id] = count
+                                                }
+                                        }
+                                }
+                        }
+                }
+        }
+
+        /**
+         * Returns the list of stations with correctly set isFavorite flags, sorted by favorite
+         * status
+         */
+        val stations: List<RadioStation>
+                get() = views().ordered
+
+        /** Get non-favorite stations sorted by the specified order */
+        fun getNonFavoritesSorted(sortOrder: SortOrder): List<RadioStation> {
+                val nonFavorites = views().nonFavorites
+
+                return when (sortOrder) {
+                        SortOrder.ALPHABETICAL -> nonFavorites
+                        SortOrder.MOST_LISTENED -> nonFavorites.sortedByDescending { getListenCount(it.id) }
+                }
+        }
+
+        /** Get favorite stations */
+        fun getFavorites(): List<RadioStation> {
+                return views().favorites
+        }
+
+        /** Increment listen count for a station */
+        fun incrementListenCount(stationId: String) {
+                val currentCount = listenCounts[stationId] ?: 0
+                listenCounts[stationId] = currentCount + 1
+                saveListenCounts()
+        }
+
+        /** Get listen count for a station */
+        fun getListenCount(stationId: String): Int {
+                return listenCounts[stationId] ?: 0
+        }
+
+        private fun saveListenCounts() {
+                val countsString = listenCounts.entries.joinToString(",") { "${it.key}:${it.value}" }
+                prefs?.edit()?.putString(LISTEN_COUNTS_KEY, countsString)?.apply()
+        }
+
+        /** Get saved sort order */
+        fun getSortOrder(): SortOrder {
+                val ordinal = prefs?.getInt(SORT_ORDER_KEY, SortOrder.ALPHABETICAL.ordinal)
+                        ?: SortOrder.ALPHABETICAL.ordinal
+                return SortOrder.values().getOrElse(ordinal) { SortOrder.ALPHABETICAL }
+        }
+
+        /** Save sort order preference */
+        fun setSortOrder(sortOrder: SortOrder) {
+                prefs?.edit()?.putInt(SORT_ORDER_KEY, sortOrder.ordinal)?.apply()
+        }
+
+        /** Listened station ids, most listened first, ties in alphabetical order */
+        private fun listenedIds(includeFavorites: Boolean): List<String> {
+                return listenCounts.entries
+                        .filter { entry ->
+                                entry.value > 0 && entry.key in indexById &&
+                                        (includeFavorites || entry.key !in favoriteIds)
+                        }
+                        .sortedWith(
+                                compareByDescending<Map.Entry<String, Int>> { it.value }
+                                        .thenBy { indexById.getValue(it.key) }
+                        )
+                        .map { it.key }
+        }
+
+        /**
+         * Get stations ordered for Android Auto:
+         * 1. Favorites first
+         * 2. Most listened (non-favorites)
+         * 3. Remaining stations with alphabet distribution
+         */
+        fun getStationsForAndroidAuto(): List<RadioStation> {
+                val views = views()
+
+                // Get most listened non-favorites (top 10)
+                val mostListenedIds = listenedIds(includeFavorites = false).take(10)
+                val mostListened = mostListenedIds.map { views.all[indexById.getValue(it)] }
+
+                // Remaining stations, already in alphabetical order
+                val mostListenedSet = mostListenedIds.toSet()
+                val remaining = views.nonFavorites.filter { it.id !in mostListenedSet }
+
+                return views.favorites + mostListened + remaining
+        }
+
+        /** Get top N most listened stations */
+        fun getMostListened(limit: Int = 10): List<RadioStation> {
+                val all = views().all
+                return listenedIds(includeFavorites = true)
+                        .take(limit)
+                        .map { all[indexById.getValue(it)] }
+        }
+
+        /** Get stations by genre/tag */
+        fun getStationsByGenre(tag: String): List<RadioStation> {
+                val all = views().all
+                return genreIndex[tag]?.map { all[it] } ?: emptyList()
+        }
+
+        /** Get stations by country key (e.g. "france") */
+        fun getStationsByCountry(country: String): List<RadioStation> {
+                val all = views().all
+                return countryIndex[country]?.map { all[it] } ?: emptyList()
+        }
+
+        fun toggleFavorite(stationId: String) {
+                if (favoriteIds.contains(stationId)) {
+                        favoriteIds.remove(stationId)
+                } else {
+                        favoriteIds.add(stationId)
+                }
+                viewsCache = null
+
+                prefs?.edit()?.putStringSet(FAVORITES_KEY, favoriteIds)?.apply()
+        }
+
+        fun getSelectedRegions(): Set<String> {
+                return prefs?.getStringSet(REGIONS_KEY, emptySet()) ?: emptySet()
+        }
+
+        fun setSelectedRegions(regions: Set<String>) {
+                prefs?.edit()?.putStringSet(REGIONS_KEY, regions)?.apply()
+        }
+
+        fun getSelectedStyles(): Set<String> {
+                return prefs?.getStringSet(STYLES_KEY, emptySet()) ?: emptySet()
+        }
+
+        fun setSelectedStyles(styles: Set<String>) {
+                prefs?.edit()?.putStringSet(STYLES_KEY, styles)?.apply()
+        }
+
+        fun getStationById(id: String): RadioStation? {
+                return indexById[id]?.let { views().all[it] }
+        }
+
+        fun getStationByIndex(index: Int): RadioStation? {
+                return stations.getOrNull(index)
+        }
+
+        fun getStationIndex(id: String): Int {
+                return views().orderedIndex[id] ?: -1
+        }
+}
+'''
+
+# Precomputed at build time for the compiled-in catalog. Positions refer to
+# baseStations, which is emitted in alphabetical order. The arrays are filled
+# by chunked functions (INDEX_CHUNK_FUNCTION_TEMPLATE_HEADER): inline in the
+# initializer they would all land in RadioRepository's static initializer.
+INDEX_TEMPLATE = '''
+        /** Station positions per primary tag, in alphabetical order */
+        private val genreIndex: Map<String, IntArray> =
+                HashMap<String, IntArray>().apply {{
+{genre_calls}                }}
+
+        /** Station positions per country key, in alphabetical order */
+        private val countryIndex: Map<String, IntArray> =
+                HashMap<String, IntArray>().apply {{
+{country_calls}                }}
+
+        /** Add positions to a key of an index; a key can span several chunks */
+        private fun MutableMap<String, IntArray>.append(key: String, positions: IntArray) {{
+                put(key, get(key)?.plus(positions) ?: positions)
+        }}
+'''
+
+INDEX_CHUNK_FUNCTION_TEMPLATE_HEADER = '''
+        /** Part {number} of {name} */
+        private fun {function}(index: MutableMap<String, IntArray>) {{
+'''
+
+
+# Used with the binary catalog asset (see station_catalog.py): the resource
+# tables stay in Kotlin so that R ids remain build-time references
+ASSET_ACCESSOR_TEMPLATE = '''        /** Country string resources, indexed by the catalog's country references */
+        private val countryRes = intArrayOf({country_res})
+
+        /** Logo drawables, indexed by the catalog's logo references */
+        private val logoRes = intArrayOf({logo_res})
+
+        private var appContext: Context? = null
+
+        /** Memory-mapped station catalog asset, opened on first access */
+        private val catalog: StationCatalog by lazy {{
+                val context = checkNotNull(appContext) {{ "RadioRepository.initialize() has not been called" }}
+                StationCatalog.open(context, countryRes, logoRes)
+        }}
+
+        private val baseStations: List<RadioStation> by lazy {{ catalog.stations }}
+
+        private val genreIndex: Map<String, IntArray> by lazy {{ catalog.tagIndex }}
+
+        private val countryIndex: Map<String, IntArray> by lazy {{ catalog.countryIndex }}
+'''
+
+INITIALIZE_SIGNATURE = '        fun initialize(context: Context) {\n'
+ASSET_INITIALIZE_HOOK = '                appContext = context.applicationContext\n'
+
+
+# -----------------------------------------------------------------------------
+# Rendering
+# -----------------------------------------------------------------------------
+
+def render_station(entry: dict, indent: str = STATION_INDENT) -> str:
+    """Render one RadioStation(...) constructor call from a prepared entry."""
+    return STATION_TEMPLATE.format(
+        indent=indent,
+        id=kotlin_string(entry['id']),
+        name=kotlin_string(entry['name']),
+        stream_url=kotlin_string(entry['stream_url']),
+        logo_url=kotlin_string(entry['logo_url']),
+        logo_res_id=entry['logo_res_id'],
+        description=kotlin_string(entry['description']),
+        primary_tag=kotlin_string(entry['primary_tag']),
+        country_res=entry['country_res'],
+        popularity=int(entry['popularity']),
+        tags=kotlin_string(entry['tags']),
+        website_url=kotlin_string(entry['website_url']),
+        metadata_type=kotlin_nullable_string(entry['metadata_type']),
+        metadata_param=kotlin_nullable_string(entry['metadata_param']),
+    )
+
+
+def _write_station_list(out: KotlinFileWriter, entries: list, indent: str):
+    for i, entry in enumerate(entries):
+        if i:
+            out.write(',\n')
+        out.write(render_station(entry, indent))
+    out.write('\n')
+
+
+def _chunk_function_name(index: int, split_files: bool) -> str:
+    return f"radioStationsChunk{index}" if split_files else f"stationsChunk{index}"
+
+
+def remove_stale_chunk_files(directory: Path, keep: int = 0):
+    """Drop chunk files left over from a previous, larger build."""
+    for stale in Path(directory).glob(f"{CHUNK_FILE_PREFIX}*.kt"):
+        suffix = stale.stem[len(CHUNK_FILE_PREFIX):]
+        if suffix.isdigit() and int(suffix) >= keep:
+            stale.unlink()
+
+
+def _format_int_array(refs: list) -> str:
+    if not refs:
+        return ''
+    items = ',\n'.join(f'                {ref}' for ref in refs)
+    return f'\n{items}\n        '
+
+
+def _group_positions(entries: list, field: str) -> dict:
+    """Map each distinct value of `field` to the positions of its entries."""
+    groups = {}
+    for position, entry in enumerate(entries):
+        key = entry.get(field)
+        if key:
+            groups.setdefault(key, []).append(position)
+    return dict(sorted(groups.items()))
+
+
+def _index_chunks(groups: dict, size: int = INDEX_CHUNK_SIZE) -> list:
+    """Split an index into lists of (key, positions) holding at most `size` positions each."""
+    chunks = [[]]
+    room = size
+    for key, positions in groups.items():
+        for part in chunked(positions, size):
+            if len(part) > room:
+                part, rest = part[:room], part[room:]
+                if part:
+                    chunks[-1].append((key, part))
+                chunks.append([])
+                room = size
+                part = rest
+            chunks[-1].append((key, part))
+            room -= len(part)
+    return [chunk for chunk in chunks if chunk]
+
+
+def _write_index(out: KotlinFileWriter, name: str, groups: dict):
+    """Emit the functions filling index `name` (genreIndex, countryIndex)."""
+    for i, chunk in enumerate(_index_chunks(groups)):
+        out.write(INDEX_CHUNK_FUNCTION_TEMPLATE_HEADER.format(
+            number=i, name=name, function=f"{name}Chunk{i}"))
+        for key, positions in chunk:
+            out.write(f'                index.append({kotlin_string(key)}, '
+                      f'intArrayOf({", ".join(map(str, positions))}))\n')
+        out.write('        }\n')
+
+
+def _index_calls(name: str, groups: dict) -> str:
+    return ''.join(f'                        {name}Chunk{i}(this)\n'
+                   for i in range(len(_index_chunks(groups))))
+
+
+def write_asset_repository(path: Path, station_count: int,
+                           country_res: list, logo_res: list) -> list:
+    """
+    Stream a RadioRepository.kt that reads its stations from the binary
+    catalog asset instead of a listOf(...) initializer.
+
+    Returns the list of files written.
+    """
+    path = Path(path)
+    remove_stale_chunk_files(path.parent)
+
+    with KotlinFileWriter(path) as out:
+        out.write(FILE_HEADER_TEMPLATE.format(station_count=station_count))
+        out.write(REPOSITORY_HEADER_TEMPLATE.format())
+        out.write(ASSET_ACCESSOR_TEMPLATE.format(
+            country_res=_format_int_array(country_res),
+            logo_res=_format_int_array(logo_res)))
+        out.write(REPOSITORY_BODY.replace(
+            INITIALIZE_SIGNATURE, INITIALIZE_SIGNATURE + ASSET_INITIALIZE_HOOK, 1))
+    return [path]
+
+
+def write_repository(path: Path, entries: list,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     split_files: bool = False) -> list:
+    """
+    Stream RadioRepository.kt to `path`.
+
+    Catalogs of at most `chunk_size` stations are emitted as a single
+    listOf(...) initializer. Larger catalogs are split into one initializer
+    function per chunk, either inside RadioRepository (default) or, with
+    split_files, as top-level functions in sibling RadioStationsN.kt files.
+
+    Returns the list of files written.
+    """
+    path = Path(path)
+    chunks = list(chunked(entries, chunk_size)) if len(entries) > chunk_size else []
+    written = []
+
+    remove_stale_chunk_files(path.parent, len(chunks) if split_files else 0)
+
+    with KotlinFileWriter(path) as out:
+        out.write(FILE_HEADER_TEMPLATE.format(station_count=len(entries)))
+        out.write(REPOSITORY_HEADER_TEMPLATE.format())
+        out.write('        private val baseStations: List<RadioStation> =\n')
+        if not chunks:
+            out.write('                listOf(\n')
+            _write_station_list(out, entries, STATION_INDENT)
+            out.write('                )\n')
+        else:
+            calls = ',\n'.join(
+                f'                                {_chunk_function_name(i, split_files)}()'
+                for i in range(len(chunks))
+            )
+            out.write(f'                listOf(\n{calls}\n                ).flatten()\n')
+            if not split_files:
+                first = 0
+                for i, chunk in enumerate(chunks):
+                    out.write(CHUNK_FUNCTION_TEMPLATE_HEADER.format(
+                        first=first, last=first + len(chunk) - 1,
+                        function=_chunk_function_name(i, False)))
+                    _write_station_list(out, chunk, STATION_INDENT)
+                    out.write('                )\n')
+                    first += len(chunk)
+        genres = _group_positions(entries, 'primary_tag')
+        countries = _group_positions(entries, 'country')
+        out.write(INDEX_TEMPLATE.format(
+            genre_calls=_index_calls('genreIndex', genres),
+            country_calls=_index_calls('countryIndex', countries)))
+        _write_index(out, 'genreIndex', genres)
+        _write_index(out, 'countryIndex', countries)
+        out.write(REPOSITORY_BODY)
+    written.append(path)
+
+    if split_files:
+        first = 0
+        for i, chunk in enumerate(chunks):
+            chunk_path = path.parent / f"{CHUNK_FILE_PREFIX}{i}.kt"
+            with KotlinFileWriter(chunk_path) as out:
+                out.write(FILE_HEADER_TEMPLATE.format(station_count=len(chunk)))
+                out.write(CHUNK_FILE_TEMPLATE_HEADER.format(
+                    first=first, last=first + len(chunk) - 1,
+                    function=_chunk_function_name(i, True)))
+                _write_station_list(out, chunk, ' ' * 16)
+                out.write('        )\n')
+            written.append(chunk_path)
+            first += len(chunk)
+
+    return written
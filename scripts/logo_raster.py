@@ -0,0 +1,145 @@
+"""
+Build-time rasterization of station logos.
+
+Renders every station SVG to square bitmaps for each density bucket, in a
+process pool, so BitmapContentProvider can hand Android Auto a ready-made
+file instead of drawing the vector path tree on every browse. Identical
+outputs are stored once and a manifest maps each logo resource name to its
+bitmap per size.
+
+Needs the optional `cairosvg` and `Pillow` packages.
+"""
+
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+# Pixel size per density bucket of a 128dp artwork tile. xhdpi (256 px)
+# matches the size BitmapContentProvider renders at runtime.
+DENSITY_SIZES = {
+    'mdpi': 128,
+    'hdpi': 192,
+    'xhdpi': 256,
+    'xxhdpi': 384,
+    'xxxhdpi': 512,
+}
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+FORMATS = ('webp', 'png')
+
+
+def check_dependencies():
+    """Raise RuntimeError if the optional rasterization packages are missing."""
+    missing = []
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):
+        missing.append('cairosvg')
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        missing.append('Pillow')
+    if missing:
+        raise RuntimeError(f"Logo rasterization needs {' and '.join(missing)} "
+                           "(cairosvg also needs the system cairo library)")
+
+
+def render_logo(svg_path: str, size: int, fmt: str) -> bytes:
+    """
+    Render an SVG centered on a transparent `size` x `size` canvas, keeping
+    its aspect ratio (same placement as BitmapContentProvider).
+    """
+    import cairosvg
+    from PIL import Image
+
+    # Render at the target width first to learn the aspect ratio
+    png = cairosvg.svg2png(url=svg_path, output_width=size)
+    image = Image.open(io.BytesIO(png))
+    if image.height > size:
+        png = cairosvg.svg2png(url=svg_path, output_height=size)
+        image = Image.open(io.BytesIO(png))
+
+    canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    canvas.paste(image.convert('RGBA'), ((size - image.width) // 2, (size - image.height) // 2))
+
+    out = io.BytesIO()
+    if fmt == 'webp':
+        canvas.save(out, format='WEBP', lossless=True, method=6)
+    else:
+        canvas.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+
+def _render_job(job: tuple) -> tuple:
+    name, svg_path, size, fmt = job
+    try:
+        return name, size, render_logo(svg_path, size, fmt), None
+    except Exception as e:
+        return name, size, None, str(e)
+
+
+def rasterize_logos(svg_paths: list, output_dir: Path, fmt: str = 'webp',
+                    sizes: dict = None, jobs: int = None, verbose: bool = False) -> dict:
+    """
+    Rasterize `svg_paths` into `output_dir` and write the manifest.
+
+    Bitmaps are named after a hash of their content, so identical renders
+    (shared logos, or sizes that come out the same) are stored once. Files
+    from previous runs that are no longer referenced are removed.
+
+    Returns the manifest.
+    """
+    check_dependencies()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported bitmap format: {fmt}")
+    sizes = sizes or DENSITY_SIZES
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    work = [
+        (Path(svg).stem, str(svg), size, fmt)
+        for svg in sorted(svg_paths)
+        for size in sorted(set(sizes.values()))
+    ]
+
+    logos = {}
+    files = set()
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for name, size, data, error in pool.map(_render_job, work, chunksize=4):
+            if error:
+                print(f"  ✗ Failed to rasterize {name} at {size}px: {error}")
+                continue
+            rendered += 1
+            file_name = f"{hashlib.sha256(data).hexdigest()[:16]}.{fmt}"
+            if file_name not in files:
+                files.add(file_name)
+                target = output_dir / file_name
+                if not target.exists():
+                    target.write_bytes(data)
+            logos.setdefault(name, {})[str(size)] = f"{output_dir.name}/{file_name}"
+
+    for stale in output_dir.iterdir():
+        if stale.name != MANIFEST_NAME and stale.name not in files:
+            stale.unlink()
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'format': fmt,
+        'sizes': sorted(set(sizes.values())),
+        'logos': logos,
+    }
+    tmp_path = output_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, output_dir / MANIFEST_NAME)
+
+    if verbose:
+        print(f"  ✓ Rasterized {rendered} bitmaps into {len(files)} unique files")
+    return manifest
@@ -0,0 +1,271 @@
+"""
+SVG path data parsing and compact serialization for VectorDrawable output.
+
+Paths are parsed into absolute segments, then written back with a fixed
+number of decimals, choosing per segment whichever of the absolute or
+relative form is shorter. Relative coordinates are computed from the
+rounded position actually written so far, so rounding errors don't add up
+along a path.
+"""
+
+import re
+from typing import Optional
+
+
+# Number of arguments per path command
+COMMAND_ARGS = {
+    'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0,
+}
+
+DEFAULT_PRECISION = 3
+
+_FLAG_RE = re.compile(r'\s*,?\s*([01])')
+_NUMBER_RE = re.compile(r'\s*,?\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+_COMMAND_RE = re.compile(r'\s*,?\s*([MmLlHhVvCcSsQqTtAaZz])')
+
+
+class PathError(ValueError):
+    """Raised for path data that can't be parsed."""
+
+
+def parse_path(d: str) -> list:
+    """
+    Parse SVG path data into a list of (command, [args]) segments, expanding
+    implicit command repetition. Commands keep their original case.
+    """
+    segments = []
+    pos = 0
+    length = len(d)
+    command = None
+    while True:
+        match = _COMMAND_RE.match(d, pos)
+        if match:
+            command = match.group(1)
+            pos = match.end()
+            if command in 'Zz':
+                segments.append((command, []))
+                continue
+        elif not d[pos:].strip(' \t\r\n,'):
+            break
+        elif command is None or command in 'Zz':
+            raise PathError(f"Unexpected path data at {pos}: {d[pos:pos + 20]!r}")
+
+        upper = command.upper()
+        args = []
+        for i in range(COMMAND_ARGS[upper]):
+            # Arc flags may be written without separators ("a1 1 0 011 1")
+            regex = _FLAG_RE if upper == 'A' and i in (3, 4) else _NUMBER_RE
+            arg = regex.match(d, pos)
+            if not arg:
+                raise PathError(f"Missing argument for {command} at {pos}")
+            args.append(float(arg.group(1)))
+            pos = arg.end()
+        segments.append((command, args))
+
+        # A moveto followed by more coordinates continues as a lineto
+        if command == 'M':
+            command = 'L'
+        elif command == 'm':
+            command = 'l'
+        if pos >= length:
+            break
+    return segments
+
+
+def to_absolute(segments: list) -> list:
+    """Convert parsed segments to absolute commands (H/V/S/T/A are kept)."""
+    result = []
+    x = y = 0.0
+    start_x = start_y = 0.0
+    for command, args in segments:
+        upper = command.upper()
+        relative = command != upper
+        if upper == 'Z':
+            result.append(('Z', []))
+            x, y = start_x, start_y
+            continue
+        if upper == 'H':
+            nx = args[0] + (x if relative else 0)
+            result.append(('H', [nx]))
+            x = nx
+            continue
+        if upper == 'V':
+            ny = args[0] + (y if relative else 0)
+            result.append(('V', [ny]))
+            y = ny
+            continue
+        if upper == 'A':
+            ex = args[5] + (x if relative else 0)
+            ey = args[6] + (y if relative else 0)
+            result.append(('A', args[:5] + [ex, ey]))
+            x, y = ex, ey
+            continue
+
+        absolute = list(args)
+        if relative:
+            for i in range(0, len(absolute), 2):
+                absolute[i] += x
+                absolute[i + 1] += y
+        result.append((upper, absolute))
+        x, y = absolute[-2], absolute[-1]
+        if upper == 'M':
+            start_x, start_y = x, y
+    return result
+
+
+def format_number(value: float, precision: int = DEFAULT_PRECISION) -> str:
+    """Shortest decimal representation of value rounded to `precision` digits."""
+    text = f"{round(value, precision):.{precision}f}"
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text in ('-0', ''):
+        return '0'
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+
+def _join_numbers(numbers: list) -> str:
+    """Join numbers, leaving out separators where the next sign or dot suffices."""
+    out = []
+    previous = None
+    for number in numbers:
+        if previous is not None:
+            if not (number.startswith('-') or (number.startswith('.') and '.' in previous)):
+                out.append(' ')
+        out.append(number)
+        previous = number
+    return ''.join(out)
+
+
+def serialize_path(segments: list, precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Serialize absolute segments (as returned by to_absolute) compactly.
+
+    Each segment is written in absolute or relative form, whichever is
+    shorter; coordinates are rounded to `precision` decimals.
+    """
+    scale = 10 ** precision
+
+    def snap(value: float) -> float:
+        return round(value * scale) / scale
+
+    out = []
+    # Position as it will be reconstructed from the written data
+    x = y = 0.0
+    start_x = start_y = 0.0
+    previous_command = None
+    last_number = ''
+
+    for command, args in segments:
+        if command == 'Z':
+            text = 'z'
+            x, y = start_x, start_y
+            out.append(text)
+            previous_command = 'z'
+            last_number = ''
+            continue
+
+        if command == 'A':
+            fixed = [format_number(v, precision) for v in args[:3]] + \
+                    [str(int(args[3])), str(int(args[4]))]
+            ax, ay = snap(args[5]), snap(args[6])
+            candidates = [
+                ('A', fixed + [format_number(ax, precision), format_number(ay, precision)], (ax, ay)),
+                ('a', fixed + [format_number(ax - x, precision), format_number(ay - y, precision)],
+                 (x + snap(ax - x), y + snap(ay - y))),
+            ]
+        elif command == 'H':
+            ax = snap(args[0])
+            candidates = [
+                ('H', [format_number(ax, precision)], (ax, y)),
+                ('h', [format_number(ax - x, precision)], (x + snap(ax - x), y)),
+            ]
+        elif command == 'V':
+            ay = snap(args[0])
+            candidates = [
+                ('V', [format_number(ay, precision)], (x, ay)),
+                ('v', [format_number(ay - y, precision)], (x, y + snap(ay - y))),
+            ]
+        else:
+            absolute = [snap(v) for v in args]
+            relative = [snap(v - (x if i % 2 == 0 else y)) for i, v in enumerate(args)]
+            candidates = [
+                (command, [format_number(v, precision) for v in absolute],
+                 (absolute[-2], absolute[-1])),
+                (command.lower(), [format_number(v, precision) for v in relative],
+                 (x + relative[-2], y + relative[-1])),
+            ]
+            # Lines that came out axis-aligned (e.g. after a transform) fit H/V
+            if command == 'L' and absolute[1] == y:
+                candidates += [
+                    ('H', [format_number(absolute[0], precision)], (absolute[0], y)),
+                    ('h', [format_number(relative[0], precision)], (x + relative[0], y)),
+                ]
+            elif command == 'L' and absolute[0] == x:
+                candidates += [
+                    ('V', [format_number(absolute[1], precision)], (x, absolute[1])),
+                    ('v', [format_number(relative[1], precision)], (x, y + relative[1])),
+                ]
+
+        best = None
+        for letter, numbers, end in candidates:
+            # Repeating the previous command letter is implicit (except after a moveto)
+            implicit = letter == previous_command and letter not in 'Mm'
+            text = _join_numbers(numbers)
+            if not implicit:
+                text = letter + text
+            elif not (numbers[0].startswith('-') or
+                      (numbers[0].startswith('.') and '.' in last_number)):
+                text = ' ' + text
+            if best is None or len(text) < len(best[0]):
+                best = (text, letter, end, numbers[-1])
+
+        text, letter, (x, y), last_number = best
+        x, y = snap(x), snap(y)
+        out.append(text)
+        previous_command = letter
+        if letter in 'Mm':
+            start_x, start_y = x, y
+
+    return ''.join(out)
+
+
+def optimize_path_data(d: str, precision: int = DEFAULT_PRECISION) -> str:
+    """Parse and re-serialize path data in its compact form."""
+    return serialize_path(to_absolute(parse_path(d)), precision)
+
+
+def bounding_box(segments: list) -> Optional[tuple]:
+    """
+    Conservative (min_x, min_y, max_x, max_y) of absolute segments, using
+    control points for curves and the radii for arcs.
+    """
+    xs = []
+    ys = []
+    x = y = 0.0
+    for command, args in segments:
+        if command == 'H':
+            x = args[0]
+        elif command == 'V':
+            y = args[0]
+        elif command == 'A':
+            radius = max(abs(args[0]), abs(args[1]))
+            xs.extend((x - radius, x + radius))
+            ys.extend((y - radius, y + radius))
+            x, y = args[5], args[6]
+        elif command != 'Z':
+            xs.extend(args[0::2])
+            ys.extend(args[1::2])
+            x, y = args[-2], args[-1]
+        xs.append(x)
+        ys.append(y)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def boxes_overlap(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
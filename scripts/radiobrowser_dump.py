@@ -0,0 +1,175 @@
+"""
+Streaming access to the radio-browser allStations.json dump.
+
+The dump is one JSON array of tens of thousands of station objects.
+Instead of json.load()ing all of it, iter_stations() decodes one object at a
+time from a fixed-size read buffer (json.JSONDecoder.raw_decode) and keeps
+only the fields the scripts use, and the top_* helpers select the most
+clicked stations with bounded heaps, so memory stays proportional to the
+number of stations kept rather than to the size of the dump.
+"""
+
+import heapq
+import json
+from pathlib import Path
+
+
+# Where `radiobrowser_sync.py --export` is expected to write it
+DEFAULT_DUMP = Path(__file__).parent.parent / "allStations.json"
+
+# Fields the import and analysis scripts use
+STATION_FIELDS = (
+    'stationuuid', 'name', 'url', 'url_resolved', 'favicon', 'tags',
+    'country', 'countrycode', 'clickcount',
+)
+
+CHUNK_SIZE = 1 << 20
+
+# Longest array element accepted, in characters: station objects are a few
+# KB, so an element still not parsed at this size is malformed
+MAX_RECORD_SIZE = 1 << 20
+
+
+class DumpError(ValueError):
+    """Raised when the dump is not a JSON array of objects."""
+
+
+def iter_records(path=DEFAULT_DUMP, chunk_size: int = CHUNK_SIZE):
+    """Yield the objects of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+        # Byte offset of buffer[0] in the file, for error messages
+        offset = len(buffer) - len(buffer.lstrip())
+        buffer = buffer.lstrip()
+        if not buffer.startswith('['):
+            raise DumpError(f"{path}: expected a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            # Skip separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                offset += len(buffer.encode('utf-8'))
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+            if pos >= len(buffer):
+                raise DumpError(f"{path}: unterminated array")
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                at = offset + len(buffer[:pos].encode('utf-8'))
+                if eof:
+                    raise DumpError(f"{path}: invalid or truncated JSON at byte {at}") from None
+                if len(buffer) - pos > MAX_RECORD_SIZE:
+                    # Malformed rather than long: don't keep buffering (and re-parsing) the rest
+                    raise DumpError(f"{path}: invalid JSON or object over {MAX_RECORD_SIZE} "
+                                    f"characters at byte {at}") from None
+                # The object continues in the next chunk
+                more = f.read(chunk_size)
+                eof = not more
+                offset = at
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            if not isinstance(record, dict):
+                raise DumpError(f"{path}: array element is not an object")
+            yield record
+            pos = end
+
+
+def iter_stations(path=DEFAULT_DUMP, fields=STATION_FIELDS):
+    """Stations of the dump, each reduced to `fields` (missing ones are None)."""
+    for record in iter_records(path):
+        yield {field: record.get(field) for field in fields}
+
+
+def clickcount(station: dict) -> int:
+    return station.get('clickcount') or 0
+
+
+def is_quality(station: dict) -> bool:
+    """Usable for the catalog: has a name, a stream URL, a favicon and tags."""
+    return bool(station.get('name') and station.get('url')
+                and station.get('favicon') and station.get('tags'))
+
+
+def top_k(stations, k: int, key=clickcount) -> list:
+    """
+    The `k` stations with the highest `key`, best first. Ties keep the dump
+    order, like a stable sort of the whole list would.
+    """
+    if k <= 0:
+        return []
+    heap = []
+    for index, station in enumerate(stations):
+        entry = (key(station), -index, station)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [station for *_, station in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
+def top_per_country(stations, k: int, countries=None, key=clickcount, unique=None) -> dict:
+    """
+    {countrycode: up to `k` stations with the highest `key`, best first}.
+
+    `countries` restricts the country codes considered. With `unique`, a
+    function of a station, only the best station per unique value is kept in
+    each country (e.g. one station per stream URL).
+    """
+    heaps = {}
+    members = {}
+    for index, station in enumerate(stations):
+        country = station.get('countrycode')
+        if not country or (countries is not None and country not in countries):
+            continue
+        heap = heaps.setdefault(country, [])
+        entry = (key(station), -index, station)
+
+        if unique is not None:
+            value = unique(station)
+            seen = members.setdefault(country, {})
+            if value in seen:
+                if entry[:2] <= seen[value][:2]:
+                    continue
+                # Replace the weaker duplicate (heaps hold only k entries)
+                heap.remove(seen[value])
+                heapq.heapify(heap)
+            if len(heap) >= k and entry[:2] <= heap[0][:2]:
+                continue
+            if len(heap) >= k:
+                evicted = heapq.heapreplace(heap, entry)
+                del seen[unique(evicted[2])]
+            else:
+                heapq.heappush(heap, entry)
+            seen[value] = entry
+            continue
+
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    return {
+        country: [station for *_, station in sorted(heap, key=lambda e: e[:2], reverse=True)]
+        for country, heap in heaps.items()
+    }
+
+
+def count_stations(path=DEFAULT_DUMP) -> int:
+    return sum(1 for _ in iter_records(path))
+
+
+def top_fraction(path=DEFAULT_DUMP, fraction: float = 0.1, fields=STATION_FIELDS):
+    """
+    (total, top stations): the `fraction` most clicked stations of the dump,
+    best first. Takes two passes, one to count and one to select.
+    """
+    total = count_stations(path)
+    return total, top_k(iter_stations(path, fields), int(round(total * fraction, 6)))
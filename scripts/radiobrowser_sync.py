@@ -0,0 +1,350 @@
+"""
+Incremental mirror of the radio-browser station list.
+
+Instead of downloading and parsing a fresh allStations.json, the mirror is a
+SQLite file that is kept up to date from the API's change feed
+(`/json/stations/changed?lastchangeuuid=...`): each sync pulls only the
+station changes made since the last one, upserts them, and recomputes the
+materialized top-N selection of just the countries those changes touch.
+
+The change feed only carries edited stations, so click counts of unchanged
+stations are refreshed by an occasional --full sync (paged /json/stations),
+which also picks up deletions. Until then the top-N reflects the click
+counts of the last full sync (or seed); add_top_stations_per_country.py,
+which reads its candidates from the mirror, prints how old they are.
+
+Usage:
+    python scripts/radiobrowser_sync.py --seed-dump allStations.json   # once
+    python scripts/radiobrowser_sync.py                                 # then, whenever
+    python scripts/radiobrowser_sync.py --full                          # to refresh click counts
+    python scripts/radiobrowser_sync.py --export allStations.json       # for the analysis scripts
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import requests
+
+from radiobrowser_dump import iter_stations
+
+
+DEFAULT_API_BASE = "https://de1.api.radio-browser.info"
+DEFAULT_MIRROR = Path(__file__).parent.parent / ".cache" / "radiobrowser.sqlite"
+DEFAULT_TOP_N = 10
+PAGE_SIZE = 10000
+
+HEADERS = {'User-Agent': 'OnAirRadio/1.0 (https://github.com/skadge/radio)'}
+
+COLUMNS = (
+    'stationuuid', 'changeuuid', 'lastchangetime', 'name', 'url', 'url_resolved',
+    'favicon', 'tags', 'country', 'countrycode', 'clickcount',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    stationuuid TEXT PRIMARY KEY, changeuuid TEXT, lastchangetime TEXT,
+    name TEXT, url TEXT, url_resolved TEXT, favicon TEXT, tags TEXT,
+    country TEXT, countrycode TEXT, clickcount INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS stations_by_country ON stations (countrycode, clickcount DESC);
+CREATE TABLE IF NOT EXISTS top_stations (
+    countrycode TEXT NOT NULL, rank INTEGER NOT NULL, stationuuid TEXT NOT NULL,
+    PRIMARY KEY (countrycode, rank)
+);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Candidates for the catalog: same quality filter as the analysis scripts
+CANDIDATES = """
+FROM stations
+WHERE countrycode = ? AND name != '' AND url != '' AND favicon != '' AND tags != ''
+ORDER BY clickcount DESC, stationuuid
+"""
+TOP_QUERY = f"SELECT stationuuid {CANDIDATES} LIMIT ?"
+RANKED_QUERY = f"SELECT {', '.join(COLUMNS)} {CANDIDATES} LIMIT -1 OFFSET ?"
+
+
+class SyncError(RuntimeError):
+    """Raised when the API can't be read."""
+
+
+class StationMirror:
+    """Local SQLite copy of the radio-browser stations plus per-country top-N."""
+
+    def __init__(self, path=DEFAULT_MIRROR, top_n: int = DEFAULT_TOP_N):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.top_n = top_n
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get_state(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key: str, value):
+        self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM stations").fetchone()[0]
+
+    def apply(self, records) -> set:
+        """
+        Upsert station records (in change order), skipping unchanged ones.
+        Returns the country codes whose top-N may have changed: old and new
+        country of each modified station.
+        """
+        affected = set()
+        rows = []
+        for record in records:
+            uuid = record.get('stationuuid')
+            if not uuid:
+                continue
+            old = self.db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM stations WHERE stationuuid = ?", (uuid,)).fetchone()
+            # Change records may omit fields (e.g. clickcount): keep what we have
+            row = tuple(
+                old[i] if old and c not in record
+                else (record.get(c) or 0) if c == 'clickcount' else (record.get(c) or '')
+                for i, c in enumerate(COLUMNS))
+            if old == row:
+                continue
+            if old:
+                affected.add(old[COLUMNS.index('countrycode')])
+            affected.add(row[COLUMNS.index('countrycode')])
+            rows.append(row)
+            if len(rows) >= 1000:
+                self._upsert(rows)
+                rows = []
+        self._upsert(rows)
+        return affected
+
+    def _upsert(self, rows: list):
+        if rows:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO stations ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def remove_missing(self, uuids: set) -> set:
+        """Delete stations not in `uuids` (after a full listing). Returns their countries."""
+        gone = [(uuid, cc) for uuid, cc in self.db.execute("SELECT stationuuid, countrycode FROM stations")
+                if uuid not in uuids]
+        self.db.executemany("DELETE FROM stations WHERE stationuuid = ?", [(uuid,) for uuid, _ in gone])
+        return {cc for _, cc in gone}
+
+    def countries(self) -> set:
+        return {row[0] for row in self.db.execute("SELECT DISTINCT countrycode FROM stations")}
+
+    def recompute_top(self, countries) -> None:
+        """Rebuild the top-N rows of the given countries only."""
+        for country in countries:
+            self.db.execute("DELETE FROM top_stations WHERE countrycode = ?", (country,))
+            uuids = [row[0] for row in self.db.execute(TOP_QUERY, (country, self.top_n))]
+            self.db.executemany(
+                "INSERT INTO top_stations (countrycode, rank, stationuuid) VALUES (?, ?, ?)",
+                [(country, rank, uuid) for rank, uuid in enumerate(uuids)])
+
+    def commit(self):
+        self.db.commit()
+
+    def _stations(self, query: str, params=()) -> list:
+        cursor = self.db.execute(query, params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def top(self, country: str) -> list:
+        """The materialized top-N stations of a country, best first."""
+        columns = ', '.join(f's.{c}' for c in COLUMNS)
+        return self._stations(
+            f"SELECT {columns} FROM top_stations t JOIN stations s USING (stationuuid) "
+            "WHERE t.countrycode = ? ORDER BY t.rank", (country,))
+
+    def ranked(self, country: str, start: int = 0):
+        """Yield the candidate stations of a country from rank `start` on, best first, lazily."""
+        for row in self.db.execute(RANKED_QUERY, (country, start)):
+            yield dict(zip(COLUMNS, row))
+
+    def iter_all(self):
+        cursor = self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM stations ORDER BY clickcount DESC")
+        for row in cursor:
+            yield dict(zip(COLUMNS, row))
+
+    def export(self, path):
+        """Write the mirror as an allStations.json-style array (for the dump-based scripts)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for i, station in enumerate(self.iter_all()):
+                f.write(',\n' if i else '\n')
+                json.dump(station, f, ensure_ascii=False)
+            f.write('\n]\n')
+        os.replace(tmp_path, path)
+
+
+class RadioBrowserApi:
+    """The bits of the radio-browser JSON API the mirror needs."""
+
+    def __init__(self, base: str = DEFAULT_API_BASE, session: requests.Session = None,
+                 timeout: float = 60, page_size: int = PAGE_SIZE):
+        self.base = base.rstrip('/')
+        self.page_size = page_size
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        self.timeout = timeout
+
+    def _get(self, path: str, params: dict) -> list:
+        try:
+            response = self.session.get(f"{self.base}{path}", params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SyncError(str(e)) from e
+        if not response.ok:
+            raise SyncError(f"HTTP {response.status_code} from {path}")
+        try:
+            return response.json()
+        except ValueError as e:
+            raise SyncError(f"Invalid JSON from {path}") from e
+
+    def changes(self, last_change_uuid: str = None):
+        """Yield pages of station changes after `last_change_uuid`, oldest first."""
+        while True:
+            params = {'limit': self.page_size}
+            if last_change_uuid:
+                params['lastchangeuuid'] = last_change_uuid
+            page = self._get('/json/stations/changed', params)
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            last_change_uuid = page[-1]['changeuuid']
+
+    def all_stations(self):
+        """Yield pages of the full station list."""
+        offset = 0
+        while True:
+            page = self._get('/json/stations', {'offset': offset, 'limit': self.page_size, 'hidebroken': 'false'})
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            offset += len(page)
+
+
+class _LatestChange:
+    """Tracks the most recent change of the records passing through."""
+
+    def __init__(self):
+        self.key = ('', '')
+        self.count = 0
+
+    def track(self, records):
+        for record in records:
+            self.count += 1
+            key = (record.get('lastchangetime') or '', record.get('changeuuid') or '')
+            if key > self.key:
+                self.key = key
+            yield record
+
+    @property
+    def change_uuid(self):
+        return self.key[1] or None
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def seed_from_dump(mirror: StationMirror, dump_path) -> int:
+    """Fill the mirror from an allStations.json dump and start the change feed after it."""
+    latest = _LatestChange()
+    mirror.apply(latest.track(iter_stations(dump_path, COLUMNS)))
+    mirror.recompute_top(mirror.countries())
+    mirror.set_state('top_n', mirror.top_n)
+    if latest.change_uuid:
+        mirror.set_state('lastchangeuuid', latest.change_uuid)
+    mirror.set_state('last_full_sync', _now())
+    mirror.commit()
+    return latest.count
+
+
+def sync(mirror: StationMirror, api: RadioBrowserApi, full: bool = False) -> dict:
+    """Bring the mirror up to date. Returns counts of what changed."""
+    stats = {'records': 0, 'affected_countries': 0}
+    affected = set()
+    last_change_uuid = mirror.get_state('lastchangeuuid')
+
+    if full or not last_change_uuid:
+        seen = set()
+        latest = _LatestChange()
+        for page in api.all_stations():
+            stats['records'] += len(page)
+            seen.update(r['stationuuid'] for r in page)
+            affected |= mirror.apply(latest.track(page))
+        affected |= mirror.remove_missing(seen)
+        mirror.recompute_top(affected)
+        if latest.change_uuid:
+            mirror.set_state('lastchangeuuid', latest.change_uuid)
+        mirror.set_state('last_full_sync', _now())
+    else:
+        for page in api.changes(last_change_uuid):
+            stats['records'] += len(page)
+            changed = mirror.apply(page)
+            mirror.recompute_top(changed)
+            affected |= changed
+            # Commit per page, so an interrupted sync resumes from here
+            mirror.set_state('lastchangeuuid', page[-1]['changeuuid'])
+            mirror.commit()
+
+    if mirror.get_state('top_n') != str(mirror.top_n):
+        affected = mirror.countries()
+        mirror.recompute_top(affected)
+        mirror.set_state('top_n', mirror.top_n)
+    mirror.set_state('last_sync', _now())
+    mirror.commit()
+    stats['affected_countries'] = len(affected)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep a local mirror of radio-browser stations')
+    parser.add_argument('--api-base', default=DEFAULT_API_BASE, help='radio-browser API server')
+    parser.add_argument('--mirror', default=str(DEFAULT_MIRROR), help='Mirror database file')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help='Stations kept per country')
+    parser.add_argument('--seed-dump', help='Initialize the mirror from an allStations.json dump')
+    parser.add_argument('--full', action='store_true',
+                        help='Reload the whole station list (refreshes click counts, drops deleted stations)')
+    parser.add_argument('--export', help='Write the mirror as an allStations.json-style file')
+    args = parser.parse_args()
+
+    mirror = StationMirror(args.mirror, top_n=args.top)
+    try:
+        started = time.perf_counter()
+        if args.seed_dump:
+            count = seed_from_dump(mirror, args.seed_dump)
+            print(f"Seeded {count} stations from {args.seed_dump}")
+        else:
+            try:
+                stats = sync(mirror, RadioBrowserApi(args.api_base), full=args.full)
+            except SyncError as e:
+                raise SystemExit(f"Sync failed: {e}")
+            print(f"Applied {stats['records']} records, recomputed top {args.top} "
+                  f"of {stats['affected_countries']} countries")
+        print(f"Mirror has {len(mirror)} stations ({time.perf_counter() - started:.1f}s)")
+        if args.export:
+            mirror.export(args.export)
+            print(f"Exported to {args.export}")
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Bulk reconciliation of stations.yaml against Wikidata.
+
+Instead of one search plus entity lookups per station (curate_stations.py),
+this pulls every radio station item of each country in COUNTRY_MAP with one
+SPARQL query per country (labels, aliases, P17, P856, P154, P963), indexes
+the names locally and matches the whole catalog in memory.
+
+Each station gets a score in [0, 1] for its best candidate, written to
+reconciliation_report.md for review; --apply stores matches scoring at least
+--min-score in stations.yaml.
+
+Usage:
+    python scripts/reconcile_stations.py [--apply] [--min-score 0.8] [--overwrite]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import unicodedata
+from collections import defaultdict
+
+import yaml
+
+from curate_stations import COUNTRY_MAP, normalize_search_name, station_key, write_yaml_atomic
+from wikidata_client import add_client_arguments, client_from_args, WikidataError
+
+
+REPORT_PATH = 'reconciliation_report.md'
+DEFAULT_MIN_SCORE = 0.8
+
+# Label languages fetched per country, besides English
+COUNTRY_LANGUAGES = {
+    "uk": [], "germany": ["de"], "france": ["fr"], "usa": [], "italy": ["it"],
+    "spain": ["es", "ca"], "netherlands": ["nl"], "russia": ["ru"], "india": ["hi"],
+    "poland": ["pl"], "china": ["zh"], "switzerland": ["de", "fr", "it"],
+    "czech_republic": ["cs"], "canada": ["fr"], "greece": ["el"], "ukraine": ["uk"],
+    "brazil": ["pt"], "austria": ["de"], "mexico": ["es"],
+}
+
+# Separator for GROUP_CONCAT'ed names (ASCII unit separator)
+NAME_SEPARATOR = "\u001f"
+
+STATIONS_QUERY = """
+SELECT ?item ?website ?logo ?stream
+       (GROUP_CONCAT(DISTINCT ?name; separator="\\u001F") AS ?names) WHERE {
+  ?item wdt:P31/wdt:P279* wd:Q14350 ;
+        wdt:P17 wd:%(country)s .
+  { ?item rdfs:label ?name } UNION { ?item skos:altLabel ?name }
+  FILTER(LANG(?name) IN (%(languages)s))
+  OPTIONAL { ?item wdt:P856 ?website }
+  OPTIONAL { ?item wdt:P154 ?logo }
+  OPTIONAL { ?item wdt:P963 ?stream }
+}
+GROUP BY ?item ?website ?logo ?stream
+"""
+
+# Words that say nothing about which station it is
+STOP_WORDS = {"radio", "fm", "the", "de", "la", "le", "el", "di", "und", "and"}
+
+TRIGRAM_WEIGHT = 0.6
+TOKEN_WEIGHT = 0.4
+
+
+def match_key(name: str) -> str:
+    """Normalized form used for matching: no accents, punctuation or case."""
+    name = normalize_search_name(name)
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r'[^\w]+', ' ', name.casefold())
+    return ' '.join(name.split())
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tokens(key: str) -> set:
+    return set(key.split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Blend of trigram Dice and token Jaccard similarity of two match keys."""
+    if a == b:
+        return 1.0
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    dice = 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+    tokens_a, tokens_b = tokens(a), tokens(b)
+    union = tokens_a | tokens_b
+    jaccard = len(tokens_a & tokens_b) / len(union) if union else 0.0
+    return TRIGRAM_WEIGHT * dice + TOKEN_WEIGHT * jaccard
+
+
+class StationIndex:
+    """Fuzzy name index of Wikidata items, per country."""
+
+    def __init__(self):
+        self.items = {}
+        self._by_token = defaultdict(set)
+        self._by_trigram = defaultdict(set)
+
+    def add(self, item: dict):
+        """Add an item: {'qid', 'country', 'names', 'website', 'logo', 'stream'}."""
+        self.items[item['qid']] = item
+        item['keys'] = {match_key(name) for name in item['names']} - {''}
+        for key in item['keys']:
+            for token in tokens(key) - STOP_WORDS:
+                self._by_token[(item['country'], token)].add(item['qid'])
+            for gram in trigrams(key):
+                self._by_trigram[(item['country'], gram)].add(item['qid'])
+
+    def candidates(self, key: str, country: str) -> set:
+        """Items sharing a significant token, or else enough trigrams, with the key."""
+        found = set()
+        for token in tokens(key) - STOP_WORDS:
+            found |= self._by_token.get((country, token), set())
+        if found:
+            return found
+        counts = defaultdict(int)
+        for gram in trigrams(key):
+            for qid in self._by_trigram.get((country, gram), ()):
+                counts[qid] += 1
+        threshold = max(2, len(trigrams(key)) // 3)
+        return {qid for qid, count in counts.items() if count >= threshold}
+
+    def match(self, name: str, country: str, limit: int = 2) -> list:
+        """Best (score, item) pairs for a station name, best first."""
+        key = match_key(name)
+        if not key:
+            return []
+        scored = []
+        for qid in self.candidates(key, country):
+            item = self.items[qid]
+            score = max(similarity(key, item_key) for item_key in item['keys'])
+            scored.append((round(score, 3), item))
+        # Among equally named items, prefer the ones that are useful to us
+        scored.sort(key=lambda pair: (-pair[0], not pair[1]['website'], pair[1]['qid']))
+        return scored[:limit]
+
+
+def fetch_country(client, country: str) -> list:
+    """Radio station items of one country, one dict per item."""
+    languages = ', '.join(f'"{lang}"' for lang in ['en'] + COUNTRY_LANGUAGES.get(country, []))
+    rows = client.sparql(STATIONS_QUERY % {'country': COUNTRY_MAP[country], 'languages': languages})
+    items = {}
+    for row in rows:
+        qid = row['item'].rsplit('/', 1)[-1]
+        item = items.setdefault(qid, {
+            'qid': qid, 'country': country, 'names': set(),
+            'website': None, 'logo': None, 'stream': None,
+        })
+        item['names'].update(n for n in row.get('names', '').split(NAME_SEPARATOR) if n)
+        for field in ('website', 'logo', 'stream'):
+            if not item[field] and row.get(field):
+                item[field] = row[field]
+    return list(items.values())
+
+
+def build_index(client, countries) -> StationIndex:
+    index = StationIndex()
+    for country in sorted(countries):
+        try:
+            items = fetch_country(client, country)
+        except WikidataError as e:
+            print(f"  Error querying {country}: {e}")
+            continue
+        print(f"  {country}: {len(items)} radio station items")
+        for item in items:
+            index.add(item)
+    return index
+
+
+def logo_svg_url(logo: str):
+    """P154 values come back as Special:FilePath URLs; keep SVGs only."""
+    if logo and logo.lower().endswith('.svg'):
+        return logo.replace('http://', 'https://', 1)
+    return None
+
+
+def reconcile(stations: list, index: StationIndex) -> list:
+    """One row per station: (station, best (score, item) or None, runner-up or None)."""
+    rows = []
+    for s in stations:
+        matches = index.match(s['name'], s.get('country')) if s.get('country') in COUNTRY_MAP else []
+        best = matches[0] if matches else None
+        runner_up = matches[1] if len(matches) > 1 else None
+        rows.append((s, best, runner_up))
+    return rows
+
+
+def write_report(rows: list, min_score: float, path: str = REPORT_PATH):
+    def describe(match):
+        if not match:
+            return '—'
+        score, item = match
+        label = sorted(item['names'], key=len)[0] if item['names'] else item['qid']
+        return f"[{item['qid']}](https://www.wikidata.org/wiki/{item['qid']}) {label} ({score:.2f})"
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# Wikidata Reconciliation Report\n\n")
+        f.write(f"Matches scoring at least {min_score:.2f} are applied with `--apply`. "
+                "Lowest scores first.\n\n")
+        f.write("| Station | Country | Score | Match | Runner-up | Current Wikidata | Website |\n")
+        f.write("| :--- | :--- | ---: | :--- | :--- | :--- | :--- |\n")
+        for s, best, runner_up in sorted(rows, key=lambda row: row[1][0] if row[1] else -1):
+            score = f"{best[0]:.2f}" if best else '—'
+            current = s.get('wikidata_url', '').rsplit('/', 1)[-1] or '—'
+            website = best[1]['website'] if best and best[1]['website'] else '—'
+            f.write(f"| {s['name']} | {s.get('country', '')} | {score} | {describe(best)} "
+                    f"| {describe(runner_up)} | {current} | {website} |\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Match the whole catalog to Wikidata with SPARQL')
+    parser.add_argument('--apply', action='store_true',
+                        help='Write confident matches to stations.yaml')
+    parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE,
+                        help='Minimum score for --apply')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='With --apply, also replace existing wikidata_url values')
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    if not os.path.exists('stations.yaml'):
+        print("stations.yaml not found.")
+        return
+
+    with open('stations.yaml', 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    stations = data.get('stations', [])
+
+    client = client_from_args(args)
+    countries = {s.get('country') for s in stations} & set(COUNTRY_MAP)
+    print(f"Querying Wikidata for {len(countries)} countries...")
+    index = build_index(client, countries)
+    print(f"  ({client.requests_sent} Wikidata requests, {len(index.items)} items indexed)")
+    client.close()
+
+    rows = reconcile(stations, index)
+    write_report(rows, args.min_score)
+    confident = [(s, best) for s, best, _ in rows if best and best[0] >= args.min_score]
+    print(f"\n{len(confident)}/{len(stations)} stations matched with score >= {args.min_score:.2f}; "
+          f"see {REPORT_PATH}")
+
+    if not args.apply:
+        return
+    changed = 0
+    for s, (score, item) in confident:
+        if s.get('wikidata_url') and not args.overwrite:
+            continue
+        s['wikidata_url'] = f"https://www.wikidata.org/wiki/{item['qid']}"
+        if item['website'] and not s.get('website_url'):
+            s['website_url'] = item['website']
+        logo = logo_svg_url(item['logo'])
+        if logo and not s.get('logo_svg_url'):
+            s['logo_svg_url'] = logo
+        print(f"  {station_key(s)} -> {item['qid']} ({score:.2f})")
+        changed += 1
+    if changed:
+        # Backup
+        shutil.copy('stations.yaml', 'stations.yaml.bak')
+        print("Backup created as stations.yaml.bak")
+        print(f"Saving {changed} matches to stations.yaml...")
+        write_yaml_atomic('stations.yaml', data)
+    else:
+        print("No changes to save.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Persistent cache for API responses (used by wikidata_client).
+
+Responses are stored in a SQLite file, keyed by the normalized request
+parameters, as zlib-compressed JSON:
+
+- fresh entries (younger than `ttl`) are returned without a request
+- stale entries (younger than `ttl + stale_ttl`) are returned immediately
+  and refreshed in a background thread (stale-while-revalidate)
+- in replay mode the network is never used: any recorded entry is returned
+  regardless of age, and a missing one raises CacheMiss, so the scripts run
+  deterministically against a recorded cache file
+
+get_or_fetch_many() looks up several entries at once and fetches the
+missing or stale ones together, so that a batch API call can fill one entry
+per item (wikidata_client caches wbgetentities per entity this way).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "wikidata.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_STALE_TTL = 30 * 24 * 3600
+
+# Parameters that don't change the response
+IGNORED_PARAMS = {"format", "maxlag"}
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def cache_key(params: dict) -> str:
+    """Normalized request key: sorted parameters, ignoring transport-only ones."""
+    return json.dumps(
+        {k: str(v) for k, v in sorted(params.items()) if k not in IGNORED_PARAMS},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL, stale-while-revalidate and replay."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl: float = DEFAULT_TTL,
+                 stale_ttl: float = DEFAULT_STALE_TTL, replay: bool = False):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.replay = replay
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "writes": 0, "revalidated": 0}
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._executor = None
+
+        if replay and not self.path.exists():
+            raise FileNotFoundError(f"Replay cache not found: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, stored_at REAL NOT NULL, body BLOB NOT NULL)")
+        self._db.commit()
+
+    def _load(self, key: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stored_at, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(zlib.decompress(row[1]))
+
+    def _store(self, key: str, data):
+        body = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, body) VALUES (?, ?, ?)",
+                (key, time.time(), body))
+            self._db.commit()
+            self.stats["writes"] += 1
+
+    def _revalidate(self, keys: list, params_list: list, fetch_many):
+        try:
+            for key, data in zip(keys, fetch_many(params_list)):
+                self._store(key, data)
+            with self._lock:
+                self.stats["revalidated"] += len(keys)
+        except Exception:
+            # Keep serving the stale copies; the next run will try again
+            pass
+        finally:
+            with self._lock:
+                self._revalidating.difference_update(keys)
+
+    def _state(self, key: str, stored_at) -> str:
+        """'hit', 'stale' or 'miss' for an entry stored at `stored_at` (None: not stored), counted."""
+        if stored_at is None:
+            state = "miss"
+        elif self.replay or time.time() - stored_at < self.ttl:
+            state = "hit"
+        elif time.time() - stored_at < self.ttl + self.stale_ttl:
+            state = "stale"
+        else:
+            state = "miss"
+        with self._lock:
+            self.stats[{"hit": "hits", "stale": "stale", "miss": "misses"}[state]] += 1
+        if state == "miss" and self.replay:
+            raise CacheMiss(f"Not in replay cache: {key}")
+        return state
+
+    def get_or_fetch(self, params: dict, fetch):
+        """Return the cached response for `params`, calling `fetch(params)` when needed."""
+        return self.get_or_fetch_many([params], lambda params_list: [fetch(p) for p in params_list])[0]
+
+    def get_or_fetch_many(self, params_list: list, fetch_many) -> list:
+        """
+        Cached responses for several requests, in order. `fetch_many(params_list)`
+        returns the responses of the ones to (re)fetch, in order, so that the
+        caller can get them with fewer API calls (e.g. one wbgetentities call
+        for many entities, each cached on its own).
+        """
+        keys = [cache_key(params) for params in params_list]
+        results = [None] * len(keys)
+        missing, stale = [], []
+        for i, key in enumerate(keys):
+            stored_at, data = self._load(key)
+            state = self._state(key, stored_at)
+            if state == "miss":
+                missing.append(i)
+            else:
+                results[i] = data
+                if state == "stale":
+                    stale.append(i)
+
+        with self._lock:
+            stale = [i for i in stale if keys[i] not in self._revalidating]
+            self._revalidating.update(keys[i] for i in stale)
+            if stale and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2)
+        if stale:
+            self._executor.submit(self._revalidate, [keys[i] for i in stale],
+                                  [params_list[i] for i in stale], fetch_many)
+
+        if missing:
+            for i, data in zip(missing, fetch_many([params_list[i] for i in missing])):
+                self._store(keys[i], data)
+                results[i] = data
+        return results
+
+    def close(self):
+        """Wait for background revalidations and close the database."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            self._db.close()
+
+    def summary(self) -> str:
+        s = self.stats
+        total = s["hits"] + s["stale"] + s["misses"]
+        rate = 100 * (s["hits"] + s["stale"]) / total if total else 0.0
+        return (f"cache: {s['hits']} hits, {s['stale']} stale, {s['misses']} misses "
+                f"({rate:.0f}% hit rate), {s['revalidated']} revalidated")
@@ -0,0 +1,186 @@
+"""
+Binary station catalog asset.
+
+Writes the station list as a compact little-endian asset that the app
+memory-maps at runtime (see StationCatalog.kt), instead of compiling every
+station into a giant listOf(...) initializer.
+
+Layout (all integers little-endian):
+
+    Header (48 bytes)
+        u32 magic "OACT"      u16 version          u16 record size
+        u32 station count     u32 string count
+        u32 strings offset    u32 records offset
+        u32 by-name offset    u32 by-popularity offset
+        u32 country index     u32 primary_tag index
+        u32 total length      u32 CRC32 of everything after the header
+
+    String table    u32 offsets[string count + 1], then UTF-8 bytes
+    Records         station count x RECORD_FORMAT, in alphabetical order
+    Sort orders     u32 positions[station count] (by name, by popularity)
+    Group indexes   u32 group count, then (u32 key, u32 start, u32 length)
+                    per group, then u32 positions of the members
+
+Records reference strings by index into the string table (NO_STRING for
+null) and countries/logos by index into the resource tables that the
+generated RadioRepository.kt passes to the reader.
+"""
+
+import os
+import struct
+import zlib
+from pathlib import Path
+
+
+MAGIC = b'OACT'
+VERSION = 1
+
+HEADER_FORMAT = '<4sHHIIIIIIIIII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# id, name, stream_url, logo_url, description, primary_tag, tags, website_url,
+# metadata_type, metadata_param, country, logo, popularity
+RECORD_FORMAT = '<10IHHi'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+RECORD_STRING_FIELDS = (
+    'id', 'name', 'stream_url', 'logo_url', 'description', 'primary_tag',
+    'tags', 'website_url', 'metadata_type', 'metadata_param',
+)
+
+NO_STRING = 0xFFFFFFFF
+NO_REF = 0xFFFF
+
+
+class StringTable:
+    """Interns strings so that each distinct value is stored once."""
+
+    def __init__(self):
+        self._ids = {}
+        self.strings = []
+
+    def intern(self, value) -> int:
+        if value is None:
+            return NO_STRING
+        value = str(value)
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+
+    def to_bytes(self) -> bytes:
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(encoded)
+
+
+def _pack_positions(positions: list) -> bytes:
+    return struct.pack(f'<{len(positions)}I', *positions)
+
+
+def _pack_groups(groups: dict, strings: StringTable) -> bytes:
+    """Pack {key: [positions]} as a group table followed by the member arrays."""
+    table = [struct.pack('<I', len(groups))]
+    members = []
+    start = 0
+    for key, positions in groups.items():
+        table.append(struct.pack('<III', strings.intern(key), start, len(positions)))
+        members.extend(positions)
+        start += len(positions)
+    return b''.join(table) + _pack_positions(members)
+
+
+def _align(data: bytearray, boundary: int = 4):
+    data.extend(b'\0' * (-len(data) % boundary))
+
+
+def build_catalog(entries: list) -> tuple:
+    """
+    Encode prepared station entries (already in alphabetical order).
+
+    Returns (asset bytes, country resources, logo resources); the resource
+    lists are the Kotlin references that the country and logo indexes of the
+    records point into.
+    """
+    strings = StringTable()
+
+    # Country groups double as the country resource table
+    countries = {}
+    country_refs = {}
+    country_res = []
+    tags = {}
+    logo_res = []
+    records = []
+    for position, entry in enumerate(entries):
+        country = entry.get('country') or ''
+        if country:
+            if country not in countries:
+                countries[country] = []
+                country_refs[country] = len(country_res)
+                country_res.append(entry['country_res'])
+            countries[country].append(position)
+            country_ref = country_refs[country]
+        else:
+            country_ref = NO_REF
+
+        tag = entry.get('primary_tag') or ''
+        if tag:
+            tags.setdefault(tag, []).append(position)
+
+        if entry['logo_res_id'] != '0':
+            logo_ref = len(logo_res)
+            logo_res.append(entry['logo_res_id'])
+        else:
+            logo_ref = NO_REF
+
+        if len(country_res) > NO_REF or len(logo_res) > NO_REF:
+            raise ValueError("Too many countries or logos for the catalog format")
+
+        string_refs = [strings.intern(entry[field]) for field in RECORD_STRING_FIELDS]
+        records.append(struct.pack(RECORD_FORMAT, *string_refs, country_ref, logo_ref,
+                                   int(entry['popularity'])))
+
+    by_name = list(range(len(entries)))
+    by_popularity = sorted(by_name, key=lambda i: -int(entries[i]['popularity']))
+
+    # Group keys must be interned before the string table is serialized
+    country_section = _pack_groups(countries, strings)
+    tag_section = _pack_groups(dict(sorted(tags.items())), strings)
+
+    body = bytearray()
+    offsets = {}
+    for name, section in (
+        ('strings', strings.to_bytes()),
+        ('records', b''.join(records)),
+        ('by_name', _pack_positions(by_name)),
+        ('by_popularity', _pack_positions(by_popularity)),
+        ('countries', country_section),
+        ('tags', tag_section),
+    ):
+        _align(body)
+        offsets[name] = HEADER_SIZE + len(body)
+        body.extend(section)
+
+    header = struct.pack(
+        HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE,
+        len(entries), len(strings.strings),
+        offsets['strings'], offsets['records'],
+        offsets['by_name'], offsets['by_popularity'],
+        offsets['countries'], offsets['tags'],
+        HEADER_SIZE + len(body), zlib.crc32(body),
+    )
+    return header + bytes(body), country_res, logo_res
+
+
+def write_catalog(path: Path, data: bytes):
+    """Atomically write the catalog asset."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
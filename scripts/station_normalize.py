@@ -0,0 +1,164 @@
+"""
+Import-time normalization of radio-browser stations.
+
+- TagMatcher: an Aho-Corasick automaton over a multilingual tag vocabulary,
+  mapping free-form radio-browser tag strings ("Nachrichten, Talk Radio",
+  "Música Clásica", "news/talk") to the app's canonical tags in one scan of
+  the string, with leftmost-longest matches on word boundaries
+- DedupeIndex: recognizes a station already in the catalog by its
+  canonical stream URL (stream_probe.canonical_url: scheme, CDN edge host
+  and session tokens don't count) or by a fuzzy name match in the same
+  country (reconcile_stations.similarity), with token postings so each
+  lookup only scores a handful of names
+"""
+
+import unicodedata
+from collections import defaultdict
+
+from reconcile_stations import STOP_WORDS, match_key, similarity, tokens
+from stream_probe import canonical_url
+
+
+# Canonical tags from FilterData.kt
+CANONICAL_TAGS = ["pop", "rock", "hits", "jazz", "classical", "news", "talk", "ambient", "world", "oldies"]
+
+# Variations (several languages) of the canonical tags
+TAG_VOCABULARY = {
+    "pop": ["pop", "top 40", "top40", "kpop", "k-pop", "jpop", "europop", "musica pop", "variete",
+            "variete francaise", "chanson"],
+    "rock": ["rock", "indie", "alternative", "alternativo", "alternatif", "metal", "punk", "grunge",
+             "hard rock", "classic rock", "rock alternativo"],
+    "hits": ["hits", "hit", "dance", "charts", "hitradio", "exitos", "tubes", "successi",
+             "top hits", "hot ac", "contemporary hit radio", "chr"],
+    "jazz": ["jazz", "smooth jazz", "blues", "swing", "bebop", "soul jazz"],
+    "classical": ["classical", "classique", "musique classique", "klassik", "klassische musik",
+                  "clasica", "musica clasica", "classica", "musica classica", "klassiek",
+                  "klasyczna", "muzyka klasyczna", "opera", "baroque", "symphonic"],
+    "news": ["news", "information", "info", "nachrichten", "noticias", "notizie", "actualites",
+             "nieuws", "wiadomosci", "informacion", "informazione", "noticiero", "newsradio"],
+    "talk": ["talk", "news/talk", "news talk", "talk radio", "talkradio", "newstalk", "spoken word",
+             "discussion", "debate", "wort", "kultur", "culture", "cultura", "public radio"],
+    "ambient": ["ambient", "electronic", "electronica", "chillout", "chill", "lounge", "downtempo",
+                "elektronisch", "chill out", "relax", "meditation"],
+    "world": ["world", "world music", "worldmusic", "musique du monde", "musiques du monde",
+              "weltmusik", "folk", "ethnic", "latin", "reggae", "afro", "african", "celtic"],
+    "oldies": ["oldies", "60s", "70s", "80s", "90s", "retro", "classic hits", "schlager",
+               "nostalgie", "oldschool", "old school", "evergreens", "golden oldies"],
+}
+
+# Fuzzy name similarity above which two stations of a country are the same
+NAME_THRESHOLD = 0.9
+
+
+def fold(text: str) -> str:
+    """Casefolded text without accents, words separated by single spaces."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in text).split())
+
+
+class TagMatcher:
+    """Aho-Corasick matcher from vocabulary phrases to canonical tags."""
+
+    def __init__(self, vocabulary: dict = TAG_VOCABULARY):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for canonical, phrases in vocabulary.items():
+            for phrase in [canonical] + phrases:
+                self._add(f" {fold(phrase)} ", canonical)
+        self._link()
+
+    def _add(self, pattern: str, canonical: str):
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), canonical))
+
+    def _link(self):
+        """Breadth-first failure links; outputs are merged along them."""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def matches(self, text: str) -> list:
+        """Leftmost-longest (start, end, canonical) matches of whole words in `text`."""
+        # Patterns are padded with spaces, so they can only match whole words
+        text = f" {fold(text)} "
+        found = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, canonical in self._out[node]:
+                # Adjacent matches share their padding space
+                found.append((end - length + 1, end - 1, canonical))
+        found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        covered = 0
+        for start, end, canonical in found:
+            if start >= covered:
+                selected.append((start, end, canonical))
+                covered = end
+        return selected
+
+    def canonical_tags(self, text: str) -> list:
+        """Distinct canonical tags found in `text`, in order of appearance."""
+        return list(dict.fromkeys(canonical for _, _, canonical in self.matches(text)))
+
+
+class DedupeIndex:
+    """Stations already taken, by canonical stream URL and fuzzy name per country."""
+
+    def __init__(self, threshold: float = NAME_THRESHOLD):
+        self.threshold = threshold
+        self._urls = {}
+        self._keys = {}
+        self._compact = {}
+        self._by_token = defaultdict(set)
+
+    def add(self, station_id: str, name: str, country: str, url: str):
+        if url:
+            self._urls.setdefault(canonical_url(url), station_id)
+        key = match_key(name or '')
+        if not key:
+            return
+        self._keys.setdefault((country, key), station_id)
+        self._compact.setdefault((country, key.replace(' ', '')), station_id)
+        for token in tokens(key) - STOP_WORDS:
+            self._by_token[(country, token)].add(key)
+
+    def find(self, name: str, country: str, url: str):
+        """(reason, id of the station it duplicates) or None."""
+        if url:
+            existing = self._urls.get(canonical_url(url))
+            if existing:
+                return 'url', existing
+        key = match_key(name or '')
+        if not key:
+            return None
+        # "WDR 5" and "WDR5" are the same station
+        existing = self._compact.get((country, key.replace(' ', '')))
+        if existing:
+            return 'name', existing
+        candidates = set()
+        for token in tokens(key) - STOP_WORDS:
+            candidates |= self._by_token.get((country, token), set())
+        for other in candidates:
+            if similarity(key, other) >= self.threshold:
+                return 'name', self._keys[(country, other)]
+        return None
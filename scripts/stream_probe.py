@@ -0,0 +1,352 @@
+"""
+Stream URL probing and comparison.
+
+probe() follows a URL through HTTP redirects and playlists (.m3u, .pls, HLS
+.m3u8) to the endpoint that actually serves audio, and records what the URL
+is (direct stream, playlist or web page), the codec and bitrate (icy-br or
+HLS BANDWIDTH) and the time to the first audio byte.
+
+compare() probes two URLs concurrently and decides whether they really
+differ, so reports don't flag http/https, rotating CDN edge hosts or
+session tokens as differences.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; OnAirRadio/1.0)',
+    'Icy-MetaData': '1',
+}
+
+DEFAULT_TIMEOUT = 10
+MAX_PLAYLIST_DEPTH = 3
+MAX_PLAYLIST_BYTES = 64 * 1024
+
+# Kinds of URL
+STREAM = 'stream'
+PLAYLIST = 'playlist'
+WEBPAGE = 'webpage'
+ERROR = 'error'
+
+PLAYLIST_TYPES = {
+    'audio/x-mpegurl': 'm3u', 'audio/mpegurl': 'm3u', 'application/x-mpegurl': 'm3u8',
+    'application/vnd.apple.mpegurl': 'm3u8', 'audio/x-scpls': 'pls', 'application/pls+xml': 'pls',
+}
+PLAYLIST_EXTENSIONS = {'.m3u': 'm3u', '.m3u8': 'm3u8', '.pls': 'pls'}
+
+CODECS = {
+    'audio/mpeg': 'mp3', 'audio/mp3': 'mp3', 'audio/aac': 'aac', 'audio/aacp': 'aac',
+    'audio/x-aac': 'aac', 'audio/mp4': 'aac', 'audio/ogg': 'ogg', 'application/ogg': 'ogg',
+    'audio/opus': 'opus', 'audio/flac': 'flac', 'audio/x-flac': 'flac',
+    'video/mp2t': 'aac',
+}
+# HLS CODECS attribute prefixes
+HLS_CODECS = {'mp4a.40.2': 'aac', 'mp4a.40.5': 'aac', 'mp4a.40.29': 'aac', 'mp4a.40.34': 'mp3',
+              'mp4a.69': 'mp3', 'mp4a.6b': 'mp3', 'opus': 'opus', 'flac': 'flac'}
+
+# Query parameters that identify a listener session rather than the stream
+TOKEN_PARAMS = re.compile(
+    r'^(_art|aw_0_.*|awparams|listenerid|listener_id|sid|session(id)?|token|hdnts|hdnea|'
+    r'user|uid|player_group|cb|listening-from-.*)$', re.I)
+
+# CDN hosts that rotate per request, mapped to a stable name
+EDGE_HOSTS = [
+    (re.compile(r'^[\w-]+-edge-\d+-[\w]+-[\w]+-cdn\.cast\.addradio\.de$'), 'cdn.cast.addradio.de'),
+    (re.compile(r'^[\w-]*edge\d*[\w-]*\.(akamaized\.net)$'), r'edge.\1'),
+    (re.compile(r'^[\w-]+\.(streamtheworld\.com)$'), r'live.\1'),
+    (re.compile(r'^(as|a)-hls-ww-live\.(akamaized\.net)$'), r'hls.\2'),
+]
+
+
+def canonical_url(url: str) -> str:
+    """
+    Comparison key for a stream URL: scheme-less, lowercase host without the
+    default port, stable CDN host names, no session/token query parameters
+    and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    for pattern, replacement in EDGE_HOSTS:
+        if pattern.match(host):
+            host = pattern.sub(replacement, host)
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TOKEN_PARAMS.match(k)))
+    return urlunsplit(('', host, parts.path.rstrip('/'), query, ''))[2:]
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    kind: str = ERROR                  # what `url` itself is: stream, playlist or webpage
+    final_url: Optional[str] = None    # endpoint that serves audio
+    content_type: str = ''
+    codec: Optional[str] = None
+    bitrate: Optional[int] = None      # kbit/s
+    ttfb: Optional[float] = None       # seconds until the first audio byte
+    hls: bool = False
+    chain: list = field(default_factory=list)  # redirects and playlists followed
+    error: Optional[str] = None
+
+    @property
+    def playable(self) -> bool:
+        return self.kind in (STREAM, PLAYLIST) and self.final_url is not None
+
+    def describe(self) -> str:
+        if not self.playable:
+            return self.error or self.kind
+        details = [self.kind, 'hls' if self.hls else None, self.codec,
+                   f"{self.bitrate} kbps" if self.bitrate else None,
+                   f"{self.ttfb:.2f}s" if self.ttfb is not None else None]
+        return ', '.join(d for d in details if d)
+
+
+def parse_playlist(text: str, fmt: str, base_url: str) -> list:
+    """
+    Entries of a playlist as (url, attributes) pairs, absolute URLs. For HLS
+    master playlists the attributes hold the variant's BANDWIDTH and CODECS.
+    """
+    entries = []
+    if fmt == 'pls':
+        for line in text.splitlines():
+            match = re.match(r'\s*File\d+\s*=\s*(\S+)', line, re.I)
+            if match:
+                entries.append((urljoin(base_url, match.group(1)), {}))
+        return entries
+
+    attributes = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = dict(re.findall(r'([A-Z-]+)=("[^"]*"|[^,]*)', line.split(':', 1)[1]))
+            attributes = {k: v.strip('"') for k, v in attributes.items()}
+        elif line and not line.startswith('#'):
+            entries.append((urljoin(base_url, line), attributes))
+            attributes = {}
+    return entries
+
+
+def playlist_format(url: str, content_type: str) -> Optional[str]:
+    fmt = PLAYLIST_TYPES.get(content_type)
+    if fmt:
+        return fmt
+    path = urlsplit(url).path.lower()
+    for extension, fmt in PLAYLIST_EXTENSIONS.items():
+        if path.endswith(extension):
+            return fmt
+    return None
+
+
+def _icy_bitrate(headers) -> Optional[int]:
+    value = headers.get('icy-br') or ''
+    match = re.match(r'\s*(\d+)', value)
+    return int(match.group(1)) if match else None
+
+
+def probe(url: str, session: requests.Session = None, timeout: float = DEFAULT_TIMEOUT,
+          depth: int = 0) -> ProbeResult:
+    """Resolve `url` to the endpoint that serves audio, measuring how fast it starts."""
+    session = session or requests.Session()
+    result = ProbeResult(url)
+    started = time.perf_counter()
+    try:
+        response = session.get(url, headers=HEADERS, timeout=timeout, stream=True,
+                               allow_redirects=True)
+    except requests.RequestException as e:
+        result.error = type(e).__name__
+        return result
+
+    with response:
+        result.chain = [r.url for r in response.history]
+        if response.status_code >= 400:
+            result.error = f"HTTP {response.status_code}"
+            return result
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        result.content_type = content_type
+        fmt = playlist_format(response.url, content_type)
+
+        if fmt:
+            text = response.raw.read(MAX_PLAYLIST_BYTES, decode_content=True).decode('utf-8', 'replace')
+            if fmt != 'pls' and '#EXTINF' in text and '#EXT-X-TARGETDURATION' in text:
+                return _probe_hls_media(result, response.url, text, session, timeout, started)
+            return _probe_playlist(result, response.url, text, fmt, session, timeout, depth, started)
+
+        if content_type.startswith('text/html') or content_type == 'application/xhtml+xml':
+            result.kind = WEBPAGE
+            result.error = 'web page'
+            return result
+
+        try:
+            first = next(response.iter_content(1024), b'')
+        except (requests.RequestException, StopIteration):
+            first = b''
+        if not first:
+            result.error = 'no data'
+            return result
+        result.kind = STREAM
+        result.final_url = response.url
+        result.ttfb = time.perf_counter() - started
+        result.codec = CODECS.get(content_type) or (content_type or None)
+        result.bitrate = _icy_bitrate(response.headers)
+        return result
+
+
+def _probe_playlist(result, url, text, fmt, session, timeout, depth, started):
+    entries = parse_playlist(text, fmt, url)
+    if not entries:
+        result.error = 'empty playlist'
+        return result
+    if depth >= MAX_PLAYLIST_DEPTH:
+        result.error = 'playlist nesting too deep'
+        return result
+
+    # HLS master playlist: take the best variant
+    if any('BANDWIDTH' in attributes for _, attributes in entries):
+        entry_url, attributes = max(entries, key=lambda e: int(e[1].get('BANDWIDTH', 0) or 0))
+    else:
+        entry_url, attributes = entries[0]
+
+    inner = probe(entry_url, session, timeout, depth + 1)
+    result.kind = PLAYLIST
+    result.chain += [url] + inner.chain
+    result.final_url = inner.final_url
+    result.error = inner.error
+    result.hls = inner.hls or fmt == 'm3u8'
+    result.codec = inner.codec
+    result.bitrate = inner.bitrate
+    if attributes.get('CODECS'):
+        codec = attributes['CODECS'].split(',')[0].strip().lower()
+        result.codec = HLS_CODECS.get(codec, codec)
+    if attributes.get('BANDWIDTH'):
+        result.bitrate = int(attributes['BANDWIDTH']) // 1000
+    if inner.ttfb is not None:
+        result.ttfb = time.perf_counter() - started
+    return result
+
+
+def _probe_hls_media(result, url, text, session, timeout, started):
+    """An HLS media playlist plays directly: time its first segment."""
+    segments = parse_playlist(text, 'm3u8', url)
+    result.kind = STREAM
+    result.hls = True
+    if not segments:
+        result.error = 'empty playlist'
+        return result
+    segment_url = segments[0][0]
+    try:
+        with session.get(segment_url, headers=HEADERS, timeout=timeout, stream=True) as response:
+            if response.status_code >= 400:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            next(response.iter_content(1024), b'')
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    except requests.RequestException as e:
+        result.error = type(e).__name__
+        return result
+    result.final_url = url
+    result.ttfb = time.perf_counter() - started
+    extension = urlsplit(segment_url).path.rsplit('.', 1)[-1].lower()
+    result.codec = CODECS.get(content_type) or {'aac': 'aac', 'mp3': 'mp3', 'ts': 'aac'}.get(extension)
+    return result
+
+
+@dataclass
+class Comparison:
+    current: ProbeResult
+    candidate: ProbeResult
+    verdict: str
+    actionable: bool
+    faster: Optional[str] = None   # 'current' or 'candidate'
+
+
+# Verdicts
+SAME_URL = 'same URL'
+SAME_STREAM = 'same stream'
+CANDIDATE_NOT_STREAM = 'candidate is not a stream'
+CANDIDATE_BROKEN = 'candidate unreachable'
+CURRENT_BROKEN = 'current URL broken'
+BOTH_BROKEN = 'both unreachable'
+DIFFERENT_FORMAT = 'different codec/bitrate'
+DIFFERENT_ENDPOINT = 'different endpoint'
+
+
+def _same_endpoint(a: ProbeResult, b: ProbeResult) -> bool:
+    return canonical_url(a.final_url) == canonical_url(b.final_url)
+
+
+def judge(current: ProbeResult, candidate: ProbeResult) -> Comparison:
+    """Decide whether two probed URLs differ in a way worth acting on."""
+    if not candidate.playable:
+        # A current stream that broke is worth a look even if Wikidata doesn't help
+        if not current.playable:
+            verdict = CURRENT_BROKEN if candidate.kind == WEBPAGE else BOTH_BROKEN
+            return Comparison(current, candidate, verdict, actionable=True)
+        verdict = CANDIDATE_NOT_STREAM if candidate.kind == WEBPAGE else CANDIDATE_BROKEN
+        return Comparison(current, candidate, verdict, actionable=False)
+    if not current.playable:
+        return Comparison(current, candidate, CURRENT_BROKEN, actionable=True, faster='candidate')
+
+    faster = None
+    if current.ttfb is not None and candidate.ttfb is not None:
+        faster = 'current' if current.ttfb <= candidate.ttfb else 'candidate'
+
+    if _same_endpoint(current, candidate):
+        return Comparison(current, candidate, SAME_STREAM, actionable=False, faster=faster)
+    if (current.codec, current.bitrate) != (candidate.codec, candidate.bitrate):
+        return Comparison(current, candidate, DIFFERENT_FORMAT, actionable=True, faster=faster)
+    # Same format from another host: only worth switching if it starts clearly faster
+    clearly_faster = (faster == 'candidate' and current.ttfb - candidate.ttfb > 0.5)
+    return Comparison(current, candidate, DIFFERENT_ENDPOINT, actionable=clearly_faster, faster=faster)
+
+
+def _same_url(current_url: str, candidate_url: str) -> Comparison:
+    return Comparison(ProbeResult(current_url, kind=STREAM, final_url=current_url),
+                      ProbeResult(candidate_url, kind=STREAM, final_url=candidate_url),
+                      SAME_URL, actionable=False)
+
+
+def compare(current_url: str, candidate_url: str, session: requests.Session = None,
+            timeout: float = DEFAULT_TIMEOUT) -> Comparison:
+    """Probe both URLs concurrently and judge the difference."""
+    if canonical_url(current_url) == canonical_url(candidate_url):
+        return _same_url(current_url, candidate_url)
+    session = session or requests.Session()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        current = pool.submit(probe, current_url, session, timeout)
+        candidate = pool.submit(probe, candidate_url, session, timeout)
+        return judge(current.result(), candidate.result())
+
+
+def compare_many(pairs: list, jobs: int = 16, timeout: float = DEFAULT_TIMEOUT) -> list:
+    """Compare (current, candidate) URL pairs, probing up to `jobs` URLs at once."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for current_url, candidate_url in pairs:
+            if canonical_url(current_url) == canonical_url(candidate_url):
+                continue
+            for url in (current_url, candidate_url):
+                if url not in futures:
+                    futures[url] = pool.submit(probe, url, session, timeout)
+        results = []
+        for current_url, candidate_url in pairs:
+            if current_url in futures and candidate_url in futures:
+                results.append(judge(futures[current_url].result(), futures[candidate_url].result()))
+            else:
+                results.append(_same_url(current_url, candidate_url))
+        return results
@@ -0,0 +1,871 @@
+"""
+Pure-Python SVG normalizer for VectorDrawable conversion.
+
+Flattens an SVG document into a list of filled/stroked paths in viewport
+coordinates:
+- transforms (matrix, translate, scale, rotate, skewX/Y) of every ancestor,
+  and the viewBox offset, are applied directly to the path coordinates
+- <use> references are resolved, <defs>/<symbol> content is only drawn
+  through them
+- presentation attributes, inherited styles, inline `style` and CSS
+  `<style>` rules (type, class and id selectors) are resolved
+- opacity, fill-opacity and stroke-opacity become fill/stroke alphas
+- linear and radial gradients become VectorDrawable gradients
+- clip paths become VectorDrawable <group> elements with a <clip-path>
+
+Unsupported content (text, images, masks, filters, patterns) is skipped and
+reported in VectorImage.warnings.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+from xml.etree import ElementTree as ET
+
+import pathdata
+
+
+# Affine matrix (a, b, c, d, e, f): x' = a*x + c*y + e, y' = b*x + d*y + f
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+INHERITED_PROPERTIES = (
+    'fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-opacity', 'stroke-width',
+    'stroke-linecap', 'stroke-linejoin', 'stroke-miterlimit', 'color', 'visibility',
+    'clip-rule',
+)
+
+STYLE_PROPERTIES = INHERITED_PROPERTIES + (
+    'opacity', 'display', 'clip-path', 'mask', 'filter', 'stop-color', 'stop-opacity',
+)
+
+DEFAULT_STYLE = {
+    'fill': 'black',
+    'fill-opacity': '1',
+    'fill-rule': 'nonzero',
+    'stroke': 'none',
+    'stroke-opacity': '1',
+    'stroke-width': '1',
+    'stroke-linecap': 'butt',
+    'stroke-linejoin': 'miter',
+    'stroke-miterlimit': '4',
+    'color': 'black',
+    'visibility': 'visible',
+    'clip-rule': 'nonzero',
+}
+
+# Elements whose content is never drawn directly
+NON_RENDERED = {
+    'defs', 'symbol', 'clipPath', 'mask', 'linearGradient', 'radialGradient', 'pattern',
+    'marker', 'style', 'script', 'title', 'desc', 'metadata', 'filter', 'meshgradient',
+}
+SHAPES = {'path', 'rect', 'circle', 'ellipse', 'line', 'polygon', 'polyline'}
+CONTAINERS = {'svg', 'g', 'a', 'switch'}
+UNSUPPORTED = {'text', 'image', 'foreignObject'}
+
+NAMED_COLORS = {
+    'black': (0, 0, 0), 'white': (255, 255, 255), 'red': (255, 0, 0),
+    'green': (0, 128, 0), 'lime': (0, 255, 0), 'blue': (0, 0, 255),
+    'yellow': (255, 255, 0), 'cyan': (0, 255, 255), 'aqua': (0, 255, 255),
+    'magenta': (255, 0, 255), 'fuchsia': (255, 0, 255), 'gray': (128, 128, 128),
+    'grey': (128, 128, 128), 'silver': (192, 192, 192), 'maroon': (128, 0, 0),
+    'olive': (128, 128, 0), 'navy': (0, 0, 128), 'purple': (128, 0, 128),
+    'teal': (0, 128, 128), 'orange': (255, 165, 0), 'gold': (255, 215, 0),
+    'pink': (255, 192, 203), 'brown': (165, 42, 42), 'darkblue': (0, 0, 139),
+    'darkred': (139, 0, 0), 'darkgreen': (0, 100, 0), 'darkgray': (169, 169, 169),
+    'darkgrey': (169, 169, 169), 'lightgray': (211, 211, 211),
+    'lightgrey': (211, 211, 211), 'whitesmoke': (245, 245, 245),
+    'crimson': (220, 20, 60), 'indigo': (75, 0, 130), 'violet': (238, 130, 238),
+    'skyblue': (135, 206, 235), 'steelblue': (70, 130, 180), 'tomato': (255, 99, 71),
+    'orangered': (255, 69, 0), 'royalblue': (65, 105, 225), 'deepskyblue': (0, 191, 255),
+    'dodgerblue': (30, 144, 255), 'limegreen': (50, 205, 50), 'forestgreen': (34, 139, 34),
+}
+
+_LENGTH_UNITS = {'px': 1.0, 'pt': 4 / 3, 'pc': 16.0, 'mm': 96 / 25.4, 'cm': 96 / 2.54, 'in': 96.0}
+_NUMBER_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_TRANSFORM_RE = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+_URL_RE = re.compile(r'url\(\s*[\'"]?#([^\'")\s]+)[\'"]?\s*\)')
+
+
+class SvgError(ValueError):
+    """Raised for documents that can't be normalized."""
+
+
+@dataclass
+class VectorPath:
+    """A path ready for VectorDrawable output, in viewport coordinates."""
+    segments: list
+    fill: object = None          # '#AARRGGBB', a gradient dict, or None
+    stroke: object = None
+    fill_alpha: float = 1.0
+    stroke_alpha: float = 1.0
+    stroke_width: float = 0.0
+    stroke_line_cap: str = 'butt'
+    stroke_line_join: str = 'miter'
+    stroke_miter_limit: float = 4.0
+    fill_rule: str = 'nonzero'
+
+    def paint_key(self) -> tuple:
+        """Everything but the geometry, for detecting identically painted paths."""
+        return (repr(self.fill), repr(self.stroke), self.fill_alpha, self.stroke_alpha,
+                self.stroke_width, self.stroke_line_cap, self.stroke_line_join,
+                self.stroke_miter_limit, self.fill_rule)
+
+
+@dataclass
+class VectorGroup:
+    """Content clipped by a path, emitted as a VectorDrawable <group>."""
+    clip_segments: list
+    items: list = field(default_factory=list)
+
+
+@dataclass
+class VectorImage:
+    viewport_width: float
+    viewport_height: float
+    items: list
+    warnings: list = field(default_factory=list)
+
+
+# -----------------------------------------------------------------------------
+# Geometry
+# -----------------------------------------------------------------------------
+
+def multiply(m1: tuple, m2: tuple) -> tuple:
+    """Matrix product m1 * m2 (m2 is applied first)."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + c1 * b2,
+        b1 * a2 + d1 * b2,
+        a1 * c2 + c1 * d2,
+        b1 * c2 + d1 * d2,
+        a1 * e2 + c1 * f2 + e1,
+        b1 * e2 + d1 * f2 + f1,
+    )
+
+
+def apply_matrix(m: tuple, x: float, y: float) -> tuple:
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def matrix_scale(m: tuple) -> float:
+    """Mean linear scale factor of a matrix, used for stroke widths and radii."""
+    return math.sqrt(abs(m[0] * m[3] - m[1] * m[2]))
+
+
+def parse_transform(text: Optional[str]) -> tuple:
+    """Parse an SVG transform list into a single matrix."""
+    matrix = IDENTITY
+    if not text:
+        return matrix
+    for name, args_text in _TRANSFORM_RE.findall(text):
+        args = [float(v) for v in _NUMBER_RE.findall(args_text)]
+        if name == 'matrix' and len(args) == 6:
+            step = tuple(args)
+        elif name == 'translate' and args:
+            step = (1.0, 0.0, 0.0, 1.0, args[0], args[1] if len(args) > 1 else 0.0)
+        elif name == 'scale' and args:
+            step = (args[0], 0.0, 0.0, args[1] if len(args) > 1 else args[0], 0.0, 0.0)
+        elif name == 'rotate' and args:
+            angle = math.radians(args[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(args) == 3:
+                cx, cy = args[1], args[2]
+                step = multiply((1.0, 0.0, 0.0, 1.0, cx, cy),
+                                multiply(step, (1.0, 0.0, 0.0, 1.0, -cx, -cy)))
+        elif name == 'skewX' and args:
+            step = (1.0, 0.0, math.tan(math.radians(args[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and args:
+            step = (1.0, math.tan(math.radians(args[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = multiply(matrix, step)
+    return matrix
+
+
+def arc_to_cubics(x1: float, y1: float, rx: float, ry: float, phi_degrees: float,
+                  large_arc: bool, sweep: bool, x2: float, y2: float) -> list:
+    """
+    Convert an elliptical arc (SVG endpoint parameterization) into a list of
+    cubic bezier argument lists [c1x, c1y, c2x, c2y, x, y].
+    """
+    if (x1, y1) == (x2, y2):
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [[x1, y1, x2, y2, x2, y2]]
+
+    phi = math.radians(phi_degrees % 360)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+
+    # Scale up radii that are too small to reach the end point
+    radii_check = (x1p / rx) ** 2 + (y1p / ry) ** 2
+    if radii_check > 1:
+        scale = math.sqrt(radii_check)
+        rx, ry = rx * scale, ry * scale
+
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    coefficient = math.sqrt(max(0.0, numerator / denominator)) if denominator else 0.0
+    if large_arc == sweep:
+        coefficient = -coefficient
+    cxp = coefficient * rx * y1p / ry
+    cyp = -coefficient * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+
+    def angle(ux, uy, vx, vy):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    theta1 = angle(1, 0, (x1p - cxp) / rx, (y1p - cyp) / ry)
+    delta = angle((x1p - cxp) / rx, (y1p - cyp) / ry, (-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    count = max(1, math.ceil(abs(delta) / (math.pi / 2) - 1e-9))
+    step = delta / count
+    k = 4 / 3 * math.tan(step / 4)
+    curves = []
+    theta = theta1
+    for _ in range(count):
+        cos1, sin1 = math.cos(theta), math.sin(theta)
+        cos2, sin2 = math.cos(theta + step), math.sin(theta + step)
+        points = [
+            (cos1 - k * sin1, sin1 + k * cos1),
+            (cos2 + k * sin2, sin2 - k * cos2),
+            (cos2, sin2),
+        ]
+        args = []
+        for px, py in points:
+            px, py = px * rx, py * ry
+            args.extend((cos_phi * px - sin_phi * py + cx, sin_phi * px + cos_phi * py + cy))
+        curves.append(args)
+        theta += step
+    # Land exactly on the requested end point
+    curves[-1][4], curves[-1][5] = x2, y2
+    return curves
+
+
+def to_curves(segments: list) -> list:
+    """
+    Reduce absolute segments to M, L, C, Q and Z so that they can go through
+    any affine transform.
+    """
+    result = []
+    x = y = 0.0
+    start_x = start_y = 0.0
+    last_control = None  # (command, x, y) of the previous curve's second control point
+    for command, args in segments:
+        control = None
+        if command == 'M':
+            x, y = args
+            start_x, start_y = x, y
+            result.append(('M', [x, y]))
+        elif command == 'Z':
+            result.append(('Z', []))
+            x, y = start_x, start_y
+        elif command == 'L':
+            x, y = args
+            result.append(('L', [x, y]))
+        elif command == 'H':
+            x = args[0]
+            result.append(('L', [x, y]))
+        elif command == 'V':
+            y = args[0]
+            result.append(('L', [x, y]))
+        elif command in ('C', 'S'):
+            if command == 'S':
+                if last_control and last_control[0] == 'C':
+                    c1 = (2 * x - last_control[1], 2 * y - last_control[2])
+                else:
+                    c1 = (x, y)
+                args = [c1[0], c1[1]] + list(args)
+            result.append(('C', list(args)))
+            control = ('C', args[2], args[3])
+            x, y = args[4], args[5]
+        elif command in ('Q', 'T'):
+            if command == 'T':
+                if last_control and last_control[0] == 'Q':
+                    c = (2 * x - last_control[1], 2 * y - last_control[2])
+                else:
+                    c = (x, y)
+                args = [c[0], c[1]] + list(args)
+            result.append(('Q', list(args)))
+            control = ('Q', args[0], args[1])
+            x, y = args[2], args[3]
+        elif command == 'A':
+            for curve in arc_to_cubics(x, y, args[0], args[1], args[2],
+                                       bool(args[3]), bool(args[4]), args[5], args[6]):
+                result.append(('C', curve))
+            x, y = args[5], args[6]
+        last_control = control
+    return result
+
+
+def transform_segments(segments: list, matrix: tuple) -> list:
+    """Apply a matrix to M/L/C/Q/Z segments."""
+    if matrix == IDENTITY:
+        return segments
+    result = []
+    for command, args in segments:
+        transformed = []
+        for i in range(0, len(args), 2):
+            transformed.extend(apply_matrix(matrix, args[i], args[i + 1]))
+        result.append((command, transformed))
+    return result
+
+
+def segments_bbox(segments: list) -> Optional[tuple]:
+    return pathdata.bounding_box(segments)
+
+
+# -----------------------------------------------------------------------------
+# Values
+# -----------------------------------------------------------------------------
+
+def parse_length(value, reference: float = 0.0, default: float = 0.0) -> float:
+    """Parse an SVG length in user units; percentages are relative to `reference`."""
+    if value is None:
+        return default
+    value = str(value).strip()
+    if not value:
+        return default
+    if value.endswith('%'):
+        return float(value[:-1]) * reference / 100
+    match = re.match(r'^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z]*)$', value)
+    if not match:
+        return default
+    return float(match.group(1)) * _LENGTH_UNITS.get(match.group(2), 1.0)
+
+
+def parse_number(value, default: float = 0.0) -> float:
+    if value is None:
+        return default
+    value = str(value).strip()
+    try:
+        if value.endswith('%'):
+            return float(value[:-1]) / 100
+        return float(value)
+    except ValueError:
+        return default
+
+
+def parse_color(value: Optional[str], current_color: Optional[str] = None) -> Optional[tuple]:
+    """
+    Parse a CSS color into (r, g, b, alpha). Returns None for 'none', for
+    unsupported values and for url() references.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    lower = value.lower()
+    if lower in ('none', 'transparent', '') or lower.startswith('url('):
+        return None
+    if lower == 'currentcolor':
+        return parse_color(current_color) if current_color and \
+            current_color.lower() != 'currentcolor' else None
+    if lower in NAMED_COLORS:
+        return NAMED_COLORS[lower] + (1.0,)
+    if value.startswith('#'):
+        hex_digits = value[1:]
+        if len(hex_digits) in (3, 4):
+            hex_digits = ''.join(c * 2 for c in hex_digits)
+        try:
+            if len(hex_digits) == 6:
+                return (int(hex_digits[0:2], 16), int(hex_digits[2:4], 16),
+                        int(hex_digits[4:6], 16), 1.0)
+            if len(hex_digits) == 8:
+                return (int(hex_digits[0:2], 16), int(hex_digits[2:4], 16),
+                        int(hex_digits[4:6], 16), int(hex_digits[6:8], 16) / 255)
+        except ValueError:
+            return None
+        return None
+    match = re.match(r'rgba?\s*\(([^)]*)\)', lower)
+    if match:
+        parts = [p.strip() for p in re.split(r'[,\s/]+', match.group(1).strip()) if p.strip()]
+        if len(parts) < 3:
+            return None
+        channels = []
+        for part in parts[:3]:
+            if part.endswith('%'):
+                channels.append(round(float(part[:-1]) * 2.55))
+            else:
+                channels.append(round(float(part)))
+        alpha = parse_number(parts[3], 1.0) if len(parts) > 3 else 1.0
+        return tuple(max(0, min(255, c)) for c in channels) + (alpha,)
+    return None
+
+
+def format_color(rgba: tuple, alpha: float = 1.0) -> str:
+    """Format as #RRGGBB, or #AARRGGBB when not fully opaque."""
+    r, g, b, a = rgba
+    a = max(0.0, min(1.0, a * alpha))
+    if a >= 1.0:
+        return f"#{r:02X}{g:02X}{b:02X}"
+    return f"#{round(a * 255):02X}{r:02X}{g:02X}{b:02X}"
+
+
+def parse_declarations(text: str) -> dict:
+    """Parse `prop: value; ...` into a dict."""
+    result = {}
+    for declaration in text.split(';'):
+        if ':' in declaration:
+            name, value = declaration.split(':', 1)
+            value = value.replace('!important', '').strip()
+            if name.strip() and value:
+                result[name.strip().lower()] = value
+    return result
+
+
+def parse_stylesheet(text: str) -> list:
+    """
+    Parse CSS into (tag, id, classes, specificity, order, declarations) rules.
+    Only simple selectors (type, .class, #id and their combinations) are
+    supported; rules with other selectors are ignored.
+    """
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    text = re.sub(r'@[^{;]*;', '', text)
+    rules = []
+    order = 0
+    for selectors, body in re.findall(r'([^{}]+)\{([^{}]*)\}', text):
+        declarations = parse_declarations(body)
+        for selector in selectors.split(','):
+            selector = selector.strip()
+            match = re.fullmatch(r'([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+)*)', selector)
+            if not selector or not match:
+                continue
+            tag = match.group(1) if match.group(1) not in (None, '*') else None
+            parts = re.findall(r'([.#])([\w-]+)', match.group(2))
+            ids = [name for kind, name in parts if kind == '#']
+            classes = frozenset(name for kind, name in parts if kind == '.')
+            if len(ids) > 1:
+                continue
+            specificity = (len(ids), len(classes), 1 if tag else 0)
+            rules.append((tag, ids[0] if ids else None, classes, specificity, order, declarations))
+            order += 1
+    rules.sort(key=lambda rule: (rule[3], rule[4]))
+    return rules
+
+
+def local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def href_of(element) -> Optional[str]:
+    for name, value in element.attrib.items():
+        if local_name(name) == 'href' and value.startswith('#'):
+            return value[1:]
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Normalizer
+# -----------------------------------------------------------------------------
+
+def parse_svg(content: str):
+    """Parse SVG text, keeping namespaces intact."""
+    # Entity-based namespace declarations (Illustrator exports) resolve fine
+    # through the internal DTD subset; only the external DTD is dropped.
+    try:
+        return ET.fromstring(content.encode('utf-8') if isinstance(content, str) else content)
+    except ET.ParseError as e:
+        raise SvgError(f"Failed to parse SVG: {e}")
+
+
+class SvgNormalizer:
+    """Walks an SVG tree and produces a VectorImage."""
+
+    MAX_USE_DEPTH = 16
+
+    def __init__(self, root):
+        self.root = root
+        self.warnings = []
+        self.ids = {}
+        self.rules = []
+        for element in root.iter():
+            element_id = element.get('id')
+            if element_id and element_id not in self.ids:
+                self.ids[element_id] = element
+            if local_name(element.tag) == 'style':
+                self.rules.extend(parse_stylesheet(''.join(element.itertext())))
+        self.rules.sort(key=lambda rule: (rule[3], rule[4]))
+
+        viewbox = root.get('viewBox')
+        width_attr = root.get('width')
+        height_attr = root.get('height')
+        if viewbox:
+            parts = [float(v) for v in _NUMBER_RE.findall(viewbox)]
+            if len(parts) != 4 or parts[2] <= 0 or parts[3] <= 0:
+                raise SvgError(f"Invalid viewBox: {viewbox}")
+            self.min_x, self.min_y, self.width, self.height = parts
+        else:
+            self.min_x = self.min_y = 0.0
+            self.width = parse_length(width_attr, default=24.0) or 24.0
+            self.height = parse_length(height_attr, default=24.0) or 24.0
+
+    def warn(self, message: str):
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+    def normalize(self) -> VectorImage:
+        base = (1.0, 0.0, 0.0, 1.0, -self.min_x, -self.min_y)
+        style = dict(DEFAULT_STYLE)
+        items = []
+        self._walk_children(self.root, base, style, 1.0, items, 0)
+        return VectorImage(self.width, self.height, items, self.warnings)
+
+    # -- styles ---------------------------------------------------------------
+
+    def computed_style(self, element, parent_style: dict) -> dict:
+        style = {name: parent_style[name] for name in INHERITED_PROPERTIES if name in parent_style}
+        # Presentation attributes < style sheet < inline style
+        for name in STYLE_PROPERTIES:
+            value = element.get(name)
+            if value is not None:
+                style[name] = value.strip()
+        tag = local_name(element.tag)
+        element_id = element.get('id')
+        classes = set((element.get('class') or '').split())
+        for rule_tag, rule_id, rule_classes, _, _, declarations in self.rules:
+            if rule_tag and rule_tag != tag:
+                continue
+            if rule_id and rule_id != element_id:
+                continue
+            if not rule_classes <= classes:
+                continue
+            style.update(declarations)
+        style.update(parse_declarations(element.get('style') or ''))
+
+        for name, value in list(style.items()):
+            if value == 'inherit':
+                if name in parent_style:
+                    style[name] = parent_style[name]
+                else:
+                    del style[name]
+        return style
+
+    # -- traversal ------------------------------------------------------------
+
+    def _walk_children(self, element, matrix, style, opacity, items, depth):
+        for child in element:
+            self._walk(child, matrix, style, opacity, items, depth)
+
+    def _walk(self, element, matrix, parent_style, opacity, items, depth):
+        tag = local_name(element.tag)
+        if tag in NON_RENDERED or not tag:
+            return
+        if tag in UNSUPPORTED:
+            self.warn(f"<{tag}> is not supported and was skipped")
+            return
+        if tag not in SHAPES and tag not in CONTAINERS and tag != 'use':
+            return
+
+        style = self.computed_style(element, parent_style)
+        if style.get('display') == 'none':
+            return
+        for unsupported in ('mask', 'filter'):
+            if style.get(unsupported, 'none') != 'none':
+                self.warn(f"{unsupported} is not supported and was ignored")
+
+        matrix = multiply(matrix, parse_transform(element.get('transform')))
+        opacity *= max(0.0, min(1.0, parse_number(style.get('opacity'), 1.0)))
+        if opacity <= 0:
+            return
+
+        target = items
+        clip = self.clip_segments(style.get('clip-path'), matrix)
+        if clip is not None:
+            group = VectorGroup(clip)
+            items.append(group)
+            target = group.items
+
+        if tag == 'use':
+            self._walk_use(element, matrix, style, opacity, target, depth)
+        elif tag in CONTAINERS:
+            if tag == 'svg' and element is not self.root:
+                matrix = multiply(matrix, (1.0, 0.0, 0.0, 1.0,
+                                           parse_length(element.get('x')),
+                                           parse_length(element.get('y'))))
+            self._walk_children(element, matrix, style, opacity, target, depth)
+        else:
+            path = self.shape_path(element, tag, matrix, style, opacity)
+            if path is not None:
+                target.append(path)
+
+    def _walk_use(self, element, matrix, style, opacity, items, depth):
+        ref = href_of(element)
+        referenced = self.ids.get(ref) if ref else None
+        if referenced is None:
+            self.warn(f"<use> references missing element #{ref}")
+            return
+        if depth >= self.MAX_USE_DEPTH:
+            self.warn("<use> nesting is too deep")
+            return
+        matrix = multiply(matrix, (1.0, 0.0, 0.0, 1.0,
+                                   parse_length(element.get('x')),
+                                   parse_length(element.get('y'))))
+        if local_name(referenced.tag) == 'symbol':
+            symbol_style = self.computed_style(referenced, style)
+            self._walk_children(referenced, matrix, symbol_style, opacity, items, depth + 1)
+        else:
+            self._walk(referenced, matrix, style, opacity, items, depth + 1)
+
+    # -- shapes ---------------------------------------------------------------
+
+    def shape_segments(self, element, tag) -> list:
+        """Absolute segments of a basic shape in its own user space."""
+        if tag == 'path':
+            d = element.get('d')
+            return pathdata.to_absolute(pathdata.parse_path(d)) if d else []
+
+        if tag == 'rect':
+            x = parse_length(element.get('x'), self.width)
+            y = parse_length(element.get('y'), self.height)
+            w = parse_length(element.get('width'), self.width)
+            h = parse_length(element.get('height'), self.height)
+            if w <= 0 or h <= 0:
+                return []
+            rx_attr, ry_attr = element.get('rx'), element.get('ry')
+            rx = parse_length(rx_attr, self.width) if rx_attr not in (None, 'auto') else None
+            ry = parse_length(ry_attr, self.height) if ry_attr not in (None, 'auto') else None
+            rx = ry if rx is None else rx
+            ry = rx if ry is None else ry
+            rx = min(rx or 0.0, w / 2)
+            ry = min(ry or 0.0, h / 2)
+            if rx <= 0 or ry <= 0:
+                return [('M', [x, y]), ('H', [x + w]), ('V', [y + h]), ('H', [x]), ('Z', [])]
+            return [
+                ('M', [x + rx, y]), ('H', [x + w - rx]),
+                ('A', [rx, ry, 0, 0, 1, x + w, y + ry]), ('V', [y + h - ry]),
+                ('A', [rx, ry, 0, 0, 1, x + w - rx, y + h]), ('H', [x + rx]),
+                ('A', [rx, ry, 0, 0, 1, x, y + h - ry]), ('V', [y + ry]),
+                ('A', [rx, ry, 0, 0, 1, x + rx, y]), ('Z', []),
+            ]
+
+        if tag in ('circle', 'ellipse'):
+            cx = parse_length(element.get('cx'), self.width)
+            cy = parse_length(element.get('cy'), self.height)
+            if tag == 'circle':
+                rx = ry = parse_length(element.get('r'), math.hypot(self.width, self.height) / math.sqrt(2))
+            else:
+                rx = parse_length(element.get('rx'), self.width)
+                ry = parse_length(element.get('ry'), self.height)
+            if rx <= 0 or ry <= 0:
+                return []
+            return [
+                ('M', [cx + rx, cy]),
+                ('A', [rx, ry, 0, 0, 1, cx, cy + ry]),
+                ('A', [rx, ry, 0, 0, 1, cx - rx, cy]),
+                ('A', [rx, ry, 0, 0, 1, cx, cy - ry]),
+                ('A', [rx, ry, 0, 0, 1, cx + rx, cy]),
+                ('Z', []),
+            ]
+
+        if tag == 'line':
+            return [
+                ('M', [parse_length(element.get('x1'), self.width),
+                       parse_length(element.get('y1'), self.height)]),
+                ('L', [parse_length(element.get('x2'), self.width),
+                       parse_length(element.get('y2'), self.height)]),
+            ]
+
+        if tag in ('polygon', 'polyline'):
+            coords = [float(v) for v in _NUMBER_RE.findall(element.get('points', ''))]
+            if len(coords) < 4:
+                return []
+            segments = [('M', coords[0:2])]
+            segments.extend(('L', coords[i:i + 2]) for i in range(2, len(coords) - 1, 2))
+            if tag == 'polygon':
+                segments.append(('Z', []))
+            return segments
+
+        return []
+
+    def shape_path(self, element, tag, matrix, style, opacity) -> Optional[VectorPath]:
+        if style.get('visibility') in ('hidden', 'collapse'):
+            return None
+        try:
+            local_segments = to_curves(self.shape_segments(element, tag))
+        except pathdata.PathError as e:
+            self.warn(f"Skipped a <{tag}> with invalid data: {e}")
+            return None
+        if not local_segments:
+            return None
+        local_bbox = segments_bbox(local_segments)
+        segments = transform_segments(local_segments, matrix)
+        current_color = style.get('color')
+
+        fill = self.paint(style.get('fill'), current_color, matrix, local_bbox)
+        stroke = self.paint(style.get('stroke'), current_color, matrix, local_bbox)
+        stroke_width = parse_length(style.get('stroke-width'), self.width, 1.0) * matrix_scale(matrix)
+        if stroke_width <= 0:
+            stroke = None
+        if fill is None and stroke is None:
+            return None
+
+        fill_alpha = opacity * max(0.0, min(1.0, parse_number(style.get('fill-opacity'), 1.0)))
+        stroke_alpha = opacity * max(0.0, min(1.0, parse_number(style.get('stroke-opacity'), 1.0)))
+        if fill is not None and fill_alpha <= 0:
+            fill = None
+        if stroke is not None and stroke_alpha <= 0:
+            stroke = None
+        if fill is None and stroke is None:
+            return None
+
+        return VectorPath(
+            segments=segments,
+            fill=fill,
+            stroke=stroke,
+            fill_alpha=round(fill_alpha, 4) if fill is not None else 1.0,
+            stroke_alpha=round(stroke_alpha, 4) if stroke is not None else 1.0,
+            stroke_width=stroke_width if stroke is not None else 0.0,
+            stroke_line_cap=style.get('stroke-linecap', 'butt'),
+            stroke_line_join=style.get('stroke-linejoin', 'miter'),
+            stroke_miter_limit=parse_number(style.get('stroke-miterlimit'), 4.0),
+            fill_rule='evenodd' if style.get('fill-rule') == 'evenodd' else 'nonzero',
+        )
+
+    # -- paint servers --------------------------------------------------------
+
+    def paint(self, value: Optional[str], current_color, matrix, local_bbox):
+        """Resolve a fill/stroke value to '#AARRGGBB', a gradient dict, or None."""
+        if value is None:
+            return None
+        match = _URL_RE.match(value.strip())
+        if match:
+            server = self.ids.get(match.group(1))
+            if server is not None:
+                kind = local_name(server.tag)
+                if kind in ('linearGradient', 'radialGradient'):
+                    return self.gradient(server, current_color, matrix, local_bbox)
+                self.warn(f"<{kind}> paint is not supported, using its fallback color")
+            # Fallback color after the url(), e.g. "url(#p) #fff"
+            fallback = value.strip()[match.end():].strip()
+            color = parse_color(fallback, current_color) if fallback else None
+            return format_color(color) if color else None
+        color = parse_color(value, current_color)
+        return format_color(color) if color else None
+
+    def _gradient_chain(self, element) -> list:
+        chain = []
+        seen = set()
+        while element is not None and id(element) not in seen:
+            seen.add(id(element))
+            chain.append(element)
+            ref = href_of(element)
+            element = self.ids.get(ref) if ref else None
+        return chain
+
+    def gradient(self, element, current_color, matrix, local_bbox):
+        chain = self._gradient_chain(element)
+
+        def attribute(name, default=None):
+            for item in chain:
+                if item.get(name) is not None:
+                    return item.get(name)
+            return default
+
+        stops = []
+        for item in chain:
+            stop_elements = [child for child in item if local_name(child.tag) == 'stop']
+            if stop_elements:
+                last_offset = 0.0
+                for stop in stop_elements:
+                    stop_style = self.computed_style(stop, {'color': current_color or 'black'})
+                    color = parse_color(stop_style.get('stop-color', 'black'), current_color)
+                    if color is None:
+                        color = (0, 0, 0, 0.0)
+                    alpha = max(0.0, min(1.0, parse_number(stop_style.get('stop-opacity'), 1.0)))
+                    offset = max(last_offset, min(1.0, parse_number(stop.get('offset'), 0.0)))
+                    last_offset = offset
+                    stops.append((offset, format_color(color, alpha)))
+                break
+        if not stops:
+            return None
+        if len(stops) == 1:
+            return stops[0][1]
+
+        # Gradient space -> user space -> viewport
+        units = attribute('gradientUnits', 'objectBoundingBox')
+        space = parse_transform(attribute('gradientTransform'))
+        if units == 'objectBoundingBox':
+            if local_bbox is None:
+                return None
+            min_x, min_y, max_x, max_y = local_bbox
+            space = multiply((max_x - min_x, 0.0, 0.0, max_y - min_y, min_x, min_y), space)
+            reference_w = reference_h = 1.0
+        else:
+            reference_w, reference_h = self.width, self.height
+        space = multiply(matrix, space)
+
+        tile = {'reflect': 'mirror', 'repeat': 'repeat'}.get(attribute('spreadMethod'), 'clamp')
+        kind = local_name(element.tag)
+        if kind == 'linearGradient':
+            start = apply_matrix(space, parse_length(attribute('x1', '0%'), reference_w),
+                                 parse_length(attribute('y1', '0%'), reference_h))
+            end = apply_matrix(space, parse_length(attribute('x2', '100%'), reference_w),
+                               parse_length(attribute('y2', '0%'), reference_h))
+            return {'type': 'linear', 'start': start, 'end': end, 'stops': stops, 'tile': tile}
+
+        reference_r = 1.0 if units == 'objectBoundingBox' else \
+            math.hypot(self.width, self.height) / math.sqrt(2)
+        center = apply_matrix(space, parse_length(attribute('cx', '50%'), reference_w),
+                              parse_length(attribute('cy', '50%'), reference_h))
+        radius = parse_length(attribute('r', '50%'), reference_r) * matrix_scale(space)
+        if radius <= 0:
+            return stops[-1][1]
+        return {'type': 'radial', 'center': center, 'radius': radius, 'stops': stops, 'tile': tile}
+
+    # -- clipping -------------------------------------------------------------
+
+    def clip_segments(self, value: Optional[str], matrix) -> Optional[list]:
+        if not value or value == 'none':
+            return None
+        match = _URL_RE.match(value.strip())
+        clip = self.ids.get(match.group(1)) if match else None
+        if clip is None or local_name(clip.tag) != 'clipPath':
+            return None
+        if clip.get('clipPathUnits') == 'objectBoundingBox':
+            self.warn("objectBoundingBox clip paths are not supported and were ignored")
+            return None
+        matrix = multiply(matrix, parse_transform(clip.get('transform')))
+        segments = []
+        for child in clip:
+            tag = local_name(child.tag)
+            child_matrix = matrix
+            if tag == 'use':
+                ref = href_of(child)
+                referenced = self.ids.get(ref) if ref else None
+                if referenced is None:
+                    continue
+                child_matrix = multiply(child_matrix, parse_transform(child.get('transform')))
+                child_matrix = multiply(child_matrix, (1.0, 0.0, 0.0, 1.0,
+                                                       parse_length(child.get('x')),
+                                                       parse_length(child.get('y'))))
+                child, tag = referenced, local_name(referenced.tag)
+            if tag not in SHAPES:
+                continue
+            child_matrix = multiply(child_matrix, parse_transform(child.get('transform')))
+            try:
+                shape = to_curves(self.shape_segments(child, tag))
+            except pathdata.PathError:
+                continue
+            segments.extend(transform_segments(shape, child_matrix))
+        return segments or None
+
+
+def normalize_svg(content: str) -> VectorImage:
+    """Parse and flatten SVG text into a VectorImage."""
+    root = parse_svg(content)
+    if local_name(root.tag) != 'svg':
+        raise SvgError("Root element is not <svg>")
+    return SvgNormalizer(root).normalize()
@@ -1,72 +1,38 @@
-import requests
-import yaml
-import json
+import argparse
 
-# Wikidata API requires a User-Agent header
-HEADERS = {
-    "User-Agent": "OnAirRadioBot/0.1 (https://github.com/skadge/radio; contact@example.com) python-requests/2.x"
-}
+from wikidata_client import (WikidataError, COUNTRY, WEBSITE, add_client_arguments,
+                             client_from_args, first_value)
+
+parser = argparse.ArgumentParser(description='Try Wikidata matching on a few known stations')
+add_client_arguments(parser)
+client = client_from_args(parser.parse_args())
 
 def search_wikidata(name, country_q):
-    url = "https://www.wikidata.org/w/api.php"
-    params = {
-        "action": "wbsearchentities",
-        "format": "json",
-        "language": "en",
-        "search": name,
-        "type": "item"
-    }
-    
     try:
-        response = requests.get(url, params=params, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-    except Exception as e:
+        results = client.search(name)[:3]
+        # Check the first few results with a single batched entity request
+        claims = client.get_claims([result["id"] for result in results])
+    except WikidataError as e:
         print(f"Error searching for {name}: {e}")
         return None
     
-    results = data.get("search", [])
-    if not results:
-        return None
-    
-    # Check the first few results
-    for result in results[:3]:
+    for result in results:
         qid = result["id"]
-        entity_url = f"https://www.wikidata.org/wiki/Special:EntityData/{qid}.json"
-        try:
-            res = requests.get(entity_url, headers=HEADERS)
-            res.raise_for_status()
-            entity_data = res.json().get("entities", {}).get(qid, {})
-        except Exception as e:
-            print(f"Error getting entity {qid}: {e}")
-            continue
-        
-        claims = entity_data.get("claims", {})
+        item_claims = claims.get(qid, {})
         
         # Verify country if possible
-        item_country_q = None
-        if "P17" in claims:
-            # P17 might have multiple values, check first
-            try:
-                item_country_q = claims["P17"][0]["mainsnak"]["datavalue"]["value"]["id"]
-            except (KeyError, IndexError):
-                pass
-        
-        if country_q and item_country_q != country_q:
+        if country_q and first_value(item_claims, COUNTRY) != country_q:
             continue
             
         # Get website (P856)
-        if "P856" in claims:
-            try:
-                website = claims["P856"][0]["mainsnak"]["datavalue"]["value"]
-                return {
-                    "qid": qid,
-                    "name": result.get("label"),
-                    "website": website,
-                    "description": result.get("description")
-                }
-            except (KeyError, IndexError):
-                pass
+        website = first_value(item_claims, WEBSITE)
+        if website:
+            return {
+                "qid": qid,
+                "name": result.get("label"),
+                "website": website,
+                "description": result.get("description")
+            }
             
     return None
 
@@ -84,3 +50,5 @@ for name, cq in test_stations:
         print(f"Found: {res['name']} ({res['qid']}) - {res['website']}")
     else:
         print(f"Not found for {name}")
+
+client.close()
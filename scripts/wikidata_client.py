@@ -0,0 +1,272 @@
+"""
+Small Wikidata API client shared by the curation scripts.
+
+- entity claims are fetched with `wbgetentities` in batches of up to 50 QIDs,
+  asking only for claims (`props=claims`) and keeping only the properties the
+  scripts use, instead of downloading each full entity JSON
+- requests are paced by a token bucket rather than fixed sleeps
+- every request carries `maxlag`; when Wikidata reports replication lag (or
+  answers 429/503) the client waits for Retry-After and tries again
+- SPARQL queries go through the same pacing and cache (see sparql())
+- responses can be kept in a persistent ResponseCache (see response_cache.py),
+  which can also replay recorded responses without any network access;
+  entities are cached one by one, whatever batch they were fetched in
+"""
+
+import threading
+import time
+
+import requests
+
+from response_cache import DEFAULT_PATH, DEFAULT_TTL, CacheMiss, ResponseCache
+
+
+API_URL = "https://www.wikidata.org/w/api.php"
+SPARQL_URL = "https://query.wikidata.org/sparql"
+
+# Wikidata API requires a User-Agent header
+HEADERS = {
+    "User-Agent": "OnAirRadioBot/0.1 (https://github.com/skadge/radio; skadge@guakamole.org) python-requests/2.x"
+}
+
+# Properties used by the station scripts
+COUNTRY = "P17"
+WEBSITE = "P856"
+LOGO = "P154"
+STREAM = "P963"
+STATION_PROPERTIES = (COUNTRY, WEBSITE, LOGO, STREAM)
+
+# wbgetentities accepts at most 50 ids per request
+BATCH_SIZE = 50
+
+DEFAULT_RATE = 5.0      # requests per second
+DEFAULT_BURST = 5
+DEFAULT_MAXLAG = 5      # seconds of replication lag we accept
+MAX_RETRIES = 5
+
+
+class WikidataError(RuntimeError):
+    """Raised when the API keeps failing or returns an error."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Drain the bucket so nobody sends anything for `seconds` (e.g. on maxlag)."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+            self._updated = time.monotonic()
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _snak_value(snak: dict):
+    """Plain value of a claim's main snak: the QID for items, the string otherwise."""
+    if snak.get("snaktype") != "value":
+        return None
+    value = snak.get("datavalue", {}).get("value")
+    if isinstance(value, dict):
+        return value.get("id") or value.get("text") or value.get("time")
+    return value
+
+
+def simplify_claims(claims: dict, properties=STATION_PROPERTIES) -> dict:
+    """
+    Reduce raw claims to {property: [values]} for the wanted properties.
+    Preferred-rank statements come first, deprecated ones are dropped.
+    """
+    rank_order = {"preferred": 0, "normal": 1}
+    result = {}
+    for prop in properties:
+        statements = [s for s in claims.get(prop, []) if s.get("rank") in rank_order]
+        statements.sort(key=lambda s: rank_order[s["rank"]])
+        values = [v for v in (_snak_value(s.get("mainsnak", {})) for s in statements) if v is not None]
+        if values:
+            result[prop] = values
+    return result
+
+
+def first_value(claims: dict, prop: str):
+    """First value of a simplified claim, or None."""
+    values = claims.get(prop)
+    return values[0] if values else None
+
+
+def commons_file_url(file_name: str) -> str:
+    """Download URL of a Wikimedia Commons file (e.g. a P154 logo)."""
+    return f"https://commons.wikimedia.org/wiki/Special:FilePath/{file_name.replace(' ', '_')}"
+
+
+def qid_from_url(url: str) -> str:
+    return url.rstrip('/').split('/')[-1]
+
+
+class WikidataClient:
+    """Rate-limited access to the Wikidata action API."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 maxlag: int = DEFAULT_MAXLAG, session: requests.Session = None,
+                 cache: ResponseCache = None):
+        self.bucket = TokenBucket(rate, burst)
+        self.cache = cache
+        self.maxlag = maxlag
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        self.requests_sent = 0
+        self._claims = {}
+
+    def request(self, params: dict, url: str = API_URL) -> dict:
+        """Response for `params` from `url` (the action API by default), cached when possible."""
+        if self.cache is None:
+            return self._fetch(url, params)
+        key = params if url == API_URL else dict(params, endpoint=url)
+        try:
+            return self.cache.get_or_fetch(key, lambda _: self._fetch(url, params))
+        except CacheMiss as e:
+            raise WikidataError(str(e)) from e
+
+    def _fetch(self, url: str, params: dict) -> dict:
+        """GET `url` with `params`, retrying on maxlag and rate limiting."""
+        params = dict(params, format="json")
+        if url == API_URL:
+            params["maxlag"] = self.maxlag
+        for attempt in range(MAX_RETRIES):
+            self.bucket.acquire()
+            self.requests_sent += 1
+            try:
+                response = self.session.get(url, params=params, timeout=30 if url == API_URL else 120)
+            except requests.RequestException as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise WikidataError(str(e)) from e
+                self.bucket.pause(2 ** attempt)
+                continue
+
+            retry_after = response.headers.get("Retry-After")
+            if response.status_code in (429, 503):
+                self.bucket.pause(float(retry_after or 2 ** attempt))
+                continue
+            if not response.ok:
+                raise WikidataError(f"HTTP {response.status_code} from {url}")
+            try:
+                data = response.json()
+            except ValueError as e:
+                raise WikidataError(f"Invalid JSON from {url}") from e
+            error = data.get("error")
+            if error and error.get("code") == "maxlag":
+                self.bucket.pause(float(retry_after or DEFAULT_MAXLAG))
+                continue
+            if error:
+                raise WikidataError(f"{error.get('code')}: {error.get('info')}")
+            return data
+        raise WikidataError(f"Giving up after {MAX_RETRIES} attempts")
+
+    def search(self, name: str, language: str = "en", limit: int = 7) -> list:
+        """wbsearchentities results (dicts with id, label, description)."""
+        data = self.request({
+            "action": "wbsearchentities",
+            "language": language,
+            "search": name,
+            "type": "item",
+            "limit": limit,
+        })
+        return data.get("search", [])
+
+    def sparql(self, query: str) -> list:
+        """Result bindings of a SPARQL query, as {variable: value} dicts."""
+        data = self.request({"query": query}, url=SPARQL_URL)
+        return [
+            {name: binding["value"] for name, binding in row.items()}
+            for row in data.get("results", {}).get("bindings", [])
+        ]
+
+    def get_claims(self, qids, properties=STATION_PROPERTIES) -> dict:
+        """
+        Simplified claims ({property: [values]}) for each QID, fetched 50 at a
+        time. Results are memoized for the lifetime of the client; missing
+        entities map to an empty dict.
+        """
+        wanted = list(dict.fromkeys(q for q in qids if q not in self._claims))
+        if self.cache is None:
+            entities = self._fetch_entities([self._entity_params(qid) for qid in wanted])
+        else:
+            # Cached per entity, so the cache hits whatever the batches look like
+            try:
+                entities = self.cache.get_or_fetch_many(
+                    [self._entity_params(qid) for qid in wanted], self._fetch_entities)
+            except CacheMiss as e:
+                raise WikidataError(str(e)) from e
+        for qid, entity in zip(wanted, entities):
+            self._claims[qid] = simplify_claims(entity.get("claims", {}), STATION_PROPERTIES)
+        return {
+            qid: {p: v for p, v in self._claims[qid].items() if p in properties}
+            for qid in qids
+        }
+
+    @staticmethod
+    def _entity_params(qid: str) -> dict:
+        """Request (and cache key) of one entity's claims."""
+        return {"action": "wbgetentities", "ids": qid, "props": "claims"}
+
+    def _fetch_entities(self, params_list: list) -> list:
+        """Entities of several _entity_params() requests, fetched 50 per request."""
+        qids = [params["ids"] for params in params_list]
+        entities = {}
+        for batch in chunked(qids, BATCH_SIZE):
+            data = self._fetch(API_URL, {
+                "action": "wbgetentities",
+                "ids": "|".join(batch),
+                "props": "claims",
+            })
+            entities.update(data.get("entities", {}))
+        # Missing entities are cached too, as an empty entity
+        return [entities.get(qid, {}) for qid in qids]
+
+    def close(self):
+        """Finish background cache work and print the cache statistics."""
+        if self.cache is not None:
+            self.cache.close()
+            print(self.cache.summary())
+
+
+def add_client_arguments(parser):
+    """Add the cache options shared by the Wikidata scripts to an ArgumentParser."""
+    parser.add_argument('--cache', default=str(DEFAULT_PATH),
+                        help='Wikidata response cache file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always query Wikidata')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL / 3600,
+                        help='Hours before a cached response is revalidated')
+    parser.add_argument('--replay', action='store_true',
+                        help='Only use recorded responses from the cache, never the network')
+
+
+def client_from_args(args) -> WikidataClient:
+    if args.no_cache and args.replay:
+        raise SystemExit("--replay needs the cache")
+    cache = None if args.no_cache else ResponseCache(
+        args.cache, ttl=args.cache_ttl * 3600, replay=args.replay)
+    return WikidataClient(cache=cache)